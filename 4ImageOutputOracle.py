@@ -1,10 +1,9 @@
 import os
-import time
+import argparse
 from dotenv import load_dotenv
 from openai import OpenAI
-import requests
-from PIL import Image
-from io import BytesIO
+from image_fetch import generate_image_bytes, show_image, describe_fetch
+from symbol_cache import SymbolCache, describe_age
 
 # Load API key from .env file
 load_dotenv()
@@ -13,13 +12,22 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize the OpenAI client
 client = OpenAI(api_key=API_KEY)
 
+# Symbols already generated for a name are reused while they are fresh
+symbol_cache = SymbolCache()
+
 def get_user_name():
     """Get the user's name from input."""
     name = input("Please enter your name: ")
     return name
 
-def generate_sacred_symbol(name):
-    """Generate a sacred symbol based on the user's name."""
+def generate_sacred_symbol(name, regenerate=False):
+    """
+    Generate a sacred symbol based on the user's name.
+    
+    Args:
+        name: The user's name
+        regenerate: Generate a new symbol even if one was made for this name recently
+    """
     # Create a detailed prompt for the image generation
     prompt = f"""Generate a unique, sacred symbol that represents a personal cosmic message for {name}. 
     The glyph should resemble ancient runes, celestial diagrams, or alchemical sigils.
@@ -29,29 +37,22 @@ def generate_sacred_symbol(name):
     The symbol should appear as if it was discovered in an ancient grimoire or celestial map."""
     
     try:
-        # Generate the image using DALL-E
-        response = client.images.generate(
-            prompt=prompt,
-            n=1,
-            size="1024x1024"
-        )
-        
-        # Get the image URL
-        image_url = response.data[0].url
-        
-        # Download the image
-        image_response = requests.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
-        
-        # Create output directory if it doesn't exist
-        os.makedirs("oracle_symbols", exist_ok=True)
-        
-        # Save the image with a timestamp to avoid overwriting
-        timestamp = int(time.time())
-        image_path = f"oracle_symbols/{name}_sacred_symbol_{timestamp}.png"
-        image.save(image_path)
-        
-        print(f"Sacred symbol for {name} has been generated and saved to {image_path}")
+        cached_path, age = (None, None) if regenerate else symbol_cache.get(name, prompt)
+        if cached_path:
+            with open(cached_path, "rb") as f:
+                image_bytes = f.read()
+            image_path = cached_path
+            print(f"The oracle revealed {name}'s sacred symbol {describe_age(age)} ago: {image_path}")
+            print("(Run with --regenerate for a new one.)")
+        else:
+            # Generate the image using DALL-E; the bytes come back in the same response
+            image_bytes, fetch_stats = generate_image_bytes(client, prompt, size="1024x1024")
+            print(f"Image received: {describe_fetch(fetch_stats)}")
+            
+            # Save the image under a unique name and remember it for this name
+            image_path = symbol_cache.put(name, prompt, image_bytes)
+            
+            print(f"Sacred symbol for {name} has been generated and saved to {image_path}")
         
         # Provide a brief interpretation
         print(f"\nInterpretation of {name}'s Sacred Symbol:")
@@ -61,10 +62,7 @@ def generate_sacred_symbol(name):
         print("Meditate on this symbol to reveal deeper meanings unique to your journey.")
         
         # Display the image if in an environment that supports it
-        try:
-            image.show()
-        except Exception as e:
-            print(f"Note: Could not display the image automatically. Please open {image_path} to view it.")
+        show_image(image_bytes, image_path)
         
         return image_path
     
@@ -72,14 +70,18 @@ def generate_sacred_symbol(name):
         print(f"Error generating sacred symbol: {e}")
         return None
 
-def main():
+def main(regenerate=False):
     """Main function to run the oracle."""
     print("=== Sacred Symbol Oracle ===")
     print("This oracle will generate a unique sacred symbol based on your name.")
     print("The symbol contains hidden elements that hint at a personal cosmic message.")
     
     name = get_user_name()
-    generate_sacred_symbol(name)
+    generate_sacred_symbol(name, regenerate=regenerate)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sacred Symbol Oracle")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Generate a new symbol even if one was made for this name recently")
+    args = parser.parse_args()
+    main(regenerate=args.regenerate)
\ No newline at end of file
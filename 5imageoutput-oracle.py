@@ -3,9 +3,9 @@ import time
 import streamlit as st
 from dotenv import load_dotenv
 from openai import OpenAI
-import requests
-from PIL import Image
-from io import BytesIO
+from image_fetch import generate_image_bytes, sniff_image_type, describe_fetch
+from symbol_cache import SymbolCache, describe_age
+from symbol_jobs import SymbolJobQueue, FAILED, DONE
 
 # Try to load from .env file, but don't fail if it doesn't exist
 try:
@@ -21,8 +21,25 @@ if not API_KEY:
 
 client = OpenAI(api_key=API_KEY)
 
-def generate_sacred_symbol(name):
-    """Generate a sacred symbol based on the user's name."""
+@st.cache_resource
+def get_symbol_cache():
+    """One symbol index shared by every session of the app."""
+    return SymbolCache()
+
+def generate_sacred_symbol(job):
+    """
+    Generate a sacred symbol for job.name on a background worker.
+    
+    Runs outside the script, so it reports progress with job.update instead
+    of Streamlit calls.
+    
+    Returns:
+        A tuple of (image_bytes, image_path)
+    """
+    name = job.name
+    client = job.options["client"]
+    symbol_cache = job.options["symbol_cache"]
+    
     # Create a detailed prompt for the image generation
     prompt = f"""Generate a unique, sacred symbol that represents a personal cosmic message for {name}. 
     The glyph should resemble ancient runes, celestial diagrams, or alchemical sigils.
@@ -31,34 +48,59 @@ def generate_sacred_symbol(name):
     Use a dark background with luminous, glowing lines in gold, silver, or ethereal blue.
     The symbol should appear as if it was discovered in an ancient grimoire or celestial map."""
     
-    try:
-        # Generate the image using DALL-E
-        response = client.images.generate(
-            prompt=prompt,
-            n=1,
-            size="1024x1024"
-        )
-        
-        # Get the image URL
-        image_url = response.data[0].url
-        
-        # Download the image
-        image_response = requests.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
-        
-        # Create output directory if it doesn't exist
-        os.makedirs("oracle_symbols", exist_ok=True)
-        
-        # Save the image with a timestamp to avoid overwriting
-        timestamp = int(time.time())
-        image_path = f"oracle_symbols/{name}_sacred_symbol_{timestamp}.png"
-        image.save(image_path)
-        
-        return image, image_path
+    cached_path, age = (None, None) if job.regenerate else symbol_cache.get(name, prompt)
+    if cached_path:
+        job.update(f"The oracle revealed this symbol {describe_age(age)} ago.")
+        with open(cached_path, "rb") as f:
+            return f.read(), cached_path
     
-    except Exception as e:
-        st.error(f"Error generating sacred symbol: {e}")
-        return None, None
+    # Generate the image using DALL-E; the bytes come back in the same response
+    job.update("Generating your sacred symbol... This may take a moment.")
+    image_bytes, fetch_stats = generate_image_bytes(client, prompt, size="1024x1024")
+    
+    # Save the image under a unique name and remember it for this name
+    image_path = symbol_cache.put(name, prompt, image_bytes)
+    job.update(f"Image received: {describe_fetch(fetch_stats)}")
+    
+    return image_bytes, image_path
+
+@st.cache_resource
+def get_symbol_jobs():
+    return SymbolJobQueue(generate_sacred_symbol, max_workers=2)
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id):
+    job = get_symbol_jobs().get(job_id)
+    if job is None or not job.active:
+        # Finished: rerun the page so it shows the result
+        st.rerun()
+    st.info(f"🔮 {job.message} ({time.time() - job.created:.0f}s)")
+
+def show_symbol(job):
+    """Show a finished job's symbol, its interpretation and a download button."""
+    name = job.name
+    image_bytes, image_path = job.result
+    st.caption(job.message)
+    st.image(image_bytes, caption=f"Sacred Symbol for {name}", use_container_width=True)
+    
+    # Interpretation
+    st.markdown(f"""
+    ### Interpretation of {name}'s Sacred Symbol:
+    
+    This unique cosmic glyph contains elements that resonate with {name}'s spiritual essence.
+    The intersecting lines represent the convergence of past, present, and future paths.
+    Hidden within its geometry are symbols of personal strength and cosmic connection.
+    Meditate on this symbol to reveal deeper meanings unique to your journey.
+    """)
+    
+    # Download button, from the same bytes the image was shown and saved from
+    mime_type, extension = sniff_image_type(image_bytes)
+    st.download_button(
+        label="Download Symbol",
+        data=image_bytes,
+        file_name=f"{name}_sacred_symbol{extension}",
+        mime=mime_type
+    )
 
 def main():
     st.set_page_config(
@@ -83,6 +125,7 @@ def main():
     
     # Main content
     name = st.text_input("Enter your name:", placeholder="Your name here...")
+    regenerate = st.checkbox("Generate a new symbol even if the oracle has revealed one for this name")
     
     if st.button("Generate Sacred Symbol"):
         if not name:
@@ -90,30 +133,21 @@ def main():
         elif not client.api_key:
             st.error("Please enter your OpenAI API key in the sidebar!")
         else:
-            with st.spinner("Generating your sacred symbol... This may take a moment."):
-                image, image_path = generate_sacred_symbol(name)
-                
-                if image:
-                    st.image(image, caption=f"Sacred Symbol for {name}", use_container_width=True)
-                    
-                    # Interpretation
-                    st.markdown(f"""
-                    ### Interpretation of {name}'s Sacred Symbol:
-                    
-                    This unique cosmic glyph contains elements that resonate with {name}'s spiritual essence.
-                    The intersecting lines represent the convergence of past, present, and future paths.
-                    Hidden within its geometry are symbols of personal strength and cosmic connection.
-                    Meditate on this symbol to reveal deeper meanings unique to your journey.
-                    """)
-                    
-                    # Download button
-                    with open(image_path, "rb") as file:
-                        st.download_button(
-                            label="Download Symbol",
-                            data=file,
-                            file_name=f"{name}_sacred_symbol.png",
-                            mime="image/png"
-                        )
+            # Queue the symbol; the page only keeps the job id, also in the URL
+            # so that a refresh reattaches to the same job
+            job_id = get_symbol_jobs().submit(name, regenerate=regenerate, client=client,
+                                              symbol_cache=get_symbol_cache())
+            st.session_state.job_id = job_id
+            st.query_params["job"] = job_id
+    
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = get_symbol_jobs().get(job_id) if job_id else None
+    if job and job.active:
+        show_job_progress(job.id)
+    elif job and job.status == FAILED:
+        st.error(f"Error generating sacred symbol: {job.error}")
+    elif job and job.status == DONE:
+        show_symbol(job)
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,15 @@
 import os
 import time
-import requests
-from io import BytesIO
-from PIL import Image
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from openai import OpenAI
+from image_fetch import generate_image_bytes, save_image_bytes, show_image, describe_fetch
+from api_limiter import RequestScheduler, retry_with_backoff
+from telephone_runner import TelephoneRunner, describe_image, DEFAULT_CONCURRENCY
+from telephone_log import CycleLog, resume_point, latest_log
+from prompt_governor import govern_prompt, GOVERNOR_MODES, DEFAULT_MAX_CHARS, DEFAULT_MAX_TOKENS
 
 # Load API key from .env file
 load_dotenv()
@@ -13,155 +18,233 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize the OpenAI client
 client = OpenAI(api_key=API_KEY)
 
+# Requests wait only as long as the API's rate-limit headers say they must,
+# instead of a fixed pause between cycles
+scheduler = RequestScheduler()
+
+# Saving and displaying an image happen in the background while the next stage runs
+side_effects = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telephone-save")
+
+def report_retry(attempt, error, delay):
+    print(f"Attempt {attempt} failed ({error}); trying again in {delay:.1f}s...")
+
 def generate_image(prompt):
-    """Generate an image using DALL-E based on the prompt."""
+    """
+    Generate an image using DALL-E based on the prompt.
+    
+    Returns:
+        A tuple of (image_bytes, fetch_stats), or (None, None) on failure
+    """
     print(f"\nGenerating image from prompt: '{prompt}'")
     
     try:
-        response = client.images.generate(
-            prompt=prompt,
-            n=1,
-            size="1024x1024"
-        )
-        
-        image_url = response.data[0].url
-        
-        # Download the image
-        image_response = requests.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
-        
+        # The bytes come back in the same response, so there is no second download;
+        # transient failures (timeouts, 429s, 5xx) are retried with backoff
+        image_bytes, fetch_stats = retry_with_backoff(generate_image_bytes, client, prompt, size="1024x1024",
+                                                      scheduler=scheduler, on_retry=report_retry)
+        print(f"Image received: {describe_fetch(fetch_stats)}")
+        return image_bytes, fetch_stats
+    
+    except Exception as e:
+        print(f"Error generating image: {e}")
+        return None, None
+
+def save_and_show_image(image_bytes, path_stem):
+    """
+    Save an image to telephone_game/ and try to display it; run in the background.
+    
+    Args:
+        image_bytes: The image as generated
+        path_stem: Where to save it, without the extension
+    
+    Returns:
+        A tuple of (image_path, seconds), or (None, seconds) if saving failed
+    """
+    start = time.perf_counter()
+    try:
         # Create output directory if it doesn't exist
         os.makedirs("telephone_game", exist_ok=True)
         
-        # Save the image with a timestamp
-        timestamp = int(time.time())
-        image_path = f"telephone_game/image_{timestamp}.png"
-        image.save(image_path)
-        
+        image_path = save_image_bytes(image_bytes, path_stem)
         print(f"Image saved to {image_path}")
-        
-        # Try to display the image
-        try:
-            image.show()
-        except Exception as e:
-            print(f"Note: Could not display the image automatically. Please open {image_path} to view it.")
-        
-        return image_url, image_path
-    
     except Exception as e:
-        print(f"Error generating image: {e}")
-        return None, None
+        print(f"Error saving image: {e}")
+        return None, time.perf_counter() - start
+    
+    # Try to display the image
+    show_image(image_bytes, image_path)
+    return image_path, time.perf_counter() - start
 
-def analyze_image(image_url):
-    """Analyze the image using GPT-4o and generate a description."""
+def analyze_image(image_bytes):
+    """
+    Analyze the image (its bytes, as generated) using GPT-4o and generate a description.
+    
+    Returns:
+        A tuple of (description, token_usage), or (None, None) on failure
+    """
     print("\nAnalyzing the image...")
     
     try:
-        # For image_path, we'll download the image and convert to base64
-        if image_url.startswith('http'):
-            # Download the image
-            image_response = requests.get(image_url)
-            image_data = BytesIO(image_response.content).getvalue()
-            import base64
-            # Convert to base64
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-            # Create the proper data URL format
-            data_url = f"data:image/jpeg;base64,{base64_image}"
-        else:
-            # If it's a local path
-            with open(image_url, "rb") as image_file:
-                image_data = image_file.read()
-                import base64
-                base64_image = base64.b64encode(image_data).decode('utf-8')
-                data_url = f"data:image/jpeg;base64,{base64_image}"
-          messages = [
-            {
-                "role": "system",
-                "content": "You are a kid playing a game of telephone."
-            },
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Describe this image in detail. What do you see?"},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": data_url,
-                        },
-                    },
-                ],
-            }
-        ]
-        
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Updated to use gpt-4o which has vision capabilities
-            messages=messages,
-            temperature=0.9,
-            max_tokens=300
-        )
-        
-        description = response.choices[0].message.content
+        # The same request the multi-chain runner sends
+        description, usage = retry_with_backoff(describe_image, client, image_bytes, scheduler=scheduler,
+                                                on_retry=report_retry)
         print(f"\nImage description: {description}")
         
-        return description
+        return description, usage
     
     except Exception as e:
         print(f"Error analyzing image: {e}")
-        return None
+        return None, None
 
-def run_telephone_game(initial_prompt, cycles=3):
-    """Run the AI Telephone Game for the specified number of cycles."""
-    print("=== AI Telephone Game with Images ===")
-    print(f"Starting with prompt: '{initial_prompt}'")
-    print(f"Running for {cycles} cycles")
+def rate_limit_wait():
+    """Total seconds requests have spent waiting for the rate limit so far."""
+    return sum(stats["waited_seconds"] for stats in scheduler.report().values())
+
+def describe_timings(timings):
+    """One-line summary of a cycle's timings, e.g. "generate 9.8s, analyze 3.1s, ..."."""
+    return ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in timings.items())
+
+def run_telephone_game(initial_prompt, cycles=3, resume_path=None, governor=None):
+    """
+    Run the AI Telephone Game for the specified number of cycles.
+    
+    Every finished cycle is written to telephone_game/game_<timestamp>.jsonl
+    straight away, so a game that stops can be picked up again.
     
-    # Create a log file to track the game
+    Args:
+        initial_prompt: The prompt for the first image (ignored when resuming)
+        cycles: How many cycles the game should have in all (when resuming,
+            None keeps the number the game was started with)
+        resume_path: A game's .jsonl log to continue from its last good cycle
+        governor: Keyword arguments for prompt_governor.govern_prompt (mode,
+            max_chars, max_tokens), which keeps each cycle's prompt within budget
+    """
+    governor = dict(governor or {})
     os.makedirs("telephone_game", exist_ok=True)
-    timestamp = int(time.time())
-    log_path = f"telephone_game/game_log_{timestamp}.txt"
     
-    with open(log_path, "w") as log_file:
-        log_file.write(f"=== AI Telephone Game with Images ===\n")
-        log_file.write(f"Start Time: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        log_file.write(f"Initial Prompt: {initial_prompt}\n\n")
-        
+    if resume_path:
+        game, done_cycles = resume_point(resume_path)
+        initial_prompt = game["initial_prompt"]
+        cycles = cycles or game["cycles"]
+        cycle_log = CycleLog(resume_path)
+        log_path = game["text_log"]
+        first_cycle = done_cycles[-1]["cycle"] + 1 if done_cycles else 1
+        current_prompt = done_cycles[-1]["description"] if done_cycles else initial_prompt
+        print("=== AI Telephone Game with Images (resumed) ===")
+        print(f"Continuing '{initial_prompt}' from cycle {first_cycle} of {cycles}")
+    else:
+        # Create the logs to track the game: JSONL to resume from, text to read
+        timestamp = int(time.time())
+        cycle_log = CycleLog(f"telephone_game/game_{timestamp}.jsonl")
+        log_path = f"telephone_game/game_log_{timestamp}.txt"
+        cycle_log.append("game", initial_prompt=initial_prompt, cycles=cycles, text_log=log_path,
+                         governor=governor, started=time.strftime('%Y-%m-%d %H:%M:%S'))
+        first_cycle = 1
         current_prompt = initial_prompt
+        print("=== AI Telephone Game with Images ===")
+        print(f"Starting with prompt: '{initial_prompt}'")
+        print(f"Running for {cycles} cycles")
+    
+    with open(log_path, "a") as log_file:
+        if resume_path:
+            log_file.write(f"\nResumed at {time.strftime('%Y-%m-%d %H:%M:%S')} from cycle {first_cycle}\n\n")
+        else:
+            log_file.write("=== AI Telephone Game with Images ===\n")
+            log_file.write(f"Start Time: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            log_file.write(f"Initial Prompt: {initial_prompt}\n\n")
+        
+        game_start = time.perf_counter()
+        played = []
         
-        for cycle in range(1, cycles + 1):
+        for cycle in range(first_cycle, cycles + 1):
             print(f"\n--- Cycle {cycle} of {cycles} ---")
             log_file.write(f"--- Cycle {cycle} of {cycles} ---\n")
+            cycle_start = time.perf_counter()
+            waited_before = rate_limit_wait()
+            
+            # Keep the prompt within budget; the descriptions would otherwise grow it every cycle
+            raw_prompt = current_prompt
+            current_prompt, prompt_stats = govern_prompt(current_prompt, client=client, scheduler=scheduler,
+                                                         **governor)
+            if prompt_stats["method"] != "none":
+                print(f"Prompt shortened from {prompt_stats['raw_chars']} to {prompt_stats['chars']} characters "
+                      f"({prompt_stats['method']})")
             
             # Generate image from the current prompt
-            image_url, image_path = generate_image(current_prompt)
-            if not image_url:
-                print(f"Failed to generate image in cycle {cycle}. Stopping the game.")
-                log_file.write(f"Failed to generate image in cycle {cycle}. Game stopped.\n")
+            image_bytes, fetch_stats = generate_image(current_prompt)
+            if not image_bytes:
+                stop_game(cycle_log, log_file, cycle, "generate image")
                 break
             
+            # Save and show the image while it is being analyzed
+            path_stem = os.path.splitext(cycle_log.path)[0] + f"_cycle{cycle:02d}"
+            saved = side_effects.submit(save_and_show_image, image_bytes, path_stem)
+            
+            # Analyze the image to get a new description, from the bytes in memory
+            analyze_start = time.perf_counter()
+            new_description, usage = analyze_image(image_bytes)
+            analyze_seconds = time.perf_counter() - analyze_start
+            
+            # Saving is normally finished by now; this only collects the path
+            image_path, save_seconds = saved.result()
             log_file.write(f"Prompt: {current_prompt}\n")
             log_file.write(f"Image Path: {image_path}\n")
             
-            # Analyze the image to get a new description
-            new_description = analyze_image(image_url)
             if not new_description:
-                print(f"Failed to analyze image in cycle {cycle}. Stopping the game.")
-                log_file.write(f"Failed to analyze image in cycle {cycle}. Game stopped.\n")
+                stop_game(cycle_log, log_file, cycle, "analyze image")
                 break
             
-            log_file.write(f"Description: {new_description}\n\n")
+            log_file.write(f"Description: {new_description}\n")
             
-            # Use the description as the next prompt
-            current_prompt = new_description
+            timings = {
+                "govern": prompt_stats["seconds"],
+                "generate": fetch_stats["total_seconds"],
+                "analyze": analyze_seconds,
+                "save": save_seconds,
+                "rate_limit_wait": rate_limit_wait() - waited_before,
+                "cycle": time.perf_counter() - cycle_start,
+            }
+            # The checkpoint: once this is on disk the cycle never has to be paid for again
+            record = cycle_log.append(
+                "cycle", cycle=cycle, prompt=current_prompt, image_path=image_path, description=new_description,
+                raw_prompt=raw_prompt if raw_prompt != current_prompt else None, prompt_length=prompt_stats,
+                timings={stage: round(seconds, 3) for stage, seconds in timings.items()},
+                usage={"image": fetch_stats.get("usage"), "describe": usage})
+            played.append(record)
+            print(f"Cycle {cycle} timings: {describe_timings(timings)}")
+            log_file.write(f"Timings: {describe_timings(timings)}\n\n")
+            log_file.flush()
             
-            # Add a small delay to avoid rate limiting
-            if cycle < cycles:
-                print("Waiting a moment before the next cycle...")
-                time.sleep(2)
+            # Use the description as the next prompt; the next requests wait
+            # only if the rate limit requires it
+            current_prompt = new_description
         
-        log_file.write(f"\nGame completed at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        print(f"\nAI Telephone Game completed! Log saved to {log_path}")
+        if played:
+            # The governor's effect: prompt length against image generation time, cycle by cycle
+            summary = describe_prompt_lengths(played)
+            print(f"\nPrompt length and generation time per cycle:\n{summary}")
+            log_file.write(f"Prompt length and generation time per cycle:\n{summary}\n")
+        log_file.write(f"\nTotal time: {time.perf_counter() - game_start:.1f}s\n")
+        log_file.write(f"Game completed at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        print(f"\nAI Telephone Game completed! Log saved to {log_path} and {cycle_log.path}")
+
+def describe_prompt_lengths(records):
+    """One line per cycle: the prompt's length as written and as sent, and the generation time."""
+    lines = []
+    for record in records:
+        length = record["prompt_length"]
+        lines.append(f"  cycle {record['cycle']:>2}: {length['raw_chars']:>5} -> {length['chars']:>4} chars "
+                     f"({length['tokens']} tokens, {length['method']}), generated in {record['timings']['generate']:.1f}s")
+    return "\n".join(lines)
 
-def main():
+def stop_game(cycle_log, log_file, cycle, step):
+    """Record that the game gave up in this cycle, and how to pick it up again."""
+    print(f"Failed to {step} in cycle {cycle}. Stopping the game.")
+    print(f"Resume it later with: python 6image-telephone.py --resume {cycle_log.path}")
+    log_file.write(f"Failed to {step} in cycle {cycle}. Game stopped.\n")
+    cycle_log.append("stopped", cycle=cycle, error=f"Failed to {step}")
+
+def main(governor=None):
     """Main function to run the AI Telephone Game."""
     print("Welcome to the AI Telephone Game with Images!")
     print("This game generates an image from a prompt, then describes that image to create a new prompt, and so on.")
@@ -174,7 +257,54 @@ def main():
         cycles = 3
         print("Invalid input. Using default of 3 cycles.")
     
-    run_telephone_game(initial_prompt, cycles)
+    run_telephone_game(initial_prompt, cycles, governor=governor)
+
+def run_chains(prompts, cycles, branches, branch_cycle, concurrency, governor=None):
+    """Play several chains at once with telephone_runner, all in one run directory."""
+    print("=== AI Telephone Game with Images: several chains ===")
+    print(f"{len(prompts)} chains, {cycles} cycles each, up to {concurrency} requests at a time")
+    
+    # Let the shared limit, not the default per-endpoint caps, decide how much runs at once
+    chain_scheduler = RequestScheduler(limits={"images": concurrency, "chat": concurrency})
+    runner = TelephoneRunner(client, chain_scheduler, concurrency=concurrency, governor=governor)
+    summary_path = asyncio.run(runner.run(prompts, cycles=cycles, branches=branches, branch_cycle=branch_cycle))
+    
+    for chain in runner.chains:
+        print(f"{chain.id}: {chain.status}, {len(chain.cycles)} cycles")
+    print(f"\nAll chains finished! Run saved to {summary_path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI Telephone Game with Images")
+    parser.add_argument("--prompt", action="append", help="A starting prompt; repeat for several chains")
+    parser.add_argument("--chains", type=int, default=1, help="Play each prompt this many times")
+    parser.add_argument("--cycles", type=int, help="Cycles per chain (default 3; when resuming, the game's own)")
+    parser.add_argument("--branches", type=int, default=1,
+                        help="Split each chain into this many image variants at --branch-cycle")
+    parser.add_argument("--branch-cycle", type=int, default=1, help="The cycle at which chains branch")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="API requests in flight at once, across all chains")
+    parser.add_argument("--governor", choices=GOVERNOR_MODES, default="local",
+                        help="How to shorten prompts that are over budget: local heuristics, one cheap "
+                             "summarization request, or off (only measure)")
+    parser.add_argument("--max-prompt-chars", type=int, default=DEFAULT_MAX_CHARS,
+                        help="Prompt budget in characters")
+    parser.add_argument("--max-prompt-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help="Prompt budget in tokens")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="LOG",
+                        help="Continue a game from its last good cycle (default: the latest game_*.jsonl)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    governor = {"mode": args.governor, "max_chars": args.max_prompt_chars, "max_tokens": args.max_prompt_tokens}
+    if args.resume:
+        resume_path = latest_log() if args.resume == "latest" else args.resume
+        if resume_path and os.path.exists(resume_path):
+            run_telephone_game(None, args.cycles, resume_path=resume_path, governor=governor)
+        else:
+            print("No game log found to resume.")
+    elif args.prompt:
+        run_chains([prompt for prompt in args.prompt for _ in range(args.chains)],
+                   args.cycles or 3, args.branches, args.branch_cycle, args.concurrency, governor)
+    else:
+        main(governor)
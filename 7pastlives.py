@@ -2,11 +2,12 @@ import os
 import time
 import json
 from dotenv import load_dotenv
-import requests
-from PIL import Image
-from io import BytesIO
-import pygame
+from image_fetch import generate_image_bytes, save_image_bytes, show_image, describe_fetch
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from tts_cache import TTSCache, cached_speech
+from audio_playback import play_audio_file
 
 # Load API key from .env file
 load_dotenv()
@@ -15,8 +16,8 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize OpenAI client
 client = OpenAI(api_key=API_KEY)
 
-# Initialize pygame mixer for audio playback
-pygame.mixer.init()
+# Persistent cache for narration audio, shared with the other voice oracles
+tts_cache = TTSCache()
 
 def get_user_name():
     """Get the user's name from input."""
@@ -55,24 +56,14 @@ def generate_past_life_story(name):
 def generate_audio_narration(story):
     """Generate audio narration for the past life story."""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs("output_audio", exist_ok=True)
-        
-        # Generate a timestamp for the filename
-        timestamp = int(time.time())
-        audio_path = f"output_audio/past_life_story_{timestamp}.mp3"
-        
-        # Generate audio using OpenAI's Text-to-Speech API
-        response = client.audio.speech.create(
+        # Generate audio using OpenAI's Text-to-Speech API (or reuse it from the cache)
+        audio_path = cached_speech(
+            client, tts_cache, story,
             model="tts-1",
-            voice="onyx",  # Using a deep, dramatic voice for storytelling
-            input=story
+            voice="onyx"  # Using a deep, dramatic voice for storytelling
         )
         
-        # Save the audio file
-        response.stream_to_file(audio_path)
-        
-        print(f"Audio narration has been generated and saved to {audio_path}")
+        print(f"Audio narration is ready at {audio_path}")
         return audio_path
     
     except Exception as e:
@@ -84,12 +75,9 @@ def play_audio(audio_path):
     try:
         if audio_path and os.path.exists(audio_path):
             print(f"Playing audio narration...")
-            pygame.mixer.music.load(audio_path)
-            pygame.mixer.music.play()
             
-            # Wait for the audio to finish playing
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
+            # The playback service plays on its own thread; wait until it's done
+            play_audio_file(audio_path)
     
     except Exception as e:
         print(f"Error playing audio: {e}")
@@ -100,35 +88,21 @@ def generate_past_life_face(name):
     prompt = f"""Generate a realistic portrait of how {name} looked in their past life. Show their face clearly with appropriate period clothing and background."""
     
     try:
-        # Generate the image using DALL-E
-        response = client.images.generate(
-            prompt=prompt,
-            n=1,
-            size="1024x1024"
-        )
-        
-        # Get the image URL
-        image_url = response.data[0].url
-        
-        # Download the image
-        image_response = requests.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
+        # Generate the image using DALL-E; the bytes come back in the same response
+        image_bytes, fetch_stats = generate_image_bytes(client, prompt, size="1024x1024")
+        print(f"Image received: {describe_fetch(fetch_stats)}")
         
         # Create output directory if it doesn't exist
         os.makedirs("oracle_symbols", exist_ok=True)
         
         # Save the image with a timestamp to avoid overwriting
         timestamp = int(time.time())
-        image_path = f"oracle_symbols/{name}_past_life_{timestamp}.png"
-        image.save(image_path)
+        image_path = save_image_bytes(image_bytes, f"oracle_symbols/{name}_past_life_{timestamp}")
         
         print(f"\nPast life appearance for {name} has been generated and saved to {image_path}")
         
         # Display the image if in an environment that supports it
-        try:
-            image.show()
-        except Exception as e:
-            print(f"Note: Could not display the image automatically. Please open {image_path} to view it.")
+        show_image(image_bytes, image_path)
         
         return image_path
     
@@ -136,26 +110,88 @@ def generate_past_life_face(name):
         print(f"Error generating past life image: {e}")
         return None
 
-def main():
-    """Main function to run the oracle."""
-    print("=== Past Life Oracle ===")
-    print("This oracle will reveal how you looked in your past life and tell your story.")
-    print("You will receive both a visual representation and an audio narration.")
-    
-    name = get_user_name()
+def timed_stage(timings, stage, func, *args):
+    """Run one stage of the oracle and record how long it took in seconds."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+def print_timings(timings):
+    """Print per-stage and end-to-end timings for a past life reveal."""
+    print("\n=== Timings ===")
+    for stage, seconds in timings.items():
+        print(f"{stage:>12}: {seconds:6.2f}s")
+
+def reveal_past_life_sequentially(name):
+    """Generate the story, portrait and narration one after another."""
+    timings = {}
+    start = time.perf_counter()
     
     # Generate a story about the past life
-    story = generate_past_life_story(name)
+    story = timed_stage(timings, "story", generate_past_life_story, name)
     
     # Generate the past life face image
-    image_path = generate_past_life_face(name)
+    image_path = timed_stage(timings, "image", generate_past_life_face, name)
     
     # Generate audio narration of the story
-    audio_path = generate_audio_narration(story)
+    audio_path = timed_stage(timings, "tts", generate_audio_narration, story)
+    timings["first_audio"] = time.perf_counter() - start
     
     # Play the audio narration
     if audio_path:
-        play_audio(audio_path)
+        timed_stage(timings, "playback", play_audio, audio_path)
+    
+    timings["total"] = time.perf_counter() - start
+    print_timings(timings)
+    return story, image_path, audio_path
+
+def reveal_past_life_concurrently(name):
+    """
+    Generate the story, portrait and narration concurrently.
+    
+    The portrait starts at the same time as the story, the narration is
+    synthesized as soon as the story text exists, and it plays while the
+    portrait is still rendering.
+    """
+    timings = {}
+    start = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The image is the slowest call, so it gets a head start on its own thread
+        image_future = executor.submit(timed_stage, timings, "image", generate_past_life_face, name)
+        
+        story = timed_stage(timings, "story", generate_past_life_story, name)
+        audio_path = timed_stage(timings, "tts", generate_audio_narration, story)
+        timings["first_audio"] = time.perf_counter() - start
+        
+        # Play the audio narration while the portrait finishes
+        if audio_path:
+            timed_stage(timings, "playback", play_audio, audio_path)
+        
+        image_path = image_future.result()
+    
+    timings["total"] = time.perf_counter() - start
+    print_timings(timings)
+    return story, image_path, audio_path
+
+def main(concurrent=True):
+    """Main function to run the oracle."""
+    print("=== Past Life Oracle ===")
+    print("This oracle will reveal how you looked in your past life and tell your story.")
+    print("You will receive both a visual representation and an audio narration.")
+    
+    name = get_user_name()
+    
+    if concurrent:
+        reveal_past_life_concurrently(name)
+    else:
+        reveal_past_life_sequentially(name)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Past Life Oracle")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Generate story, image and narration one after another (for timing comparison)")
+    args = parser.parse_args()
+    main(concurrent=not args.sequential)
@@ -2,14 +2,16 @@ import os
 import time
 import json
 from dotenv import load_dotenv
-import requests
-from PIL import Image
-from io import BytesIO
-import pygame
+from image_fetch import generate_image_bytes, save_image_bytes, show_image, describe_fetch
 from openai import OpenAI
-import tempfile
-import wave
-import struct
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from speech_stream import speak_streamed, stream_chat_text
+from audio_playback import stream_speech, get_player, play_audio_file
+from answer_prefetch import SpeculativeAnswers, print_report
+from tts_cache import TTSCache, cached_speech
+import voice_input
 
 # Load API key from .env file
 load_dotenv()
@@ -24,81 +26,119 @@ SPEECH_RECOGNITION_AVAILABLE = False
 # Try to import PyAudio - we'll just set the flag to False if it fails
 try:
     import pyaudio  # type: ignore # Suppress Pylance warning
-    p = pyaudio.PyAudio()
     SPEECH_RECOGNITION_AVAILABLE = True
     print("Speech recognition is available!")
 except (ImportError, ModuleNotFoundError):
     print("PyAudio not installed. Running in text-only mode.")
 
-# Initialize pygame mixer for audio playback
-pygame.mixer.init()
+# PyAudio probes every audio device when it starts, so only do that on first recording
+_pyaudio_instance = None
 
-# Cache for audio files to avoid regenerating common messages
-audio_cache = {}
+def get_pyaudio():
+    """Return the shared PyAudio instance, creating it on first use."""
+    global _pyaudio_instance
+    if _pyaudio_instance is None:
+        _pyaudio_instance = pyaudio.PyAudio()
+    return _pyaudio_instance
 
-def record_audio(duration=5):
-    """Record audio from the microphone if PyAudio is available."""
+# Persistent cache for audio files so common messages survive restarts
+tts_cache = TTSCache()
+
+# Format recordings are compressed to before upload: "flac", "opus" or "wav"
+UPLOAD_FORMAT = "flac"
+
+# Questions people ask most often, in order of popularity, with the keywords that identify them
+COMMON_QUESTIONS = {
+    "skills": ("What skills did I have?", ["skill", "skills", "talent", "talents", "good at", "abilities"]),
+    "death": ("How did I die?", ["die", "died", "death", "dead", "killed"]),
+    "relationships": ("Tell me about my relationships.", ["relationship", "relationships", "love", "married",
+                                                          "wife", "husband", "partner", "lover", "family"]),
+    "home": ("Where did I live?", ["live", "lived", "home", "house", "country", "city"]),
+    "wealth": ("Was I rich or poor?", ["rich", "poor", "money", "wealth", "wealthy"]),
+}
+
+# Canned lines that are synthesized once at startup and then reused from the cache
+COMMON_MESSAGES = {
+    "welcome": "Welcome to the Past Life Oracle. I will reveal how you looked in your past life and tell your story. Please say your name clearly.",
+    "ask_question": "You can now ask questions about your past life or say exit to end the session.",
+    "farewell": "Thank you for consulting the Past Life Oracle. Farewell!"
+}
+
+def record_audio(duration=5, endpointing=True, oracle_speaking=None):
+    """
+    Record audio from the microphone if PyAudio is available.
+    
+    Args:
+        duration: With endpointing, the longest utterance to capture; without it,
+            the fixed number of seconds to record
+        endpointing: Stop about 300 ms after the speaker stops talking
+        oracle_speaking: Optional callable that is True while the oracle is still
+            answering; the user may then interrupt it by starting to speak
+    
+    Returns:
+        The recording as in-memory WAV bytes, or None if nothing was captured
+    """
     if not SPEECH_RECOGNITION_AVAILABLE:
         return None
     
     try:
-        # Set recording parameters
-        FORMAT = pyaudio.paInt16
-        CHANNELS = 1
-        RATE = 16000
-        CHUNK = 1024
-        
-        # Start recording
+        # Start recording in 30 ms frames so the voice detector can react quickly
         print("Recording... Speak now.")
-        audio = p.open(format=FORMAT, channels=CHANNELS,
-                        rate=RATE, input=True,
-                        frames_per_buffer=CHUNK)
+        audio = get_pyaudio().open(format=pyaudio.paInt16, channels=1,
+                        rate=voice_input.RATE, input=True,
+                        frames_per_buffer=voice_input.FRAME_SAMPLES)
         
-        frames = []
-        for i in range(0, int(RATE / CHUNK * duration)):
-            data = audio.read(CHUNK)
-            frames.append(data)
+        def read_frame():
+            return audio.read(voice_input.FRAME_SAMPLES, exception_on_overflow=False)
         
-        print("Recording finished.")
-        
-        # Stop recording
-        audio.stop_stream()
-        audio.close()
+        try:
+            if endpointing and oracle_speaking:
+                # Barge-in: the user's voice stops the oracle, and we keep
+                # listening for as long as the oracle is still talking
+                player = get_player()
+                pcm, info = voice_input.record_until_silence(
+                    read_frame, max_duration=duration,
+                    vad=voice_input.BargeInVAD(is_playing=player.is_busy),
+                    on_speech_start=player.stop,
+                    hold_open=oracle_speaking
+                )
+                if pcm is None:
+                    print("No speech detected.")
+                    return None
+            elif endpointing:
+                pcm, info = voice_input.record_until_silence(read_frame, max_duration=duration)
+                if pcm is None:
+                    print("No speech detected.")
+                    return None
+            else:
+                frame_count = int(duration * 1000 / voice_input.FRAME_MS)
+                pcm = b"".join(read_frame() for _ in range(frame_count))
+        finally:
+            # Stop recording
+            audio.stop_stream()
+            audio.close()
         
-        # Create a temporary WAV file
-        temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-        wf = wave.open(temp_file.name, 'wb')
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
-        wf.close()
+        print("Recording finished.")
         
-        return temp_file.name
+        return voice_input.pcm_to_wav_bytes(pcm)
     
     except Exception as e:
         print(f"Error recording audio: {e}")
         return None
 
-def transcribe_with_whisper(audio_file_path):
-    """Transcribe audio using OpenAI's Whisper API."""
-    if not audio_file_path:
+def transcribe_with_whisper(wav_bytes):
+    """Transcribe in-memory WAV audio using OpenAI's Whisper API."""
+    if not wav_bytes:
         return None
     
     try:
-        with open(audio_file_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-        
-        # Delete the temporary file
-        try:
-            os.unlink(audio_file_path)
-        except:
-            pass
-            
-        return response.text
+        # Compress the recording before upload to cut the bytes we send
+        text, metrics = voice_input.transcribe_audio(client, wav_bytes, upload_format=UPLOAD_FORMAT)
+        print(f"Uploaded {metrics['uploaded_bytes'] / 1024:.1f} KB as {metrics['file_name']} "
+              f"(WAV was {metrics['wav_bytes'] / 1024:.1f} KB), "
+              f"encode {metrics['encode_seconds'] * 1000:.0f} ms, "
+              f"round trip {metrics['round_trip_seconds']:.2f}s")
+        return text
     
     except Exception as e:
         print(f"Error transcribing audio: {e}")
@@ -108,9 +148,9 @@ def listen_for_name():
     """Listen for the user's name or get it via text input."""
     if SPEECH_RECOGNITION_AVAILABLE:
         print("\nPlease say your name clearly...")
-        audio_file_path = record_audio(duration=3)
-        if audio_file_path:
-            name = transcribe_with_whisper(audio_file_path)
+        recording = record_audio(duration=5)
+        if recording:
+            name = transcribe_with_whisper(recording)
             if name:
                 print(f"I heard your name as: {name}")
                 return name.strip()
@@ -119,13 +159,19 @@ def listen_for_name():
     print("Please type your name:")
     return input("Your name: ")
 
-def listen_to_speech():
-    """Listen to the user's speech or get input via text."""
+def listen_to_speech(oracle_speaking=None):
+    """
+    Listen to the user's speech or get input via text.
+    
+    Args:
+        oracle_speaking: Optional callable that is True while the oracle is still
+            answering the previous question (enables barge-in)
+    """
     if SPEECH_RECOGNITION_AVAILABLE:
         print("\nListening... (Speak your question about your past life)")
-        audio_file_path = record_audio(duration=5)
-        if audio_file_path:
-            text = transcribe_with_whisper(audio_file_path)
+        recording = record_audio(duration=15, oracle_speaking=oracle_speaking)
+        if recording:
+            text = transcribe_with_whisper(recording)
             if text:
                 print(f"You asked: {text}")
                 return text.strip()
@@ -137,22 +183,26 @@ def listen_to_speech():
         print(f"You asked: {question}")
     return question
 
+def build_story_request(name):
+    """Build the chat completion arguments for a past life story."""
+    # Create a prompt for the story generation
+    prompt = f"Create a brief, funny description (2-3 sentences) of who {name} was in their past life. Start with 'You were...' and include their occupation and one amusing detail. Be concise but humorous."
+    
+    return {
+        "model": "gpt-4",
+        "messages": [
+            {"role": "system", "content": "You are a creative storyteller specializing in brief, humorous past life narratives. Keep responses under 75 words."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 100,
+        "temperature": 0.8
+    }
+
 def generate_past_life_story(name):
     """Generate a story about the user's past life."""
     try:
-        # Create a prompt for the story generation
-        prompt = f"Create a brief, funny description (2-3 sentences) of who {name} was in their past life. Start with 'You were...' and include their occupation and one amusing detail. Be concise but humorous."
-        
         # Generate the story using OpenAI's API
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a creative storyteller specializing in brief, humorous past life narratives. Keep responses under 75 words."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=100,
-            temperature=0.8
-        )
+        response = client.chat.completions.create(**build_story_request(name))
         
         # Extract the story from the response
         story = response.choices[0].message.content.strip()
@@ -166,30 +216,66 @@ def generate_past_life_story(name):
         print(f"Error generating past life story: {e}")
         return f"You were a mysterious figure whose story has been lost to time."
 
+def narrate_past_life_story(name):
+    """
+    Stream the past life story and speak it sentence by sentence as it is written.
+    
+    Returns:
+        A tuple of (story, stats) where stats comes from speak_streamed
+    """
+    print(f"\nGenerating a story about {name}'s past life...\n")
+    # Sentences already queued for speech, in case the stream breaks part-way
+    spoken = []
+    def on_sentence(sentence):
+        print(sentence)
+        spoken.append(sentence)
+    
+    try:
+        story, stats = speak_streamed(
+            client, stream_chat_text(client, **build_story_request(name)),
+            speed=1.1, on_sentence=on_sentence
+        )
+        if story:
+            return story, stats
+    except Exception as e:
+        print(f"Error narrating past life story: {e}")
+        if spoken:
+            # Starting over would repeat what the user already heard
+            return " ".join(spoken), {"time_to_first_audio": None, "sentences": len(spoken), "total": None}
+    
+    # Fall back to the regular, non-streamed path
+    story = generate_past_life_story(name)
+    speak_text(story)
+    return story, {"time_to_first_audio": None, "sentences": 0, "total": None}
+
+def build_answer_request(name, story, question):
+    """Build the chat completion arguments for answering a past life question."""
+    # Create a prompt for answering the question
+    prompt = f"""
+    Based on this past life story about {name}:
+    
+    "{story}"
+    
+    Answer this question about their past life: "{question}"
+    
+    Be creative, entertaining, and consistent with the story. Keep your answer VERY BRIEF (1-3 sentences maximum). Be concise but include a humorous detail.
+    """
+    
+    return {
+        "model": "gpt-4",
+        "messages": [
+            {"role": "system", "content": "You are a mystical oracle who can see into people's past lives. You answer questions with brevity, humor, and confidence. Keep responses under 50 words."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 75,
+        "temperature": 0.7
+    }
+
 def answer_past_life_question(name, story, question):
     """Generate an answer to a question about the user's past life."""
     try:
-        # Create a prompt for answering the question
-        prompt = f"""
-        Based on this past life story about {name}:
-        
-        "{story}"
-        
-        Answer this question about their past life: "{question}"
-        
-        Be creative, entertaining, and consistent with the story. Keep your answer VERY BRIEF (1-3 sentences maximum). Be concise but include a humorous detail.
-        """
-        
         # Generate the answer using OpenAI's API
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a mystical oracle who can see into people's past lives. You answer questions with brevity, humor, and confidence. Keep responses under 50 words."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=75,
-            temperature=0.7
-        )
+        response = client.chat.completions.create(**build_answer_request(name, story, question))
         
         # Extract the answer from the response
         answer = response.choices[0].message.content.strip()
@@ -203,41 +289,63 @@ def answer_past_life_question(name, story, question):
         print(f"Error generating answer: {e}")
         return "The mists of time obscure that detail of your past life. Ask another question."
 
+def narrate_past_life_answer(name, story, question):
+    """
+    Stream the answer to a question and speak it sentence by sentence as it is written.
+    
+    Returns:
+        A tuple of (answer, seconds from the question to the first audio)
+    """
+    print("\nOracle's answer:\n")
+    # Sentences already queued for speech, in case the stream breaks part-way
+    spoken = []
+    def on_sentence(sentence):
+        print(sentence)
+        spoken.append(sentence)
+    
+    # The turn this answer belongs to; a barge-in cancels it
+    token = get_player().begin()
+    try:
+        answer, stats = speak_streamed(
+            client, stream_chat_text(client, **build_answer_request(name, story, question)),
+            speed=1.1, on_sentence=on_sentence
+        )
+        if stats["time_to_first_audio"] is not None:
+            print(f"(first audio after {stats['time_to_first_audio']:.2f}s)")
+        if answer:
+            return answer, stats["time_to_first_audio"]
+    except Exception as e:
+        print(f"Error narrating answer: {e}")
+        if spoken:
+            # Starting over would repeat what the user already heard
+            return " ".join(spoken), None
+    
+    if get_player().cancelled(token):
+        # The user interrupted before the first words; don't answer anyway
+        return "", None
+    
+    # Fall back to the regular, non-streamed path
+    start = time.perf_counter()
+    answer = answer_past_life_question(name, story, question)
+    answer_done = time.perf_counter() - start
+    time_to_first_audio = speak_text(answer)
+    return answer, None if time_to_first_audio is None else answer_done + time_to_first_audio
+
 def generate_audio_narration(text):
-    """Generate audio narration for text with caching for common messages."""
+    """Generate audio narration for text, reusing cached audio for repeated lines."""
     try:
-        # Check if we already have this text in our cache
-        if text in audio_cache:
-            print("Using cached audio...")
-            return audio_cache[text]
-        
-        print("Generating audio... (this may take a moment)")
-        
-        # Create output directory if it doesn't exist
-        os.makedirs("output_audio", exist_ok=True)
-        
-        # Generate a timestamp for the filename
-        timestamp = int(time.time())
-        audio_path = f"output_audio/oracle_response_{timestamp}.mp3"
+        print("Preparing audio... (this may take a moment)")
         
-        # Generate audio using OpenAI's Text-to-Speech API
-        # Use the faster tts-1-hd model for better performance
-        response = client.audio.speech.create(
+        # Generate audio using OpenAI's Text-to-Speech API (or reuse it from the cache)
+        # Use the faster tts-1 model for better performance
+        audio_path = cached_speech(
+            client, tts_cache, text.strip(),
             model="tts-1",
             voice="onyx",  # Using a deep, dramatic voice for storytelling
-            input=text,
             speed=1.1  # Slightly faster speech for better pacing
         )
         
-        # Save the audio file
-        with open(audio_path, 'wb') as f:
-            for chunk in response.iter_bytes(chunk_size=1024 * 1024):
-                f.write(chunk)
-        
-        print(f"Audio narration has been generated and saved to {audio_path}")
-        
-        # Cache this audio for future use
-        audio_cache[text] = audio_path
+        print(f"Audio narration is ready at {audio_path}")
         
         return audio_path
     
@@ -252,19 +360,98 @@ def play_audio(audio_path):
         if audio_path and os.path.exists(audio_path):
             print(f"Playing audio narration...")
             
-            # Use a separate channel for better performance
-            sound = pygame.mixer.Sound(audio_path)
-            channel = pygame.mixer.Channel(0)
-            channel.play(sound)
-            
-            # Wait for the audio to finish playing with a more responsive loop
-            while channel.get_busy():
-                pygame.time.Clock().tick(30)  # Higher tick rate for more responsive UI
+            # The playback service decodes and plays on its own thread;
+            # we just wait until it's done (or the user interrupts it)
+            play_audio_file(audio_path)
     
     except Exception as e:
         print(f"Error playing audio: {e}")
         print("Continuing without audio playback...")
 
+def speak_text(text):
+    """
+    Speak text, streaming the audio into the mixer while it is still downloading.
+    
+    Returns:
+        The time to first audio in seconds, or None if nothing played
+    """
+    try:
+        # Repeated lines come straight from the cache, new ones are saved to it in the background
+        return stream_speech(client, text.strip(), model="tts-1", voice="onyx", speed=1.1, cache=tts_cache)
+    except Exception as e:
+        print(f"Error streaming audio: {e}")
+    
+    # Fall back to generating the whole file first
+    audio_path = generate_audio_narration(text)
+    if audio_path:
+        play_audio(audio_path)
+    return None
+
+def start_speculative_answers(name, story, top_n):
+    """
+    Start answering the most common questions about this story in the background.
+    
+    Args:
+        name: The user's name
+        story: Their past life story
+        top_n: How many of COMMON_QUESTIONS to prefetch
+    
+    Returns:
+        A running SpeculativeAnswers
+    """
+    def answer(question):
+        # Quiet versions of answer_past_life_question/generate_audio_narration, so
+        # background work doesn't print into the conversation
+        response = client.chat.completions.create(**build_answer_request(name, story, question))
+        tokens = response.usage.total_tokens if response.usage else 0
+        return response.choices[0].message.content.strip(), tokens
+    
+    def synthesize(text):
+        return cached_speech(client, tts_cache, text, model="tts-1", voice="onyx", speed=1.1)
+    
+    speculative = SpeculativeAnswers(COMMON_QUESTIONS, answer, synthesize, top_n=top_n)
+    speculative.start()
+    return speculative
+
+def answer_question(name, story, question, streaming, speculative=None):
+    """Answer a question out loud, using a prefetched answer when one matches."""
+    start = time.perf_counter()
+    
+    prefetched = speculative.take(question) if speculative else None
+    if prefetched:
+        answer, audio_path = prefetched
+        print("\nOracle's answer (foreseen):")
+        print("\n" + answer + "\n")
+        # Measured to the first audio, like a miss, not just to the lookup
+        if audio_path:
+            play_audio_file(audio_path, wait=False)
+            time_to_first_audio = time.perf_counter() - start
+            get_player().wait()
+        else:
+            answer_done = time.perf_counter() - start
+            time_to_first_audio = speak_text(answer)
+            if time_to_first_audio is not None:
+                time_to_first_audio += answer_done
+        speculative.record(True, time_to_first_audio)
+        return answer
+    
+    if streaming:
+        # Speak the answer sentence by sentence as it is written
+        answer, time_to_first_audio = narrate_past_life_answer(name, story, question)
+    else:
+        # Generate an answer to the question
+        answer = answer_past_life_question(name, story, question)
+        
+        # Speak the answer while its audio is still downloading
+        answer_done = time.perf_counter() - start
+        time_to_first_audio = speak_text(answer)
+        if time_to_first_audio is not None:
+            time_to_first_audio += answer_done
+    
+    if speculative:
+        speculative.record(False, time_to_first_audio)
+    return answer
+
 def generate_past_life_face(name):
     """Generate an image of how the person looked in their past life."""
     # Create a more concise prompt for faster generation
@@ -273,36 +460,22 @@ def generate_past_life_face(name):
     print("\nGenerating your past life appearance... (this may take a moment)")
     
     try:
-        # Generate the image using DALL-E with optimized settings
-        response = client.images.generate(
-            prompt=prompt,
-            n=1,
-            size="512x512"  # Smaller size for faster generation
-        )
-        
-        # Get the image URL
-        image_url = response.data[0].url
-        
-        # Download the image
-        print("Downloading image...")
-        image_response = requests.get(image_url)
-        image = Image.open(BytesIO(image_response.content))
+        # Generate the image using DALL-E with optimized settings; requesting
+        # the bytes inline saves a separate download round-trip
+        image_bytes, fetch_stats = generate_image_bytes(client, prompt, size="512x512")  # Smaller size for faster generation
+        print(f"Image received: {describe_fetch(fetch_stats)}")
         
         # Create output directory if it doesn't exist
         os.makedirs("oracle_symbols", exist_ok=True)
         
         # Save the image with a timestamp to avoid overwriting
         timestamp = int(time.time())
-        image_path = f"oracle_symbols/{name}_past_life_{timestamp}.png"
-        image.save(image_path)
+        image_path = save_image_bytes(image_bytes, f"oracle_symbols/{name}_past_life_{timestamp}")
         
         print(f"Past life appearance has been saved to {image_path}")
         
         # Display the image if in an environment that supports it
-        try:
-            image.show()
-        except Exception as e:
-            print(f"Note: Could not display the image automatically. Please open {image_path} to view it.")
+        show_image(image_bytes, image_path)
         
         return image_path
     
@@ -312,24 +485,113 @@ def generate_past_life_face(name):
         return None
 
 def speak_welcome_message():
-    """Generate and play a welcome message."""
-    welcome_message = """
-    Welcome to the Past Life Oracle with Voice Interaction. 
-    I will reveal how you looked in your past life and tell your story.
-    You will receive both a visual representation and an audio narration.
-    After hearing your story, you can ask questions using your voice.
-    Let's begin. Please say your name clearly.
+    """Generate and play the welcome message (the same clip main() warms up)."""
+    speak_text(COMMON_MESSAGES["welcome"])
+
+def warm_up_common_messages(executor):
     """
+    Start synthesizing every canned message at once.
     
-    # Generate audio for the welcome message
-    audio_path = generate_audio_narration(welcome_message)
+    Each clip is persisted in the TTS cache, so after the first run this only
+    costs a cache lookup.
     
-    # Play the welcome message
+    Returns:
+        A dict mapping each message key to a future of its audio path
+    """
+    return {key: executor.submit(generate_audio_narration, message)
+            for key, message in COMMON_MESSAGES.items()}
+
+def play_common_message(common_audio, key):
+    """Play a warmed-up message, waiting for its clip if it is still rendering."""
+    audio_path = common_audio[key].result()
     if audio_path:
         play_audio(audio_path)
 
-def main():
-    """Main function to run the oracle."""
+def answer_in_background(token, name, story, question, streaming, speculative):
+    """Run answer_question on a worker thread, as part of the playback turn token."""
+    # Pinning the turn means a barge-in also silences audio this answer hasn't produced yet
+    get_player().pin(token)
+    try:
+        answer_question(name, story, question, streaming, speculative)
+    except Exception as e:
+        print(f"Error answering question: {e}")
+
+def timed_stage(timings, stage, func, *args):
+    """Run one stage of the oracle and record how long it took in seconds."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+def print_timings(timings):
+    """Print per-stage and end-to-end timings for a past life reveal."""
+    print("\n=== Timings ===")
+    for stage, seconds in timings.items():
+        print(f"{stage:>12}: {seconds:6.2f}s")
+
+def reveal_past_life_sequentially(name):
+    """Generate the story, portrait and narration one after another."""
+    timings = {}
+    start = time.perf_counter()
+    
+    story = timed_stage(timings, "story", generate_past_life_story, name)
+    image_path = timed_stage(timings, "image", generate_past_life_face, name)
+    audio_path = timed_stage(timings, "tts", generate_audio_narration, story)
+    timings["first_audio"] = time.perf_counter() - start
+    
+    # Play the audio narration
+    if audio_path:
+        timed_stage(timings, "playback", play_audio, audio_path)
+    
+    timings["total"] = time.perf_counter() - start
+    print_timings(timings)
+    return story, image_path
+
+def reveal_past_life_concurrently(name, streaming=False):
+    """
+    Generate the story, portrait and narration concurrently.
+    
+    The portrait starts at the same time as the story, the narration is
+    synthesized as soon as the story text exists, and it plays while the
+    portrait is still rendering. With streaming=True the story is spoken
+    sentence by sentence while it is still being written.
+    """
+    timings = {}
+    start = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The image is the slowest call, so it gets a head start on its own thread
+        image_future = executor.submit(timed_stage, timings, "image", generate_past_life_face, name)
+        
+        if streaming:
+            story, stats = timed_stage(timings, "story+speech", narrate_past_life_story, name)
+            if stats["time_to_first_audio"] is not None:
+                timings["first_audio"] = stats["time_to_first_audio"]
+        else:
+            story = timed_stage(timings, "story", generate_past_life_story, name)
+            
+            # Speak the story while the portrait finishes, starting as soon as audio arrives
+            story_done = time.perf_counter()
+            time_to_first_audio = timed_stage(timings, "speech", speak_text, story)
+            if time_to_first_audio is not None:
+                timings["first_audio"] = story_done - start + time_to_first_audio
+        
+        image_path = image_future.result()
+    
+    timings["total"] = time.perf_counter() - start
+    print_timings(timings)
+    return story, image_path
+
+def main(concurrent=True, streaming=True, speculate=0):
+    """
+    Main function to run the oracle.
+    
+    Args:
+        concurrent: Overlap warm-up, story, portrait and narration
+        streaming: Speak the story and answers sentence by sentence as they are written
+        speculate: Prefetch answers to this many of the most common questions (0 to disable)
+    """
     if SPEECH_RECOGNITION_AVAILABLE:
         print("=== Past Life Oracle with Voice Interaction ===")
     else:
@@ -338,21 +600,19 @@ def main():
     print("This oracle will reveal how you looked in your past life and tell your story.")
     print("You will receive both a visual representation and an audio narration.")
     
-    # Pre-cache common messages
-    common_messages = {
-        "welcome": "Welcome to the Past Life Oracle. I will reveal how you looked in your past life and tell your story. Please say your name clearly.",
-        "ask_question": "You can now ask questions about your past life or say exit to end the session.",
-        "farewell": "Thank you for consulting the Past Life Oracle. Farewell!"
-    }
+    # Pre-generate audio for common messages, all at once (cached on disk after the first run)
+    warmup_start = time.perf_counter()
+    warmup_pool = ThreadPoolExecutor(max_workers=len(COMMON_MESSAGES) if concurrent else 1)
+    common_audio = warm_up_common_messages(warmup_pool)
     
-    # Pre-generate audio for common messages
-    for key, message in common_messages.items():
-        if key not in audio_cache:
-            audio_cache[key] = generate_audio_narration(message)
+    if not concurrent:
+        # The original behaviour: every message is ready before anything plays
+        wait(common_audio.values())
     
-    # Play welcome message
-    if "welcome" in audio_cache:
-        play_audio(audio_cache["welcome"])
+    # Play the welcome message as soon as its own clip is ready
+    common_audio["welcome"].result()
+    print(f"Cold start to first audio: {time.perf_counter() - warmup_start:.2f}s")
+    play_common_message(common_audio, "welcome")
     
     # Get user's name through voice
     name = listen_for_name()
@@ -360,18 +620,13 @@ def main():
     # Start image generation in parallel with story generation
     print("\nGenerating your past life details...")
     
-    # Generate a story about the past life
-    story = generate_past_life_story(name)
-    
-    # Generate the past life face image
-    image_path = generate_past_life_face(name)
-    
-    # Generate audio narration of the story
-    audio_path = generate_audio_narration(story)
+    if concurrent:
+        story, image_path = reveal_past_life_concurrently(name, streaming=streaming)
+    else:
+        story, image_path = reveal_past_life_sequentially(name)
     
-    # Play the audio narration
-    if audio_path:
-        play_audio(audio_path)
+    # Use the idle time while the user thinks of a question to answer the likely ones
+    speculative = start_speculative_answers(name, story, speculate) if speculate else None
     
     # Voice interaction loop for follow-up questions
     print("\n=== Voice Interaction Mode ===")
@@ -380,51 +635,85 @@ def main():
     print("Say 'exit' or 'quit' to end the session.")
     
     # Use cached prompt for asking questions
-    if "ask_question" in audio_cache:
-        play_audio(audio_cache["ask_question"])
+    play_common_message(common_audio, "ask_question")
     
     # Limit the number of follow-up questions to prevent lag
     max_questions = 5
     question_count = 0
     
+    # With a microphone, answers are spoken on a background thread so we can
+    # listen for the next question (and let the user interrupt) meanwhile
+    player = get_player()
+    answer_thread = None
+    
     while question_count < max_questions:
-        # Listen for the user's question
-        question = listen_to_speech()
+        # Listen for the user's question, even while the last answer is still playing
+        oracle_speaking = answer_thread.is_alive if answer_thread else None
+        question = listen_to_speech(oracle_speaking=oracle_speaking)
+        
+        if answer_thread:
+            # Either the answer finished or the user's voice interrupted it
+            player.stop()
+            answer_thread.join()
+            answer_thread = None
         
         # Check if the user wants to exit
         if question and any(exit_word in question.lower() for exit_word in ["exit", "quit", "stop", "end"]):
             print("\nThank you for consulting the Past Life Oracle. Farewell!")
             
             # Use cached farewell message
-            if "farewell" in audio_cache:
-                play_audio(audio_cache["farewell"])
+            play_common_message(common_audio, "farewell")
             
             break
         
         # If a question was recognized, answer it
         if question:
-            # Generate an answer to the question
-            answer = answer_past_life_question(name, story, question)
-            
-            # Generate audio narration of the answer
-            answer_audio_path = generate_audio_narration(answer)
-            
-            # Play the audio narration
-            if answer_audio_path:
-                play_audio(answer_audio_path)
+            if SPEECH_RECOGNITION_AVAILABLE:
+                answer_thread = threading.Thread(
+                    target=answer_in_background,
+                    args=(player.begin(), name, story, question, streaming, speculative),
+                    daemon=True
+                )
+                answer_thread.start()
+            else:
+                answer_question(name, story, question, streaming, speculative)
             
             question_count += 1
             
             # If we've reached the maximum number of questions
             if question_count >= max_questions:
+                # Let the last answer finish before saying goodbye
+                if answer_thread:
+                    answer_thread.join()
+                
                 print("\nYou've reached the maximum number of questions for this session.")
                 print("Thank you for consulting the Past Life Oracle. Farewell!")
                 
                 # Use cached farewell message
-                if "farewell" in audio_cache:
-                    play_audio(audio_cache["farewell"])
+                play_common_message(common_audio, "farewell")
                 
                 break
+    
+    warmup_pool.shutdown()
+    if speculative:
+        speculative.shutdown()
+        print_report(speculative.report())
+    
+    # Show how much text-to-speech the cache saved this session
+    cache_stats = tts_cache.stats()
+    print(f"\nAudio cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+          f"{cache_stats['entries']} clips ({cache_stats['bytes'] / 1024:.0f} KB)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Past Life Oracle with Voice Interaction")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Warm up messages and generate story, image and narration one after another (for timing comparison)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Wait for the full text before synthesizing speech instead of streaming sentences")
+    parser.add_argument("--upload-format", choices=["flac", "opus", "wav"], default=UPLOAD_FORMAT,
+                        help="How recordings are compressed before being sent to Whisper (needs ffmpeg)")
+    parser.add_argument("--speculate", type=int, default=0, metavar="N",
+                        help="Prefetch answers to the N most common questions while you think (costs extra tokens)")
+    args = parser.parse_args()
+    UPLOAD_FORMAT = args.upload_format
+    main(concurrent=not args.sequential, streaming=not args.no_stream, speculate=args.speculate)
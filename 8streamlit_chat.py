@@ -2,6 +2,9 @@ import streamlit as st
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from api_limiter import RequestScheduler
+from chat_context import ChatContext
 
 # Set page config and custom CSS
 st.set_page_config(
@@ -96,8 +99,27 @@ st.markdown("""
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# One OpenAI client and one request scheduler for the whole server, so every
+# session shares the connection pool and the API's rate limits
+@st.cache_resource
+def get_openai_client(api_key):
+    return OpenAI(api_key=api_key)
+
+@st.cache_resource
+def get_scheduler():
+    return RequestScheduler()
+
+# Conversation summaries are updated on this pool, in the background
+@st.cache_resource
+def get_summary_pool():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+client = get_openai_client(os.getenv("OPENAI_API_KEY"))
+scheduler = get_scheduler()
+
+def new_chat_context():
+    """Recent turns verbatim, older ones folded into a rolling summary, within a token budget."""
+    return ChatContext(client, get_summary_pool(), scheduler=scheduler)
 
 # Create a container for better layout
 chat_container = st.container()
@@ -109,6 +131,8 @@ with chat_container:
     # Initialize chat history in session state if it doesn't exist
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "chat_context" not in st.session_state:
+        st.session_state.chat_context = new_chat_context()
 
     # Display chat history
     for message in st.session_state.messages:
@@ -129,14 +153,14 @@ with chat_container:
             message_placeholder = st.empty()
             full_response = ""
             
-            # Send all previous messages plus current prompt to maintain context
-            response = client.chat.completions.create(
+            # Send the latest turns plus a summary of the earlier ones, so the request
+            # stays the same size however long the chat gets (queued behind the
+            # shared concurrency cap and rate limit if the server is busy)
+            response = scheduler.stream(
+                "chat",
+                client.chat.completions.with_raw_response.create,
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": m["role"], "content": m["content"]} 
-                    for m in st.session_state.messages
-                ],
-                stream=True
+                messages=st.session_state.chat_context.build_messages(st.session_state.messages)
             )
             
             # Stream the response with a typing indicator
@@ -145,6 +169,7 @@ with chat_container:
                     full_response += chunk.choices[0].delta.content
                     message_placeholder.markdown(full_response + "▌")
             message_placeholder.markdown(full_response)
+            st.caption(st.session_state.chat_context.describe())
         
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": full_response})
@@ -154,4 +179,5 @@ with chat_container:
     with col2:
         if st.button("Clear Chat"):
             st.session_state.messages = []
+            st.session_state.chat_context = new_chat_context()
             st.rerun()
@@ -1,50 +1,79 @@
 import streamlit as st
 import os
 import time
+from collections import deque
 from openai import OpenAI
-import requests
-from PIL import Image
-from io import BytesIO
+from image_fetch import generate_image_variants, sniff_image_type, describe_fetch
+from symbol_cache import SymbolCache, describe_age
+from symbol_jobs import SymbolJobQueue, FAILED, DONE
+from api_limiter import RequestScheduler
+from symbol_gallery import list_symbols, get_thumbnail, paginate
+
+# Only the most recent debug messages are kept per session
+DEBUG_LOG_SIZE = 50
+
+# Gallery layout: thumbnails per row and per page
+GALLERY_COLUMNS = 4
+GALLERY_PER_PAGE = 12
+
+# Most alternative symbols a visitor can ask for at once
+MAX_VARIANTS = 4
 
 # Initialize session state for debugging
 if 'debug_info' not in st.session_state:
-    st.session_state.debug_info = []
+    st.session_state.debug_info = deque(maxlen=DEBUG_LOG_SIZE)
+    st.session_state.debug_info.append("Application starting")
+
+# Names whose symbols were revealed in this session
+if "generated_symbols" not in st.session_state:
+    st.session_state.generated_symbols = []
+
+# The variant each name's visitor chose to keep, when several were generated
+if "kept_symbols" not in st.session_state:
+    st.session_state.kept_symbols = {}
 
 def log_debug(message):
     st.session_state.debug_info.append(message)
 
-# Display any startup debug information
-st.write("Starting Sacred Symbol Oracle...")
-log_debug("Application starting")
-
-# Function to get API key
-def get_api_key():
-    # First try environment variable
+# Everything below that doesn't depend on the visitor is resolved once per
+# server process, not on every rerun
+@st.cache_resource
+def get_config():
+    """
+    Find the API key, first in environment variables, then in Streamlit secrets.
+    
+    Returns:
+        A dict with api_key (or None) and where it was found, for the debug log
+    """
     api_key = os.getenv("OPENAI_API_KEY")
     if api_key:
-        log_debug("Found API key in environment variables")
-        return api_key
+        return {"api_key": api_key, "source": "Found API key in environment variables"}
         
-    # Then try streamlit secrets
     try:
         if 'openai' in st.secrets:
-            log_debug("Found API key in Streamlit secrets")
-            return st.secrets['openai']['OPENAI_API_KEY']
+            return {"api_key": st.secrets['openai']['OPENAI_API_KEY'],
+                    "source": "Found API key in Streamlit secrets"}
     except Exception as e:
-        log_debug(f"Error reading Streamlit secrets: {str(e)}")
+        return {"api_key": None, "source": f"Error reading Streamlit secrets: {str(e)}"}
     
-    log_debug("No API key found")
-    return None
+    return {"api_key": None, "source": "No API key found"}
 
-# Display debug information
-st.sidebar.markdown("### 🔧 Debug Information")
-for msg in st.session_state.debug_info:
-    st.sidebar.text(msg)
+@st.cache_resource
+def get_openai_client(api_key):
+    """One client (and connection pool) per API key, shared by every session."""
+    return OpenAI(api_key=api_key)
 
-# Get API key
-api_key = get_api_key()
+@st.cache_resource
+def get_scheduler():
+    """Concurrency caps, rate limits and in-flight requests shared by every session."""
+    return RequestScheduler()
+
+config = get_config()
+api_key = config["api_key"]
 
 if not api_key:
+    # Only a found key is kept for the server's lifetime; look again next run
+    get_config.clear()
     st.error("""
     ⚠️ OpenAI API key not found! 
     
@@ -59,89 +88,177 @@ if not api_key:
     st.stop()
 
 try:
-    client = OpenAI(api_key=api_key)
-    log_debug("OpenAI client initialized successfully")
+    client = get_openai_client(api_key)
 except Exception as e:
     st.error(f"Error initializing OpenAI client: {str(e)}")
     log_debug(f"OpenAI client error: {str(e)}")
     st.stop()
 
-# Debug information
-st.write("Debug Info:")
-st.write(f"Current file: {__file__}")
-st.write(f"Streamlit version: {st.__version__}")
-
-# Set page title and description
-st.title("✨ Sacred Symbol Oracle")
-st.markdown("""
-This oracle will generate a unique sacred symbol based on your name.
-The symbol contains hidden elements that hint at a personal cosmic message.
-""")
-
-def generate_sacred_symbol(name):
-    """Generate a sacred symbol based on the user's name."""
-    with st.status("🔮 Generating your sacred symbol...", expanded=True) as status:
-        # Create a detailed prompt for the image generation
-        prompt = f"""Generate a unique, sacred symbol that represents a personal cosmic message for {name}. 
-        The glyph should resemble ancient runes, celestial diagrams, or alchemical sigils.
-        It should include hidden elements that hint at an interpretation, with layered, intersecting lines and geometric symmetry.
-        The symbol should be mystical, intricate, and personalized to the essence of the name {name}.
-        Use a dark background with luminous, glowing lines in gold, silver, or ethereal blue.
-        The symbol should appear as if it was discovered in an ancient grimoire or celestial map."""
-        
-        try:
-            status.write("Channeling cosmic energies...")
-            
-            # Generate the image using DALL-E
-            response = client.images.generate(
-                prompt=prompt,
-                n=1,
-                size="1024x1024"
-            )
-            
-            # Get the image URL
-            image_url = response.data[0].url
-            
-            status.write("Manifesting symbol...")
-            
-            # Download the image
-            image_response = requests.get(image_url)
-            image = Image.open(BytesIO(image_response.content))
-            
-            # Create output directory if it doesn't exist
-            os.makedirs("oracle_symbols", exist_ok=True)
-            
-            # Save the image with a timestamp to avoid overwriting
-            timestamp = int(time.time())
-            image_path = f"oracle_symbols/{name}_sacred_symbol_{timestamp}.png"
-            image.save(image_path)
-            
-            status.write("Symbol has been manifested!")
-            status.update(label="✨ Sacred symbol generated!", state="complete")
-            
-            return image, image_path
-            
-        except Exception as e:
-            st.error(f"Error generating sacred symbol: {e}")
-            return None, None
+if "client_logged" not in st.session_state:
+    st.session_state.client_logged = True
+    log_debug(config["source"])
+    log_debug("OpenAI client initialized successfully")
+
+def show_header():
+    """Page title and description."""
+    st.title("✨ Sacred Symbol Oracle")
+    st.markdown("""
+    This oracle will generate a unique sacred symbol based on your name.
+    The symbol contains hidden elements that hint at a personal cosmic message.
+    """)
+
+show_header()
+
+@st.cache_resource
+def get_symbol_cache():
+    """One symbol index shared by every session of the app."""
+    return SymbolCache()
+
+def generate_sacred_symbol(job):
+    """
+    Generate a sacred symbol (or several to choose from) for job.name on a background worker.
+    
+    Runs outside the script, so it reports progress with job.update instead
+    of Streamlit calls, and hands over each variant in job.partial_results as
+    soon as it is saved.
+    
+    Returns:
+        A dict with the prompt, the variants (each with image_bytes, image_path
+        and seconds) and set_stats for the whole set (None if served from the cache)
+    """
+    name = job.name
+    client = job.options["client"]
+    scheduler = job.options["scheduler"]
+    symbol_cache = job.options["symbol_cache"]
+    variant_count = job.options.get("variants", 1)
+    
+    # Create a detailed prompt for the image generation
+    prompt = f"""Generate a unique, sacred symbol that represents a personal cosmic message for {name}. 
+    The glyph should resemble ancient runes, celestial diagrams, or alchemical sigils.
+    It should include hidden elements that hint at an interpretation, with layered, intersecting lines and geometric symmetry.
+    The symbol should be mystical, intricate, and personalized to the essence of the name {name}.
+    Use a dark background with luminous, glowing lines in gold, silver, or ethereal blue.
+    The symbol should appear as if it was discovered in an ancient grimoire or celestial map."""
+    
+    # Asking for alternatives always generates new ones
+    use_cache = variant_count == 1 and not job.regenerate
+    cached_path, age = symbol_cache.get(name, prompt) if use_cache else (None, None)
+    if cached_path:
+        job.update(f"The oracle revealed this symbol {describe_age(age)} ago")
+        with open(cached_path, "rb") as f:
+            variant = {"index": 0, "image_bytes": f.read(), "image_path": cached_path, "seconds": None}
+        return {"prompt": prompt, "variants": [variant], "set_stats": None}
+    
+    job.update("Channeling cosmic energies...")
+    
+    def keep_variant(index, image_bytes, fetch_stats):
+        # Save each image under a unique name as it arrives; of several
+        # variants, only the one the visitor keeps is served for this name
+        if variant_count == 1:
+            image_path = symbol_cache.put(name, prompt, image_bytes)
+        else:
+            image_path = symbol_cache.save(name, image_bytes)
+        job.partial_results.append({"index": index, "image_bytes": image_bytes, "image_path": image_path,
+                                    "seconds": fetch_stats["total_seconds"]})
+        if variant_count == 1:
+            job.update(f"Symbol has been manifested! ({describe_fetch(fetch_stats)})")
+        else:
+            job.update(f"{len(job.partial_results)} of {variant_count} symbols manifested...")
+    
+    # Generate the images using DALL-E; the bytes come back in the same response
+    variants, set_stats = generate_image_variants(client, prompt, variant_count, size="1024x1024",
+                                                  scheduler=scheduler, on_variant=keep_variant)
+    if not job.partial_results:
+        raise RuntimeError("The oracle could not manifest any symbol")
+    if variant_count > 1:
+        job.update(f"{len(job.partial_results)} symbols have been manifested! Choose the one that speaks to you.")
+    
+    return {"prompt": prompt, "variants": sorted(job.partial_results, key=lambda variant: variant["index"]),
+            "set_stats": set_stats}
+
+@st.cache_resource
+def get_symbol_jobs():
+    # A visitor asking for several variants must not get another's single symbol
+    return SymbolJobQueue(generate_sacred_symbol, max_workers=2, key_options=("client", "variants"))
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id):
+    job = get_symbol_jobs().get(job_id)
+    if job is None or not job.active:
+        # Finished: rerun the page so it shows the result
+        st.rerun()
+    with st.status(f"🔮 Generating {job.name}'s sacred symbol... ({time.time() - job.created:.0f}s)", expanded=True):
+        st.write(job.message)
+        # Variants appear as each one finishes
+        variants = list(job.partial_results)
+        if variants and job.options.get("variants", 1) > 1:
+            columns = st.columns(MAX_VARIANTS)
+            for i, variant in enumerate(variants):
+                with columns[i % MAX_VARIANTS]:
+                    st.image(variant["image_bytes"], caption=f"Variant {variant['index'] + 1} · "
+                             f"{variant['seconds']:.1f}s", use_container_width=True)
+
+def keep_symbol(name, prompt, image_path):
+    """Serve the chosen variant for this name from now on."""
+    get_symbol_cache().remember(name, prompt, image_path)
+    st.session_state.kept_symbols[name] = image_path
 
 # Create input form
 with st.form("oracle_form"):
     name = st.text_input("Enter your name:", placeholder="Your name here...")
+    regenerate = st.checkbox("Generate a new symbol even if the oracle has revealed one for this name")
+    variant_count = st.number_input("Symbols to choose from", min_value=1, max_value=MAX_VARIANTS, value=1)
     generate_button = st.form_submit_button("Generate Sacred Symbol")
 
-# Generate symbol when form is submitted
+# Queue the symbol when the form is submitted; the page only keeps the job id
 if generate_button and name:
-    image, image_path = generate_sacred_symbol(name)
+    job_id = get_symbol_jobs().submit(name, regenerate=regenerate, client=client, scheduler=get_scheduler(),
+                                      symbol_cache=get_symbol_cache(), variants=int(variant_count))
+    st.session_state.job_id = job_id
+    # Also in the URL, so a refresh reattaches to the same job
+    st.query_params["job"] = job_id
+    log_debug(f"Queued job {job_id} for {name} ({variant_count} variant{'s' if variant_count > 1 else ''})")
+
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+job = get_symbol_jobs().get(job_id) if job_id else None
+
+if job and job.active:
+    show_job_progress(job.id)
+elif job and job.status == FAILED:
+    st.error(f"Error generating sacred symbol: {job.error}")
+elif job and job.status == DONE:
+    variants = job.result["variants"]
+    set_stats = job.result["set_stats"]
+    
+    if job.name not in st.session_state.generated_symbols:
+        st.session_state.generated_symbols.append(job.name)
+    st.success(job.message)
+    if set_stats and set_stats["n"] > 1:
+        st.caption(f"{set_stats['n']} variants by {set_stats['mode']}: first after "
+                   f"{set_stats['first_seconds']:.1f}s, all after {set_stats['total_seconds']:.1f}s"
+                   + (f", {set_stats['failed']} failed" if set_stats["failed"] else ""))
+        log_debug(f"Variant set for {job.name}: {set_stats}")
+    
+    chosen = variants[0]
+    if len(variants) > 1:
+        # Let the visitor pick one of the alternatives
+        columns = st.columns(len(variants))
+        for column, variant in zip(columns, variants):
+            column.image(variant["image_bytes"], caption=f"Variant {variant['index'] + 1} · "
+                         f"{variant['seconds']:.1f}s", use_container_width=True)
+        pick = st.radio("Choose your symbol", range(len(variants)), horizontal=True,
+                        format_func=lambda i: f"Variant {variants[i]['index'] + 1}", key=f"pick_{job.id}")
+        chosen = variants[pick]
+    image_bytes, image_path = chosen["image_bytes"], chosen["image_path"]
     
-    if image and image_path:
+    if image_bytes and image_path:
         # Display the image
-        st.image(image, caption=f"Sacred Symbol for {name}", use_container_width=True)
+        st.image(image_bytes, caption=f"Sacred Symbol for {job.name}", use_container_width=True)
         
         # Display interpretation
         st.markdown("### 🌟 Interpretation of Your Sacred Symbol")
         st.markdown(f"""
-        This unique cosmic glyph contains elements that resonate with **{name}'s** spiritual essence.
+        This unique cosmic glyph contains elements that resonate with **{job.name}'s** spiritual essence.
         
         - The intersecting lines represent the convergence of past, present, and future paths
         - Hidden within its geometry are symbols of personal strength and cosmic connection
@@ -151,19 +268,21 @@ if generate_button and name:
         _Meditate on this symbol to reveal deeper meanings unique to your path._
         """)
         
-        # Add download button
-        with open(image_path, "rb") as file:
-            btn = st.download_button(
-                label="Download Your Sacred Symbol",
-                data=file,
-                file_name=os.path.basename(image_path),
-                mime="image/png"
-            )
+        # Add download button, from the same bytes the image was shown and saved from
+        mime_type, extension = sniff_image_type(image_bytes)
+        btn = st.download_button(
+            label="Download Your Sacred Symbol",
+            data=image_bytes,
+            file_name=os.path.splitext(os.path.basename(image_path))[0] + extension,
+            mime=mime_type
+        )
+        
+        if len(variants) > 1:
+            if st.session_state.kept_symbols.get(job.name) == image_path:
+                st.caption("✨ The oracle will reveal this symbol when you return")
+            else:
+                st.button("Keep This Symbol", on_click=keep_symbol, args=(job.name, job.result["prompt"], image_path))
             
-# Add session history
-if "generated_symbols" not in st.session_state:
-    st.session_state.generated_symbols = []
-
 # Display previous generations in a sidebar
 with st.sidebar:
     st.markdown("### 📜 Previous Symbols")
@@ -172,7 +291,60 @@ with st.sidebar:
             st.markdown(f"- {prev_name}")
     else:
         st.markdown("_No symbols generated yet in this session_")
+    st.caption("Every symbol revealed so far is in the gallery on the main page.")
+
+@st.cache_data(show_spinner=False)
+def list_gallery(directory, modified):
+    """The folder listing; modified (the folder's mtime) makes it refresh when a symbol is added."""
+    return list_symbols(directory)
+
+@st.dialog("✨ Sacred Symbol", width="large")
+def show_full_symbol(symbol):
+    """The full-resolution image, only read from disk when a visitor asks for it."""
+    st.image(symbol["path"], caption=f"Sacred Symbol for {symbol['name']}", use_container_width=True)
+
+def set_gallery_page(page):
+    st.session_state.gallery_page = page
+
+@st.fragment
+def show_gallery():
+    """Past symbols from oracle_symbols/, a page of thumbnails at a time."""
+    if not st.toggle("🖼️ Show the gallery of past symbols", value=False):
+        return
+    directory = get_symbol_cache().directory
+    symbols = list_gallery(directory, os.stat(directory).st_mtime_ns)
+    if not symbols:
+        st.markdown("_No symbols have been revealed yet_")
+        return
+    
+    # Only this page's thumbnails are read (and made, the first time)
+    visible, page, page_count = paginate(symbols, st.session_state.get("gallery_page", 1), GALLERY_PER_PAGE)
+    columns = st.columns(GALLERY_COLUMNS)
+    for i, symbol in enumerate(visible):
+        with columns[i % GALLERY_COLUMNS]:
+            st.image(get_thumbnail(symbol["path"]), caption=symbol["name"], use_container_width=True)
+            if st.button("View", key=f"view_{os.path.basename(symbol['path'])}"):
+                show_full_symbol(symbol)
+    
+    # Page changes happen in callbacks, so the fragment's rerun already shows the new page
+    newer, position, older = st.columns([1, 2, 1])
+    newer.button("← Newer", disabled=page <= 1, on_click=set_gallery_page, args=(page - 1,))
+    position.markdown(f"Page {page} of {page_count} · {len(symbols)} symbols")
+    older.button("Older →", disabled=page >= page_count, on_click=set_gallery_page, args=(page + 1,))
+
+show_gallery()
+
+def show_footer():
+    st.markdown("---")
+    st.markdown("_🔮 Created with mystical algorithms and cosmic wisdom_")
 
 # Footer
-st.markdown("---")
-st.markdown("_🔮 Created with mystical algorithms and cosmic wisdom_")
+show_footer()
+
+# Debug information, only rendered when asked for
+with st.sidebar:
+    if st.toggle("🔧 Debug Information", value=False):
+        st.caption(f"Current file: {__file__}")
+        st.caption(f"Streamlit version: {st.__version__}")
+        # One element for the whole log instead of one per line
+        st.code("\n".join(st.session_state.debug_info), language=None)
@@ -0,0 +1,161 @@
+"""
+Speculative prefetching of likely follow-up answers for the voice oracles.
+
+While the question prompt plays and the user is recording a question, the
+oracle has nothing to do. This module uses that idle time to answer (and
+synthesize) the questions people ask most often. When the transcribed question
+matches one of them by keywords, its answer is ready to play immediately.
+
+Prefetching costs tokens and TTS characters whether or not the user asks, so
+both are capped by a budget and report() shows whether the hit rate pays off.
+
+Used by 7pastlivespeechtospeech.py.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SpeculativeAnswers:
+    """Pre-generate answers to common questions and serve them on a match."""
+
+    def __init__(self, common_questions, answer, synthesize, top_n=3, max_tokens=2000, max_tts_chars=1500,
+                 max_workers=3):
+        """
+        Args:
+            common_questions: Dict of key -> (question, [keywords]); the first top_n are prefetched
+            answer: Called with a question, returns (answer_text, tokens_used)
+            synthesize: Called with answer text, returns an audio path (or None)
+            top_n: How many questions to prefetch
+            max_tokens: Don't start another answer once this many chat tokens
+                (prompt and completion) have been spent
+            max_tts_chars: Stop prefetching once this many characters have been synthesized
+            max_workers: How many questions may be prefetched at once
+        """
+        self.common_questions = dict(list(common_questions.items())[:top_n])
+        self.answer = answer
+        self.synthesize = synthesize
+        self.max_tokens = max_tokens
+        self.max_tts_chars = max_tts_chars
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.used = set()
+        self.tokens_spent = 0
+        self.tts_chars_spent = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.hit_latencies = []
+        self.miss_latencies = []
+
+    def start(self):
+        """Start prefetching in the background."""
+        for key, (question, _) in self.common_questions.items():
+            self.futures[key] = self.executor.submit(self._prefetch, question)
+
+    def _prefetch(self, question):
+        with self.lock:
+            if self.tokens_spent >= self.max_tokens:
+                # Over budget: this question is answered normally if it is asked
+                self.skipped += 1
+                return None
+        answer_text, tokens = self.answer(question)
+        with self.lock:
+            self.tokens_spent += tokens
+            if self.tts_chars_spent + len(answer_text) > self.max_tts_chars:
+                # Over budget: keep the text answer but don't pay for its audio
+                return answer_text, None
+            self.tts_chars_spent += len(answer_text)
+        return answer_text, self.synthesize(answer_text)
+
+    def match(self, question):
+        """
+        Find the common question a user's question is asking, by keywords.
+
+        Returns:
+            The matching key, or None if no single common question matches best
+        """
+        text = " " + " ".join(re.findall(r"[a-z']+", question.lower())) + " "
+        scores = {}
+        for key, (_, keywords) in self.common_questions.items():
+            score = sum(1 for keyword in keywords if f" {keyword} " in text)
+            if score:
+                scores[key] = score
+        if not scores:
+            return None
+        best = max(scores.values())
+        best_keys = [key for key, score in scores.items() if score == best]
+        return best_keys[0] if len(best_keys) == 1 else None
+
+    def take(self, question):
+        """
+        Return the prefetched answer for a question, if there is one.
+
+        An answer is only served once; asking the same thing again gets a fresh answer.
+
+        Returns:
+            A tuple of (answer_text, audio_path), or None on a miss
+        """
+        key = self.match(question)
+        if key is None or key in self.used or key not in self.futures:
+            return None
+        try:
+            # Still rendering is fine: waiting for it is faster than starting over
+            result = self.futures[key].result()
+        except Exception as e:
+            print(f"Prefetched answer failed: {e}")
+            return None
+        if result is None:
+            return None
+        self.used.add(key)
+        return result
+
+    def record(self, hit, seconds=None):
+        """Record a hit or miss and how long it took from question to audio, for the report."""
+        if hit:
+            self.hits += 1
+            latencies = self.hit_latencies
+        else:
+            self.misses += 1
+            latencies = self.miss_latencies
+        if seconds is not None:
+            latencies.append(seconds)
+
+    def report(self):
+        """Return a dict summarizing hit rate, latency and what prefetching cost."""
+        asked = self.hits + self.misses
+
+        def average(values):
+            return sum(values) / len(values) if values else None
+
+        return {
+            "prefetched": len(self.futures) - self.skipped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / asked if asked else 0.0,
+            "wasted": len(self.futures) - len(self.used) - self.skipped,
+            "skipped": self.skipped,
+            "avg_hit_latency": average(self.hit_latencies),
+            "avg_miss_latency": average(self.miss_latencies),
+            "tokens_spent": self.tokens_spent,
+            "tts_chars_spent": self.tts_chars_spent,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def print_report(report):
+    """Print a SpeculativeAnswers report in a readable form."""
+    print("\n=== Speculative Answers ===")
+    print(f"Prefetched {report['prefetched']} answers, {report['hits']} hits / "
+          f"{report['hits'] + report['misses']} questions ({report['hit_rate']:.0%}), "
+          f"{report['wasted']} unused")
+    if report["avg_hit_latency"] is not None:
+        print(f"Average question-to-audio on a hit:  {report['avg_hit_latency']:.2f}s")
+    if report["avg_miss_latency"] is not None:
+        print(f"Average question-to-audio on a miss: {report['avg_miss_latency']:.2f}s")
+    if report["skipped"]:
+        print(f"{report['skipped']} not prefetched: the token budget was used up")
+    print(f"Spent {report['tokens_spent']} tokens and {report['tts_chars_spent']} TTS characters on prefetching")
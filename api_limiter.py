@@ -0,0 +1,272 @@
+"""
+Process-wide request scheduling for the Streamlit apps.
+
+Every Streamlit session used to build its own OpenAI client and send requests
+with no shared limit, so a crowd of visitors produced 429s and long tails.
+A RequestScheduler is created once per server (st.cache_resource) and every
+session's requests go through it:
+
+- each endpoint ("images", "chat", "tts") has its own concurrency cap
+- a token bucket per endpoint is sized from the x-ratelimit-* headers of the
+  responses, so requests wait locally instead of being rejected by the API
+- identical requests that are in flight at the same time are coalesced:
+  the first one is sent and the others share its result (single-flight)
+
+retry_with_backoff() retries a call that failed for a transient reason
+(connection errors, timeouts, 429s, 5xx) with exponentially growing,
+jittered pauses, on top of the OpenAI client's own quick retries.
+
+Used by 8streamlit_chat.py and 9streamlit_oracle.py (through image_fetch), and
+by 6image-telephone.py and telephone_runner.py to pace and retry their cycles.
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+import openai
+
+DEFAULT_LIMITS = {"images": 2, "chat": 8, "tts": 4}
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+# Status codes worth trying again; anything else (e.g. a rejected prompt) fails at once
+RETRY_STATUS_CODES = {408, 409, 429}
+
+
+def parse_reset(value):
+    """Parse an x-ratelimit-reset-* header such as "6m0s", "1.5s" or "20ms" into seconds."""
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in DURATION_PART.findall(value or ""))
+
+
+def is_transient(error):
+    """Whether a failed API call may succeed if sent again."""
+    if isinstance(error, openai.APIConnectionError):  # includes timeouts
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code in RETRY_STATUS_CODES or status_code >= 500)
+
+
+def backoff_delay(attempt, base_delay=2.0, max_delay=30.0):
+    """
+    How long to pause before retry number attempt: exponential, with full
+    jitter so callers that failed together don't retry together.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def retry_with_backoff(function, *args, attempts=4, base_delay=2.0, max_delay=30.0, on_retry=None, **kwargs):
+    """
+    Call function(*args, **kwargs), retrying transient failures with exponential backoff.
+
+    Args:
+        function: The call to make
+        attempts: How many times to try in all
+        base_delay: Pause before the first retry; doubled for each one after
+        max_delay: Longest pause between tries
+        on_retry: Optional callback called as on_retry(attempt, error, delay) before each pause
+
+    Returns:
+        What function returns; the last error is raised once the attempts run out
+        or at once if it isn't transient
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if on_retry:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+
+
+class TokenBucket:
+    """
+    A request-rate bucket that starts unlimited and is sized from response headers.
+
+    Until the first response reports its limits, acquire() never waits.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.capacity = None
+        self.tokens = 0.0
+        self.refill_per_second = 0.0
+        self.updated = time.monotonic()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                if self.capacity is None:
+                    return waited
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.refill_per_second if self.refill_per_second else 0.1
+            time.sleep(delay)
+            waited += delay
+
+    def update(self, limit, remaining, reset_seconds):
+        """
+        Resize the bucket from one response's rate-limit headers.
+
+        Args:
+            limit: x-ratelimit-limit-requests (requests per window)
+            remaining: x-ratelimit-remaining-requests
+            reset_seconds: Time until the window is full again
+        """
+        with self.lock:
+            first_update = self.capacity is None
+            if not first_update:
+                self._refill()
+            self.capacity = float(limit)
+            # The API refills its window continuously: the missing requests
+            # come back over reset_seconds
+            missing = max(limit - remaining, 1)
+            self.refill_per_second = missing / reset_seconds if reset_seconds else limit / 60.0
+            # Never believe we have more than the API says; other processes share the quota
+            self.tokens = float(remaining) if first_update else min(self.tokens, float(remaining))
+            self.updated = time.monotonic()
+
+    def drain(self, reset_seconds):
+        """Empty the bucket after a 429 so everyone backs off together."""
+        with self.lock:
+            if self.capacity is None:
+                self.capacity = 1.0
+                self.refill_per_second = 1.0 / max(reset_seconds, 1.0)
+            self.tokens = -self.refill_per_second * reset_seconds
+            self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+
+class RequestScheduler:
+    """Shared concurrency caps, rate limiting and request coalescing per endpoint."""
+
+    def __init__(self, limits=None):
+        """
+        Args:
+            limits: Dict of endpoint -> maximum concurrent requests
+                (defaults to DEFAULT_LIMITS)
+        """
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.semaphores = {endpoint: threading.BoundedSemaphore(n) for endpoint, n in self.limits.items()}
+        self.buckets = {endpoint: TokenBucket() for endpoint in self.limits}
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.stats = {endpoint: {"sent": 0, "coalesced": 0, "rate_limited": 0, "waited_seconds": 0.0}
+                      for endpoint in self.limits}
+
+    @staticmethod
+    def make_key(endpoint, request):
+        """A key for coalescing: identical endpoint and arguments share a result."""
+        payload = json.dumps([endpoint, request], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def request(self, endpoint, raw_method, coalesce=True, **request):
+        """
+        Send a request through the scheduler.
+
+        Args:
+            endpoint: "images", "chat" or "tts"
+            raw_method: The with_raw_response form of the SDK method, e.g.
+                client.images.with_raw_response.generate, so the rate-limit
+                headers can be read
+            coalesce: Share the result with identical requests already in flight
+            **request: The arguments for the method
+
+        Returns:
+            The parsed response, as the plain SDK method would return it
+        """
+        if not coalesce:
+            return self._send(endpoint, raw_method, request)
+
+        key = self.make_key(endpoint, request)
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+            else:
+                self.stats[endpoint]["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._send(endpoint, raw_method, request)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def stream(self, endpoint, raw_method, **request):
+        """
+        Send a streaming request and yield its chunks.
+
+        The endpoint's concurrency slot is held until the stream is finished,
+        since the request is still running until then. Streams aren't coalesced.
+        """
+        with self._slot(endpoint):
+            for chunk in self._call(endpoint, raw_method, dict(request, stream=True)):
+                yield chunk
+
+    def report(self):
+        """Return a copy of the per-endpoint counters."""
+        with self.lock:
+            return {endpoint: dict(stats) for endpoint, stats in self.stats.items()}
+
+    def _send(self, endpoint, raw_method, request):
+        with self._slot(endpoint):
+            return self._call(endpoint, raw_method, request)
+
+    @contextmanager
+    def _slot(self, endpoint):
+        """Wait for a rate-limit token and a free concurrency slot, and hold the slot."""
+        waited = self.buckets[endpoint].acquire()
+        start = time.monotonic()
+        with self.semaphores[endpoint]:
+            with self.lock:
+                self.stats[endpoint]["waited_seconds"] += waited + time.monotonic() - start
+                self.stats[endpoint]["sent"] += 1
+            yield
+
+    def _call(self, endpoint, raw_method, request):
+        try:
+            response = raw_method(**request)
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                headers = getattr(getattr(e, "response", None), "headers", {}) or {}
+                reset = parse_reset(headers.get("x-ratelimit-reset-requests")) or 1.0
+                self.buckets[endpoint].drain(reset)
+                with self.lock:
+                    self.stats[endpoint]["rate_limited"] += 1
+            raise
+        self._update_bucket(endpoint, response.headers)
+        return response.parse()
+
+    def _update_bucket(self, endpoint, headers):
+        try:
+            limit = int(headers["x-ratelimit-limit-requests"])
+            remaining = int(headers["x-ratelimit-remaining-requests"])
+        except (KeyError, TypeError, ValueError):
+            # Not every endpoint reports limits; the concurrency cap still applies
+            return
+        self.buckets[endpoint].update(limit, remaining, parse_reset(headers.get("x-ratelimit-reset-requests")))
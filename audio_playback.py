@@ -0,0 +1,410 @@
+"""
+Low-latency speech playback for the voice oracles.
+
+The original flow wrote a whole mp3 to output_audio/, then loaded it with
+pygame.mixer.Sound (which decodes the entire file) before the first sample
+played. Here the Text-to-Speech API is asked for raw PCM and the chunks are
+queued on a mixer channel while the rest is still downloading. Saving the
+audio (to the TTS cache or a file) happens afterwards on a background thread.
+
+All playback goes through a PlaybackService: a thread that owns the mixer
+channel and takes play/enqueue/stop commands from a queue. Callers never
+busy-wait on the channel, and the microphone can listen while the oracle is
+still talking, interrupting it with stop() when the user starts to speak.
+
+Nothing touches the sound card until the first sound is played: the backend
+is chosen and initialized lazily, so importing the oracles stays fast and works
+on machines without an audio device. Set ORACLE_AUDIO_BACKEND to choose one:
+    pygame       play through the speakers (the default)
+    null         discard all audio (servers, tests)
+    file:<dir>   write every clip that would be played into <dir>
+If pygame can't open a sound device, the null backend is used instead.
+
+Used by 7pastlives.py, 7pastlivespeechtospeech.py, weather.py and speech_stream.py.
+"""
+import io
+import os
+import time
+import wave
+import queue
+import threading
+from collections import deque
+
+# The Text-to-Speech API returns "pcm" as 24 kHz, 16-bit, mono, little-endian
+PCM_RATE = 24000
+PCM_SAMPLE_WIDTH = 2
+FIRST_CHUNK_BYTES = PCM_RATE * PCM_SAMPLE_WIDTH // 10  # 100 ms, to start playing quickly
+CHUNK_BYTES = PCM_RATE * PCM_SAMPLE_WIDTH // 2  # 500 ms once playback is underway
+
+
+class PygameBackend:
+    """Plays through pygame's mixer, which is imported and initialized on first use."""
+
+    def __init__(self):
+        self.mixer = None
+        self.lock = threading.Lock()
+
+    def _get_mixer(self):
+        with self.lock:
+            if self.mixer is None:
+                os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+                import pygame
+                pygame.mixer.init()
+                self.mixer = pygame.mixer
+        return self.mixer
+
+    def channel(self, channel_id):
+        return self._get_mixer().Channel(channel_id)
+
+    def load(self, source):
+        """Turn a path or WAV/mp3 bytes into something the channel can play."""
+        mixer = self._get_mixer()
+        if isinstance(source, (bytes, bytearray)):
+            return mixer.Sound(file=io.BytesIO(source))
+        if isinstance(source, str):
+            return mixer.Sound(source)
+        return source
+
+
+class NullChannel:
+    """A channel that finishes every sound instantly, handing it to a sink."""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def play(self, sound):
+        self.sink(sound)
+
+    queue = play
+
+    def stop(self):
+        pass
+
+    def get_busy(self):
+        return False
+
+    def get_queue(self):
+        return None
+
+
+class NullBackend:
+    """
+    Discards audio, or with sink_dir writes each clip that would have been
+    played into that directory (numbered in play order).
+    """
+
+    def __init__(self, sink_dir=None):
+        self.sink_dir = sink_dir
+        self.played = 0
+        if sink_dir:
+            os.makedirs(sink_dir, exist_ok=True)
+
+    def channel(self, channel_id):
+        return NullChannel(self._sink)
+
+    def load(self, source):
+        return source
+
+    def _sink(self, source):
+        self.played += 1
+        if not self.sink_dir:
+            return
+        if isinstance(source, (bytes, bytearray)):
+            data, extension = bytes(source), ".wav"
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+            extension = os.path.splitext(source)[1]
+        with open(os.path.join(self.sink_dir, f"clip_{self.played:04d}{extension}"), "wb") as f:
+            f.write(data)
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the process-wide audio backend, choosing and initializing it on first use."""
+    global _backend
+    if _backend is None:
+        setting = os.getenv("ORACLE_AUDIO_BACKEND", "pygame")
+        if setting == "null":
+            _backend = NullBackend()
+        elif setting.startswith("file:"):
+            _backend = NullBackend(sink_dir=setting[len("file:"):])
+        else:
+            backend = PygameBackend()
+            try:
+                backend._get_mixer()
+                _backend = backend
+            except Exception as e:
+                print(f"No audio output available ({e}). Continuing without sound...")
+                _backend = NullBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Use a specific backend (e.g. NullBackend() in tests) instead of the configured one."""
+    global _backend
+    _backend = backend
+
+
+class PlaybackService:
+    """
+    Plays audio on its own thread, controlled through a command queue.
+
+    Every stop() starts a new "turn". Producers that stream audio in pieces
+    take a turn token with begin() and pass it to enqueue(); pieces from a
+    stopped turn are dropped, and cancelled(token) tells the producer it can
+    stop downloading. A background thread can pin() a token so that all the
+    audio it produces later still belongs to the turn it was started for.
+    """
+
+    def __init__(self, channel_id=0, poll_seconds=0.01):
+        self.channel_id = channel_id
+        self.poll_seconds = poll_seconds
+        self.commands = queue.Queue()
+        self.turn = 0
+        self.idle = threading.Event()
+        self.idle.set()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.pinned = threading.local()
+
+    def begin(self):
+        """Return a token for the current turn (or the one this thread pinned)."""
+        return getattr(self.pinned, "token", self.turn)
+
+    def pin(self, token):
+        """Make every later begin() on this thread return token."""
+        self.pinned.token = token
+
+    def cancelled(self, token):
+        """True if stop() was called since the token was taken."""
+        return token != self.turn
+
+    def play(self, source):
+        """Replace whatever is playing with source (a path, WAV bytes or a Sound)."""
+        token = self.begin()
+        if self.cancelled(token):
+            return
+        self._send("clear", None)
+        self.enqueue(source, token)
+
+    def enqueue(self, source, token=None):
+        """Play source after everything already queued."""
+        if token is None:
+            token = self.begin()
+        if self.cancelled(token):
+            return
+        self._send("enqueue", (source, token))
+        # Cleared after sending: the service thread re-checks idleness every poll,
+        # so it can never be left set while this source is still waiting to play
+        self.idle.clear()
+
+    def stop(self):
+        """Stop playback immediately and drop everything queued."""
+        self.turn += 1
+        self._send("stop", None)
+
+    def is_busy(self):
+        return not self.idle.is_set()
+
+    def wait(self, timeout=None):
+        """Block until everything queued has played (or was stopped)."""
+        return self.idle.wait(timeout)
+
+    def _send(self, command, payload):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.commands.put((command, payload))
+
+    def _run(self):
+        backend = get_backend()
+        channel = backend.channel(self.channel_id)
+        pending = deque()
+        while True:
+            try:
+                command, payload = self.commands.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                command = None
+
+            if command in ("stop", "clear"):
+                pending.clear()
+                channel.stop()
+            elif command == "enqueue":
+                source, token = payload
+                if token == self.turn:
+                    pending.append(source)
+
+            # Keep the channel's single queue slot filled so playback is gapless
+            while pending and channel.get_queue() is None:
+                try:
+                    sound = backend.load(pending.popleft())
+                except Exception as e:
+                    print(f"Error loading audio: {e}")
+                    continue
+                if channel.get_busy():
+                    channel.queue(sound)
+                else:
+                    channel.play(sound)
+
+            if not pending and not channel.get_busy() and self.commands.empty():
+                self.idle.set()
+
+
+_player = None
+
+
+def get_player():
+    """Return the process-wide PlaybackService."""
+    global _player
+    if _player is None:
+        _player = PlaybackService()
+    return _player
+
+
+def play_audio_file(audio_path, wait=True):
+    """
+    Play an audio file through the shared player.
+
+    Args:
+        audio_path: The file to play
+        wait: Block until it has finished (or was interrupted)
+    """
+    player = get_player()
+    player.play(audio_path)
+    if wait:
+        player.wait()
+
+
+def pcm_to_wav(pcm, rate=PCM_RATE):
+    """Wrap raw 16-bit mono PCM in an in-memory WAV container."""
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(PCM_SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return wav_buffer.getvalue()
+
+
+def play_pcm_chunks(chunks, player=None, wait=True):
+    """
+    Play an iterable of raw PCM byte chunks as they arrive.
+
+    Chunks are regrouped so playback starts after ~100 ms of audio and then
+    continues in ~500 ms pieces, and split on sample boundaries. Reading stops
+    early if the player is stopped.
+
+    If the stream fails before any audio was played the error is raised, so
+    the caller can fall back to another way of speaking. Once audio has been
+    heard, what was received is played out and the error only printed:
+    starting over would repeat the beginning.
+
+    Returns:
+        A tuple of (pcm_bytes, time_to_first_audio); pcm_bytes is None if
+        playback was interrupted or the stream broke off
+    """
+    player = player or get_player()
+    token = player.begin()
+    start = time.perf_counter()
+    time_to_first_audio = None
+    received = bytearray()
+    pending = bytearray()
+
+    def flush(data):
+        nonlocal time_to_first_audio
+        # The WAV header lets pygame convert to whatever format the mixer uses
+        player.enqueue(pcm_to_wav(bytes(data)), token)
+        if time_to_first_audio is None:
+            time_to_first_audio = time.perf_counter() - start
+
+    complete = True
+    try:
+        for chunk in chunks:
+            if player.cancelled(token):
+                return None, time_to_first_audio
+            received.extend(chunk)
+            pending.extend(chunk)
+            target = FIRST_CHUNK_BYTES if time_to_first_audio is None else CHUNK_BYTES
+            if len(pending) >= target:
+                usable = len(pending) - len(pending) % PCM_SAMPLE_WIDTH
+                flush(pending[:usable])
+                del pending[:usable]
+    except Exception as e:
+        if time_to_first_audio is None:
+            raise
+        print(f"Error streaming audio, stopping early: {e}")
+        complete = False
+
+    usable = len(pending) - len(pending) % PCM_SAMPLE_WIDTH
+    if usable:
+        flush(pending[:usable])
+    if wait:
+        player.wait()
+    return (bytes(received) if complete and not player.cancelled(token) else None), time_to_first_audio
+
+
+def stream_speech(client, text, model="tts-1", voice="onyx", speed=1.0, cache=None, save_path=None, wait=True):
+    """
+    Speak text, starting playback while the audio is still downloading.
+
+    Args:
+        client: The OpenAI client
+        text: The text to speak
+        model, voice, speed: Text-to-speech settings
+        cache: Optional TTSCache; a cached clip is played directly, and a newly
+            streamed one is stored as WAV in the background
+        save_path: Optional .wav path to also write the audio to, in the background
+        wait: Block until playback has finished (or was interrupted)
+
+    Returns:
+        The time to first audio in seconds (None if nothing played)
+
+    Raises:
+        The request's error, but only if it failed before any audio played
+    """
+    player = get_player()
+    if cache:
+        for response_format in ("wav", "mp3"):
+            cached_path = cache.get(cache.make_key(text, model, voice, speed, response_format))
+            if cached_path:
+                start = time.perf_counter()
+                player.play(cached_path)
+                time_to_first_audio = time.perf_counter() - start
+                if wait:
+                    player.wait()
+                return time_to_first_audio
+
+    with client.audio.speech.with_streaming_response.create(
+        model=model,
+        voice=voice,
+        input=text,
+        speed=speed,
+        response_format="pcm"
+    ) as response:
+        pcm, time_to_first_audio = play_pcm_chunks(response.iter_bytes(chunk_size=4096), player, wait=wait)
+
+    if pcm and (cache or save_path):
+        # Persisting is a side effect and must not delay the conversation
+        threading.Thread(
+            target=_save_audio,
+            args=(pcm, text, model, voice, speed, cache, save_path),
+            daemon=True
+        ).start()
+
+    return time_to_first_audio
+
+
+def _save_audio(pcm, text, model, voice, speed, cache, save_path):
+    try:
+        wav_bytes = pcm_to_wav(pcm)
+        if cache:
+            cache.put(cache.make_key(text, model, voice, speed, "wav"), wav_bytes, response_format="wav", text=text)
+        if save_path:
+            with open(save_path, "wb") as f:
+                f.write(wav_bytes)
+    except Exception as e:
+        print(f"Error saving audio: {e}")
@@ -0,0 +1,113 @@
+"""
+Benchmark: per-turn cost of a long chat, full history vs. chat_context.ChatContext.
+
+Plays a synthetic conversation (no API requests) against a fake client whose
+chat completions take a fixed time plus a time per prompt token, and fail
+past a context limit like the real API. Each turn is timed from choosing the
+messages to the answer:
+
+    full_history  every message so far, as 8streamlit_chat.py used to send
+    window        ChatContext: the latest turns within the token budget plus a
+                  rolling summary, updated on a background thread by the same
+                  fake client
+
+Run from the repository root:
+    python -m benchmarks.chat_context
+    python -m benchmarks.chat_context --turns 400 --ms-per-1k-tokens 10
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_context import ChatContext, message_tokens  # noqa: E402
+
+WORDS = ("the a garden lantern river signal quietly orange machine letter window seven "
+         "travel winter bright museum answer paper careful engine market story").split()
+
+
+class FakeCompletions:
+    def __init__(self, base_seconds, seconds_per_token, context_limit):
+        self.base_seconds = base_seconds
+        self.seconds_per_token = seconds_per_token
+        self.context_limit = context_limit
+
+    def create(self, messages, **request):
+        tokens = sum(message_tokens(message) for message in messages)
+        if tokens > self.context_limit:
+            raise ValueError(f"context_length_exceeded: {tokens} tokens, the limit is {self.context_limit}")
+        time.sleep(self.base_seconds + tokens * self.seconds_per_token)
+        content = " ".join(random.choices(WORDS, k=120))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def synthetic_text(rng, words):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def play(client, turns, context=None):
+    """Play the conversation; returns per-turn (prompt_tokens, seconds, failed)."""
+    rng = random.Random(0)
+    messages = []
+    results = []
+    for _ in range(turns):
+        messages.append({"role": "user", "content": synthetic_text(rng, 40)})
+        start = time.perf_counter()
+        sent = context.build_messages(messages) if context else [dict(message) for message in messages]
+        tokens = sum(message_tokens(message) for message in sent)
+        try:
+            client.chat.completions.create(model="gpt-3.5-turbo", messages=sent)
+            failed = False
+        except ValueError:
+            failed = True
+        results.append((tokens, time.perf_counter() - start, failed))
+        # The conversation goes on the same way whether or not the turn failed
+        messages.append({"role": "assistant", "content": synthetic_text(rng, 90)})
+    if context:
+        context.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200, help="User/assistant exchanges to play")
+    parser.add_argument("--base-ms", type=float, default=20, help="Fixed latency of a completion")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=5, help="Added latency per 1000 prompt tokens")
+    parser.add_argument("--context-limit", type=int, default=16385, help="Tokens past which a request fails")
+    args = parser.parse_args()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(
+        args.base_ms / 1000, args.ms_per_1k_tokens / 1e6, args.context_limit)))
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+    context = ChatContext(client, executor)
+    print(f"{args.turns} turns, {args.base_ms:.0f}ms + {args.ms_per_1k_tokens:g}ms per 1k prompt tokens, "
+          f"context limit {args.context_limit} tokens; window: {context.keep_turns} turns, "
+          f"{context.token_budget}-token budget\n")
+
+    results = {"full_history": play(client, args.turns), "window": play(client, args.turns, context)}
+    executor.shutdown(wait=True)
+
+    checkpoints = sorted({1, *range(args.turns // 4, args.turns + 1, args.turns // 4 or 1)})
+    print(f"{'turn':>5}  {'full_history tokens':>20} {'ms':>7}  {'window tokens':>14} {'ms':>7}")
+    for turn in checkpoints:
+        full_tokens, full_seconds, full_failed = results["full_history"][turn - 1]
+        window_tokens, window_seconds, _ = results["window"][turn - 1]
+        full_ms = "failed" if full_failed else f"{full_seconds * 1000:.1f}"
+        print(f"{turn:>5}  {full_tokens:>20} {full_ms:>7}  {window_tokens:>14} {window_seconds * 1000:>7.1f}")
+
+    print()
+    for name, turn_results in results.items():
+        failed = sum(1 for _, _, turn_failed in turn_results if turn_failed)
+        total = sum(seconds for _, seconds, _ in turn_results)
+        print(f"{name:<13} {sum(tokens for tokens, _, _ in turn_results):>8} prompt tokens in total, "
+              f"{total:.1f}s, {failed} turns failed")
+    print(f"\nThe summary covers the first {context.summarized_upto} of {2 * args.turns} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: scoring semantic drift for many telephone runs, per pair vs. vectorized.
+
+Uses random embeddings (no API requests) shaped like text-embedding-3-small
+output, for a number of runs of varying length, and times:
+
+    per_pair    a Python loop computing each cycle's cosine similarity to the
+                previous text and to the origin, one pair at a time
+    vectorized  telephone_drift.similarity_matrices: every run's full matrix
+                from one stacked einsum, then the same two columns read out
+
+Both produce the same numbers; the check at the end confirms it.
+
+Run from the repository root:
+    python -m benchmarks.drift_analytics
+    python -m benchmarks.drift_analytics --runs 1000 --cycles 30
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telephone_drift import similarity_matrices, drift_rows  # noqa: E402
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+def per_pair(embedding_sets):
+    results = []
+    for embeddings in embedding_sets:
+        vectors = embeddings.tolist()
+        results.append([(cycle, cosine(vectors[cycle], vectors[cycle - 1]), cosine(vectors[cycle], vectors[0]))
+                        for cycle in range(1, len(vectors))])
+    return results
+
+
+def vectorized(embedding_sets):
+    return [drift_rows(matrix) for matrix in similarity_matrices(embedding_sets)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=300, help="Telephone runs to score")
+    parser.add_argument("--cycles", type=int, default=20, help="Longest run, in cycles (lengths vary up to this)")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embedding_sets = [rng.normal(size=(int(rng.integers(2, args.cycles + 2)), args.dimensions)).astype(np.float32)
+                      for _ in range(args.runs)]
+    texts = sum(len(embeddings) for embeddings in embedding_sets)
+    print(f"{args.runs} runs, {texts} texts, {args.dimensions} dimensions\n")
+
+    timings = {}
+    results = {}
+    for method in (per_pair, vectorized):
+        start = time.perf_counter()
+        results[method] = method(embedding_sets)
+        timings[method] = time.perf_counter() - start
+        print(f"{method.__name__:<11} {timings[method]:8.3f}s")
+
+    largest_difference = max(float(np.abs(np.asarray(slow) - fast).max())
+                             for slow, fast in zip(results[per_pair], results[vectorized]))
+    print(f"\n{timings[per_pair] / timings[vectorized]:.0f}x faster; "
+          f"largest difference between the two {largest_difference:.1e}")
+
+
+if __name__ == "__main__":
+    main()
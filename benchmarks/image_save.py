@@ -0,0 +1,124 @@
+"""
+Benchmark: saving a generated image, PIL decode/re-encode vs. writing the bytes.
+
+Compares the old save path (Image.open + image.save as PNG) with
+image_fetch.save_image_bytes writing the original bytes, and with the
+optional WebP/JPEG transcodes. Each method runs in its own interpreter so its
+peak RSS can be measured; the growth over the interpreter's baseline is
+reported alongside the median save latency and the size on disk.
+
+Run from the repository root:
+    python -m benchmarks.image_save
+    python -m benchmarks.image_save --runs 20 oracle_symbols/someone_sacred_symbol_1712345678.png
+
+Without an image a synthetic 1024x1024 PNG fixture is generated.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+METHODS = ["pil-reencode", "direct", "webp", "jpeg"]
+
+
+def make_synthetic_fixture(path, size=1024):
+    """Write a PNG that compresses about as badly as a generated image: gradients plus noise."""
+    from PIL import Image
+    rng = random.Random(42)
+    pixels = bytearray()
+    for y in range(size):
+        for x in range(size):
+            noise = rng.randint(-24, 24)
+            pixels += bytes((
+                max(0, min(255, x * 255 // size + noise)),
+                max(0, min(255, y * 255 // size + noise)),
+                max(0, min(255, (x + y) * 127 // size + noise)),
+            ))
+    Image.frombytes("RGB", (size, size), bytes(pixels)).save(path, format="PNG")
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def save_once(method, image_bytes, path_stem):
+    from image_fetch import save_image_bytes
+    if method == "pil-reencode":
+        from PIL import Image
+        image = Image.open(io.BytesIO(image_bytes))
+        image_path = path_stem + ".png"
+        image.save(image_path)
+        return image_path
+    image_format = {"direct": "png", "webp": "webp", "jpeg": "jpeg"}[method]
+    return save_image_bytes(image_bytes, path_stem, image_format=image_format)
+
+
+def run_worker(method, fixture, runs):
+    """Time one method in this process and print the result as JSON."""
+    with open(fixture, "rb") as f:
+        image_bytes = f.read()
+    # Import everything the method needs before taking the baseline
+    import image_fetch  # noqa: F401
+    from PIL import Image  # noqa: F401
+    baseline = peak_rss_bytes()
+
+    output_dir = tempfile.mkdtemp()
+    latencies = []
+    image_path = None
+    for i in range(runs):
+        start = time.perf_counter()
+        image_path = save_once(method, image_bytes, os.path.join(output_dir, f"image_{i}"))
+        latencies.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        "median_ms": statistics.median(latencies) * 1000,
+        "peak_rss_growth": peak_rss_bytes() - baseline,
+        "file_bytes": os.path.getsize(image_path),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("image", nargs="?", help="A PNG to save (default: synthetic 1024x1024 fixture)")
+    parser.add_argument("--runs", type=int, default=10, help="Saves per method")
+    parser.add_argument("--worker", choices=METHODS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.image, args.runs)
+        return
+
+    fixture = args.image
+    if not fixture:
+        fixture = os.path.join(tempfile.mkdtemp(), "synthetic_symbol.png")
+        make_synthetic_fixture(fixture)
+    print(f"Image: {fixture} ({os.path.getsize(fixture) / 1024:.0f} KB), {args.runs} saves per method\n")
+    print(f"{'method':<14}{'median save':>12}{'peak RSS growth':>18}{'on disk':>10}")
+
+    for method in METHODS:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.image_save", "--worker", method, "--runs", str(args.runs), fixture],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"{method:<14}failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        stats = json.loads(result.stdout)
+        print(f"{method:<14}{stats['median_ms']:>9.1f} ms{stats['peak_rss_growth'] / 2**20:>15.1f} MB"
+              f"{stats['file_bytes'] / 1024:>7.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Load test: 50 concurrent Streamlit sessions against a rate-limited mock API.
+
+Starts a local HTTP server that imitates the OpenAI chat (streaming) and image
+endpoints, including their x-ratelimit-* headers and 429 responses when a
+request-rate bucket or concurrency limit is exceeded. Each simulated session
+streams one chat reply and generates one sacred symbol (names repeat, so some
+image requests are identical). The run is done twice:
+
+    independent  every session has its own OpenAI client, as before
+    scheduled    one shared client and api_limiter.RequestScheduler
+
+and reports 429s seen by the server, requests actually sent, and latency
+percentiles per endpoint.
+
+Run from the repository root:
+    python -m benchmarks.limiter_load
+    python -m benchmarks.limiter_load --sessions 100 --names 5
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from api_limiter import RequestScheduler  # noqa: E402
+
+# The mock API's limits per endpoint: bucket size, refill per second, concurrency, latency
+MOCK_LIMITS = {
+    "chat": {"bucket": 20, "refill": 10.0, "concurrency": 10, "latency": 0.3},
+    "images": {"bucket": 6, "refill": 3.0, "concurrency": 3, "latency": 0.8},
+}
+FAKE_PNG = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\0" * 2048).decode("ascii")
+
+
+class MockLimits:
+    """Server-side request buckets and concurrency counters per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {name: {"tokens": float(limits["bucket"]), "updated": time.monotonic(), "active": 0}
+                      for name, limits in MOCK_LIMITS.items()}
+        self.counts = {name: {"ok": 0, "429": 0} for name in MOCK_LIMITS}
+
+    def enter(self, endpoint):
+        """Admit or reject a request. Returns (admitted, rate-limit headers)."""
+        limits = MOCK_LIMITS[endpoint]
+        with self.lock:
+            state = self.state[endpoint]
+            now = time.monotonic()
+            state["tokens"] = min(limits["bucket"], state["tokens"] + (now - state["updated"]) * limits["refill"])
+            state["updated"] = now
+            admitted = state["tokens"] >= 1 and state["active"] < limits["concurrency"]
+            if admitted:
+                state["tokens"] -= 1
+                state["active"] += 1
+            self.counts[endpoint]["ok" if admitted else "429"] += 1
+            remaining = int(state["tokens"])
+            reset = (limits["bucket"] - state["tokens"]) / limits["refill"]
+        return admitted, {
+            "x-ratelimit-limit-requests": str(limits["bucket"]),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+
+    def leave(self, endpoint):
+        with self.lock:
+            self.state[endpoint]["active"] -= 1
+
+
+def make_handler(limits):
+    class MockOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            endpoint = "images" if self.path.endswith("/images/generations") else "chat"
+            admitted, headers = limits.enter(endpoint)
+            if not admitted:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                                "code": "rate_limit_exceeded"}}, headers)
+                return
+            try:
+                time.sleep(MOCK_LIMITS[endpoint]["latency"])
+                if endpoint == "images":
+                    self._send_json(200, {"created": int(time.time()), "data": [{"b64_json": FAKE_PNG}] * body.get("n", 1)}, headers)
+                elif body.get("stream"):
+                    self._send_stream(headers)
+                else:
+                    self._send_json(200, self._completion("Your past is written in the stars."), headers)
+            finally:
+                limits.leave(endpoint)
+
+        def _completion(self, text):
+            return {"id": "mock", "object": "chat.completion", "created": int(time.time()), "model": "mock",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}]}
+
+        def _send_json(self, status, payload, headers):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, headers):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            for word in ["Your ", "past ", "is ", "written ", "in ", "the ", "stars."]:
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": "mock", "choices": [{"index": 0, "delta": {"content": word},
+                                                       "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(0.02)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return MockOpenAI
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients giving up on a connection is expected under load
+        pass
+
+
+def run_session(index, names, base_url, retries, shared_client, scheduler, results):
+    """One visitor: stream a chat reply, then generate a symbol."""
+    client = shared_client or OpenAI(api_key="mock", base_url=base_url, max_retries=retries)
+    messages = [{"role": "user", "content": f"Tell me about my past life, I am visitor {index}"}]
+    prompt = f"A sacred symbol for {names[index % len(names)]}"
+
+    start = time.perf_counter()
+    try:
+        if scheduler:
+            stream = scheduler.stream("chat", client.chat.completions.with_raw_response.create,
+                                      model="mock", messages=messages)
+        else:
+            stream = client.chat.completions.create(model="mock", messages=messages, stream=True)
+        "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+        results["chat"].append(time.perf_counter() - start)
+    except Exception:
+        results["chat_failed"] += 1
+
+    start = time.perf_counter()
+    try:
+        request = {"prompt": prompt, "n": 1, "size": "1024x1024", "response_format": "b64_json"}
+        if scheduler:
+            scheduler.request("images", client.images.with_raw_response.generate, **request)
+        else:
+            client.images.generate(**request)
+        results["images"].append(time.perf_counter() - start)
+    except Exception:
+        results["images_failed"] += 1
+
+
+def run(mode, sessions, names, base_url, retries):
+    shared_client = scheduler = None
+    if mode == "scheduled":
+        shared_client = OpenAI(api_key="mock", base_url=base_url, max_retries=retries)
+        scheduler = RequestScheduler()
+    results = {"chat": [], "images": [], "chat_failed": 0, "images_failed": 0}
+    threads = [threading.Thread(target=run_session,
+                                args=(i, names, base_url, retries, shared_client, scheduler, results))
+               for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start, scheduler
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions to simulate")
+    parser.add_argument("--names", type=int, default=10, help="Distinct names among the sessions")
+    parser.add_argument("--retries", type=int, default=2, help="OpenAI client max_retries (the SDK default is 2)")
+    args = parser.parse_args()
+
+    names = [f"Visitor{i}" for i in range(args.names)]
+    for mode in ("independent", "scheduled"):
+        limits = MockLimits()
+        server = QuietServer(("127.0.0.1", 0), make_handler(limits))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+        results, wall, scheduler = run(mode, args.sessions, names, base_url, args.retries)
+        server.shutdown()
+
+        print(f"\n=== {mode}: {args.sessions} sessions in {wall:.1f}s ===")
+        for endpoint in ("chat", "images"):
+            latencies = results[endpoint]
+            print(f"{endpoint:>7}: {len(latencies)} ok, {results[endpoint + '_failed']} failed, "
+                  f"server saw {limits.counts[endpoint]['ok']} accepted / {limits.counts[endpoint]['429']} 429s, "
+                  f"p50 {statistics.median(latencies) if latencies else float('nan'):.2f}s, "
+                  f"p95 {percentile(latencies, 0.95):.2f}s")
+        if scheduler:
+            for endpoint, stats in scheduler.report().items():
+                if stats["sent"]:
+                    print(f"{endpoint:>7}: scheduler sent {stats['sent']}, coalesced {stats['coalesced']}, "
+                          f"queued {stats['waited_seconds']:.1f}s in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: script-run time per rerun of a Streamlit app, using AppTest.
+
+Every widget interaction reruns the whole script, so the time one run takes is
+added to every click. This runs the app headlessly with Streamlit's AppTest
+harness: one cold first run, then a number of reruns (typing into the name
+field, as a visitor would), and reports the per-rerun times and how many
+elements each run produced.
+
+Run from the repository root:
+    python -m benchmarks.rerun_time
+    python -m benchmarks.rerun_time --reruns 100 --max-ms 50
+
+With --max-ms the exit status is non-zero if the median rerun is slower, so it
+can guard against regressions. No API requests are made: a dummy key is used
+unless OPENAI_API_KEY is set, and nothing is submitted.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def count_elements(node):
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default="9streamlit_oracle.py", help="Streamlit script to measure")
+    parser.add_argument("--reruns", type=int, default=30, help="Reruns to time after the first run")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median rerun takes longer than this")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    # Resources the app writes (oracle_symbols/) are relative to the working directory
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    app = AppTest.from_file(os.path.join(ROOT, args.app), default_timeout=30)
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+    if app.exception:
+        print(f"The app raised an exception: {app.exception[0].message}")
+        sys.exit(1)
+
+    timings = []
+    for i in range(args.reruns):
+        if app.text_input:
+            app.text_input[0].set_value(f"Visitor {i}")
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+
+    print(f"{args.app}: first run {first_run * 1000:.1f} ms")
+    print(f"{args.reruns} reruns: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms, {count_elements(app._tree)} elements on the page")
+    print(f"Debug log entries kept: {len(app.session_state['debug_info'])}"
+          if "debug_info" in app.session_state else "")
+
+    if args.max_ms is not None and statistics.median(timings) * 1000 > args.max_ms:
+        print(f"Median rerun is slower than {args.max_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
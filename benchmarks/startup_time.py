@@ -0,0 +1,88 @@
+"""
+Benchmark: how long it takes to import each voice oracle.
+
+Each script is imported (without running main()) in a fresh interpreter with
+-X importtime. The wall-clock time of the whole import is reported together
+with the slowest top-level imports, so it is easy to see what startup pays for.
+
+Run from the repository root:
+    python -m benchmarks.startup_time
+    python -m benchmarks.startup_time --runs 5 weather.py
+
+ORACLE_AUDIO_BACKEND=null is set by default so the numbers don't depend on the
+sound card; pass --audio-backend pygame to measure with real audio.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCRIPTS = ["7pastlives.py", "7pastlivespeechtospeech.py", "weather.py"]
+
+# Import a script by path under a non-"__main__" name, so its main() doesn't run
+IMPORT_SNIPPET = """
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location("oracle_under_test", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output.
+
+    Returns:
+        A list of (cumulative_microseconds, module) for the top-level imports
+    """
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:      1234 |       5678 | module"
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        # Nested imports are indented under their parent
+        if name.startswith("  "):
+            continue
+        top_level.append((int(cumulative), name.strip()))
+    return top_level
+
+
+def measure(script, audio_backend):
+    env = dict(os.environ, ORACLE_AUDIO_BACKEND=audio_backend, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET, os.path.join(ROOT, script)],
+        cwd=ROOT, env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        return wall, None, error
+    return wall, parse_importtime(result.stderr), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("scripts", nargs="*", default=DEFAULT_SCRIPTS, help="Scripts to import")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per script (the fastest is reported)")
+    parser.add_argument("--top", type=int, default=8, help="How many of the slowest imports to list")
+    parser.add_argument("--audio-backend", default="null", help="Value for ORACLE_AUDIO_BACKEND")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        runs = [measure(script, args.audio_backend) for _ in range(args.runs)]
+        wall, imports, error = min(runs, key=lambda run: run[0])
+        print(f"\n{script}: {wall * 1000:.0f} ms wall clock (best of {args.runs})")
+        if error:
+            print(f"  Import failed: {error}")
+            continue
+        for cumulative, name in sorted(imports, reverse=True)[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
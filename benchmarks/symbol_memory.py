@@ -0,0 +1,94 @@
+"""
+Benchmark: memory allocated per symbol request in the Streamlit apps, old vs. new.
+
+Replays what one generation does with the image after it arrives, measured
+with tracemalloc:
+
+    old  decode with PIL, re-encode for st.image (Streamlit turns a PIL image
+         back into PNG bytes), save with PIL, then read the file back for the
+         download button
+    new  write the received bytes to disk and hand the same bytes object to
+         st.image and the download button
+
+Only allocations made through Python's allocator are traced, so Pillow's pixel
+buffers (about 3 MB for a 1024x1024 RGB image) are not included in the old
+numbers; the real difference is larger.
+
+Run from the repository root:
+    python -m benchmarks.symbol_memory
+    python -m benchmarks.symbol_memory --runs 10 oracle_symbols/someone_sacred_symbol_1712345678.png
+"""
+import io
+import os
+import sys
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_fetch import save_image_bytes  # noqa: E402
+from benchmarks.image_save import make_synthetic_fixture  # noqa: E402
+
+
+def old_request(image_bytes, path_stem):
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes))
+    # What st.image does with a PIL image
+    display = io.BytesIO()
+    image.save(display, format="PNG")
+    display_bytes = display.getvalue()
+    image_path = path_stem + ".png"
+    image.save(image_path)
+    with open(image_path, "rb") as f:
+        download_bytes = f.read()
+    return display_bytes, download_bytes
+
+
+def new_request(image_bytes, path_stem):
+    save_image_bytes(image_bytes, path_stem, image_format="png")
+    return image_bytes, image_bytes
+
+
+def measure(request, image_bytes, output_dir, runs):
+    """Return (peak_bytes, retained_bytes) per request, averaged over runs."""
+    peaks = []
+    retained = []
+    for i in range(runs):
+        tracemalloc.start()
+        results = request(image_bytes, os.path.join(output_dir, f"{request.__name__}_{i}"))
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+        del results
+    return sum(peaks) / runs, sum(retained) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("image", nargs="?", help="A PNG to use (default: synthetic 1024x1024 fixture)")
+    parser.add_argument("--runs", type=int, default=5, help="Requests per method")
+    args = parser.parse_args()
+
+    fixture = args.image
+    if not fixture:
+        fixture = os.path.join(tempfile.mkdtemp(), "synthetic_symbol.png")
+        make_synthetic_fixture(fixture)
+    with open(fixture, "rb") as f:
+        image_bytes = f.read()
+
+    output_dir = tempfile.mkdtemp()
+    print(f"Image: {len(image_bytes) / 1024:.0f} KB, {args.runs} requests per method\n")
+    results = {}
+    for request in (old_request, new_request):
+        results[request] = measure(request, image_bytes, output_dir, args.runs)
+        peak, retained = results[request]
+        print(f"{request.__name__:<12} peak {peak / 1024:8.0f} KB   held by the results {retained / 1024:8.0f} KB")
+
+    saved = results[old_request][0] - results[new_request][0]
+    print(f"\nSaved per request: {saved / 1024:.0f} KB of traced allocations at peak")
+
+
+if __name__ == "__main__":
+    main()
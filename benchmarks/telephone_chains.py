@@ -0,0 +1,72 @@
+"""
+Benchmark: telephone-game throughput against the number of concurrent chains.
+
+Plays the game with telephone_runner.TelephoneRunner against the local mock
+API from benchmarks.limiter_load (rate limits, 429s and latency included):
+first one chain, then more chains at once, and reports images per minute for
+each. Throughput should grow with the chains until the mock's rate limits
+or the concurrency limit cap it. The mock's images are tiny, so saving them
+costs next to nothing.
+
+Run from the repository root:
+    python -m benchmarks.telephone_chains
+    python -m benchmarks.telephone_chains --chains 1 2 4 8 16 --cycles 3 --concurrency 8
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import threading
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from api_limiter import RequestScheduler  # noqa: E402
+from telephone_runner import TelephoneRunner  # noqa: E402
+from benchmarks.limiter_load import MOCK_LIMITS, MockLimits, QuietServer, make_handler  # noqa: E402
+
+
+def play(base_url, chains, cycles, concurrency, output_dir):
+    client = OpenAI(api_key="mock", base_url=base_url)
+    # The mock rejects requests over its concurrency limits, as the API does over its rate limits
+    scheduler = RequestScheduler(limits={endpoint: min(concurrency, limits["concurrency"])
+                                         for endpoint, limits in MOCK_LIMITS.items()})
+    runner = TelephoneRunner(client, scheduler, run_dir=os.path.join(output_dir, f"chains_{chains}"),
+                             concurrency=concurrency)
+    prompts = [f"A lighthouse on a cliff, take {i + 1}" for i in range(chains)]
+    # Keep the runner's per-cycle progress lines out of the report
+    with redirect_stdout(open(os.devnull, "w")):
+        summary_path = asyncio.run(runner.run(prompts, cycles=cycles))
+    with open(summary_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chains", type=int, nargs="+", default=[1, 2, 4, 8], help="Chain counts to measure")
+    parser.add_argument("--cycles", type=int, default=3, help="Cycles per chain")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight across all chains")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    print(f"{args.cycles} cycles per chain, concurrency {args.concurrency}\n")
+    for chains in args.chains:
+        limits = MockLimits()
+        server = QuietServer(("127.0.0.1", 0), make_handler(limits))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        summary = play(f"http://127.0.0.1:{server.server_address[1]}/v1", chains, args.cycles,
+                       args.concurrency, output_dir)
+        server.shutdown()
+
+        failed = sum(1 for chain in summary["chains"] if chain["status"] == "failed")
+        rejected = sum(counts["429"] for counts in limits.counts.values())
+        print(f"{chains:>3} chains: {summary['cycles_completed']:>3} cycles in {summary['elapsed_seconds']:5.1f}s, "
+              f"{summary['images_per_minute']:6.1f} images/min, {failed} chains failed, {rejected} 429s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: end-of-speech to transcript latency, fixed-duration vs. VAD capture.
+
+Feeds WAV fixtures (16 kHz, 16-bit, mono) through voice_input.record_until_silence
+frame by frame, exactly as the microphone would deliver them, and compares how
+long after the speaker stops each capture mode is ready to transcribe. With
+--transcribe the clip is also sent to Whisper (compressed with --upload-format)
+and the round trip is added.
+
+Run from the repository root:
+    python -m benchmarks.vad_latency path/to/question.wav another.wav
+    python -m benchmarks.vad_latency --transcribe my_recording.wav
+
+Without any WAV files a synthetic "speech" fixture is generated.
+"""
+import os
+import sys
+import time
+import math
+import random
+import argparse
+import tempfile
+import wave
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voice_input  # noqa: E402
+
+
+def make_synthetic_fixture(path, speech_seconds=1.8, lead_silence=0.5, tail_silence=2.0):
+    """Write a WAV of quiet noise, a burst of loud modulated noise, then quiet noise."""
+    rng = random.Random(42)
+    samples = array("h")
+    total = lead_silence + speech_seconds + tail_silence
+    for i in range(int(total * voice_input.RATE)):
+        t = i / voice_input.RATE
+        amplitude = 60
+        if lead_silence <= t < lead_silence + speech_seconds:
+            # Syllable-like loudness envelope at about 4 Hz
+            amplitude = 4000 * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * t))
+        samples.append(int(rng.uniform(-1, 1) * amplitude))
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(voice_input.SAMPLE_WIDTH)
+        wf.setframerate(voice_input.RATE)
+        wf.writeframes(samples.tobytes())
+
+
+def true_speech_end(path):
+    """Offline estimate of when speech ends: the last frame well above the quietest frames."""
+    read_frame = voice_input.wav_frame_reader(path)
+    levels = []
+    while True:
+        frame = read_frame()
+        if not frame:
+            break
+        levels.append(voice_input.EnergyVAD.frame_rms(frame))
+    floor = sorted(levels)[len(levels) // 10]
+    threshold = max(300.0, floor * 3)
+    last = max((i for i, level in enumerate(levels) if level > threshold), default=0)
+    return (last + 1) * voice_input.FRAME_MS / 1000, len(levels) * voice_input.FRAME_MS / 1000
+
+
+def transcribe(wav_bytes, upload_format):
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    start = time.perf_counter()
+    text, metrics = voice_input.transcribe_audio(client, wav_bytes, upload_format=upload_format)
+    print(f"  Uploaded:               {metrics['uploaded_bytes'] / 1024:.1f} KB as {metrics['file_name']} "
+          f"(WAV {metrics['wav_bytes'] / 1024:.1f} KB)")
+    return text, time.perf_counter() - start
+
+
+def benchmark_file(path, fixed_duration, run_transcription, upload_format="flac"):
+    speech_end, length = true_speech_end(path)
+
+    # VAD capture: the audio clock stops when record_until_silence returns
+    compute_start = time.perf_counter()
+    pcm, info = voice_input.record_until_silence(voice_input.wav_frame_reader(path), max_duration=15)
+    compute_seconds = time.perf_counter() - compute_start
+    vad_stop = info["frames_read"] * voice_input.FRAME_MS / 1000
+
+    # Fixed capture always waits for the whole duration
+    fixed_stop = fixed_duration
+
+    print(f"\n{os.path.basename(path)} ({length:.2f}s, speech ends at {speech_end:.2f}s)")
+    print(f"  VAD stop reason:        {info['reason']}")
+    print(f"  VAD captured:           {len(pcm or b'') / voice_input.SAMPLE_WIDTH / voice_input.RATE:.2f}s "
+          f"(processing {compute_seconds * 1000:.1f} ms)")
+
+    transcribe_seconds = 0.0
+    transcript = ""
+    if run_transcription and pcm:
+        transcript, transcribe_seconds = transcribe(voice_input.pcm_to_wav_bytes(pcm), upload_format)
+
+    if transcript:
+        print(f"  Transcript:             {transcript}")
+        print(f"  Whisper round trip:     {transcribe_seconds:.2f}s")
+    print(f"  End of speech -> transcript, VAD:        {vad_stop - speech_end + transcribe_seconds:6.2f}s")
+    if fixed_stop >= speech_end:
+        print(f"  End of speech -> transcript, fixed {fixed_duration:.0f}s:   "
+              f"{fixed_stop - speech_end + transcribe_seconds:6.2f}s")
+    else:
+        print(f"  Fixed {fixed_duration:.0f}s capture would have cut the speaker off "
+              f"{speech_end - fixed_stop:.2f}s early")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("wav_files", nargs="*", help="16 kHz 16-bit mono WAV fixtures")
+    parser.add_argument("--fixed-duration", type=float, default=5.0,
+                        help="Duration of the old fixed-length capture to compare against")
+    parser.add_argument("--transcribe", action="store_true", help="Also send each clip to Whisper")
+    parser.add_argument("--upload-format", choices=["flac", "opus", "wav"], default="flac",
+                        help="Compression used for the Whisper upload")
+    args = parser.parse_args()
+
+    wav_files = args.wav_files
+    if not wav_files:
+        fixture = os.path.join(tempfile.mkdtemp(), "synthetic_speech.wav")
+        make_synthetic_fixture(fixture)
+        wav_files = [fixture]
+
+    for path in wav_files:
+        benchmark_file(path, args.fixed_duration, args.transcribe, args.upload_format)
+
+
+if __name__ == "__main__":
+    main()
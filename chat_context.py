@@ -0,0 +1,162 @@
+"""
+Sliding-window context for the Streamlit chat.
+
+8streamlit_chat.py used to send the whole conversation on every turn, so
+prompt tokens, latency and cost grew with every message until the model's
+context limit made the request fail. A ChatContext sends a bounded context
+instead:
+
+- the last keep_turns exchanges verbatim, newest first until the token budget
+  (counted locally with prompt_governor.count_tokens) is used up
+- everything older, and any window messages the budget leaves out, folded
+  into a rolling summary, sent as one system message
+
+The summary is updated incrementally in the background: when messages slide
+out of the window, one small request folds just those messages into the
+existing summary. A turn never waits for it. Until the summary has caught up,
+the messages it is still missing are sent verbatim if the budget allows.
+
+Used by 8streamlit_chat.py.
+"""
+import threading
+
+from prompt_governor import count_tokens
+
+SUMMARY_MODEL = "gpt-4o-mini"
+DEFAULT_KEEP_TURNS = 6
+DEFAULT_TOKEN_BUDGET = 3000
+SUMMARY_WORDS = 200
+
+# Tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatContext:
+    """The messages to send for one conversation: a rolling summary plus the latest turns."""
+
+    def __init__(self, client, executor, scheduler=None, keep_turns=DEFAULT_KEEP_TURNS,
+                 token_budget=DEFAULT_TOKEN_BUDGET, model=SUMMARY_MODEL):
+        """
+        Args:
+            client: The OpenAI client, for the summary requests
+            executor: A ThreadPoolExecutor to update summaries on (shared by every session)
+            scheduler: Optional api_limiter.RequestScheduler for the summary requests
+            keep_turns: How many user/assistant exchanges are kept verbatim
+            token_budget: Most tokens of context to send, summary included
+            model: The model that writes the summary
+        """
+        self.client = client
+        self.executor = executor
+        self.scheduler = scheduler
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.model = model
+        self.lock = threading.Lock()
+        self.summary = ""
+        # How many of the conversation's first messages the summary covers
+        self.summarized_upto = 0
+        self.pending = None
+        self.stats = {}
+
+    def build_messages(self, messages):
+        """
+        Choose what to send for the latest message.
+
+        Args:
+            messages: The whole conversation as role/content dicts, ending
+                with the user's new message
+
+        Returns:
+            The messages to send to the chat model
+        """
+        window_start = max(0, len(messages) - (2 * self.keep_turns + 1))
+
+        with self.lock:
+            summary, summarized_upto = self.summary, self.summarized_upto
+        context = [{"role": "system", "content": f"Summary of the conversation so far: {summary}"}] if summary else []
+        budget = self.token_budget - sum(message_tokens(message) for message in context)
+
+        # Newest first: the window, then anything the summary doesn't cover yet
+        chosen = []
+        for message in reversed(messages[summarized_upto:]):
+            tokens = message_tokens(message)
+            # The new message is always sent, even if it alone is over budget
+            if chosen and tokens > budget:
+                break
+            chosen.append({"role": message["role"], "content": message["content"]})
+            budget -= tokens
+        # Start on a question, not on an answer whose question was cut
+        while len(chosen) > 1 and chosen[-1]["role"] == "assistant":
+            budget += message_tokens(chosen.pop())
+        chosen.reverse()
+
+        # Window messages the budget left out go into the summary too, or they would be lost
+        first_sent = len(messages) - len(chosen)
+        self._fold_in_background(messages, max(window_start, first_sent))
+        if first_sent > summarized_upto:
+            # Until the summary catches up, say that something is missing rather than nothing
+            gap = {"role": "system", "content": f"{first_sent - summarized_upto} earlier messages are left out "
+                                                "here and not summarized yet."}
+            context.append(gap)
+            budget -= message_tokens(gap)
+
+        self.stats = {
+            "messages": len(messages),
+            "sent": len(chosen),
+            "summarized": summarized_upto,
+            "tokens": self.token_budget - budget,
+        }
+        return context + chosen
+
+    def describe(self):
+        """One line about the last context sent, for the page."""
+        if not self.stats:
+            return ""
+        return (f"Context: {self.stats['tokens']} tokens, the last {self.stats['sent']} messages"
+                + (f" and a summary of the first {self.stats['summarized']}" if self.stats["summarized"] else ""))
+
+    def wait(self):
+        """Block until a summary update in progress is finished (for tests and benchmarks)."""
+        pending = self.pending
+        if pending:
+            pending.result()
+
+    def _fold_in_background(self, messages, window_start):
+        """Fold messages that left the window into the summary, unless an update is already running."""
+        with self.lock:
+            if window_start <= self.summarized_upto or (self.pending and not self.pending.done()):
+                return
+            evicted = [dict(message) for message in messages[self.summarized_upto:window_start]]
+            self.pending = self.executor.submit(self._fold, self.summary, evicted, window_start)
+
+    def _fold(self, summary, evicted, upto):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in evicted)
+        request = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You keep a running summary of a conversation. Merge the new "
+                                              "messages into the summary, keeping names, facts, decisions and "
+                                              f"open questions. Answer with the summary only, at most "
+                                              f"{SUMMARY_WORDS} words."},
+                {"role": "user", "content": f"Summary so far:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"},
+            ],
+            "temperature": 0.2,
+            "max_tokens": SUMMARY_WORDS * 2,
+        }
+        try:
+            if self.scheduler:
+                response = self.scheduler.request("chat", self.client.chat.completions.with_raw_response.create,
+                                                  **request)
+            else:
+                response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            # The messages stay unsummarized and are tried again on the next turn
+            print(f"Error updating the conversation summary: {e}")
+            return
+        with self.lock:
+            self.summary = response.choices[0].message.content.strip()
+            self.summarized_upto = upto
@@ -0,0 +1,280 @@
+"""
+Shared image generation + download for the oracles.
+
+The scripts used to ask client.images.generate for a URL and then make a
+second, unpooled requests.get to download the picture. Here the image is
+requested as b64_json by default, so the bytes arrive with the generation
+response itself: one round-trip per image. With response_format="url" the
+download is streamed through a pooled requests.Session instead, which reuses
+the TLS connection to the image host across images.
+
+Every fetch returns stats (bytes, generation and download time) so the
+scripts can report what each image cost.
+
+generate_image_variants() asks for several alternatives to one prompt: in a
+single request with n > 1 where the model allows it, otherwise with
+concurrent requests whose images are handed back as each one finishes.
+
+save_image_bytes() writes those bytes to disk as they are, instead of
+decoding the PNG with PIL and compressing it again. Set ORACLE_IMAGE_FORMAT
+to webp or jpeg (and ORACLE_IMAGE_QUALITY, default 85) to transcode saved
+images into smaller files; only then is the image decoded. The Streamlit
+oracles likewise hand the encoded bytes to st.image, so the browser decodes
+them rather than PIL.
+
+Used by 4ImageOutputOracle.py, 5imageoutput-oracle.py, 6image-telephone.py,
+7pastlives.py, 7pastlivespeechtospeech.py and 9streamlit_oracle.py.
+"""
+import os
+import time
+import base64
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# How saved images are stored; "png" keeps the API's bytes untouched
+IMAGE_FORMAT = os.getenv("ORACLE_IMAGE_FORMAT", "png").lower()
+IMAGE_QUALITY = int(os.getenv("ORACLE_IMAGE_QUALITY", "85"))
+IMAGE_EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+
+# How many images one request may ask for, per model (None is the API default,
+# dall-e-2); variants beyond this are fetched with concurrent requests
+MAX_IMAGES_PER_REQUEST = {None: 10, "dall-e-2": 10, "gpt-image-1": 10, "dall-e-3": 1}
+
+# Models that always return b64_json and reject the response_format parameter
+B64_ONLY_MODELS = {"gpt-image-1"}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide requests.Session used for image downloads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            # Enough pooled connections for the scripts that generate images concurrently
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+    return _session
+
+
+def download_image(url, timeout=60):
+    """
+    Stream an image from a URL through the pooled session.
+
+    Returns:
+        A tuple of (image_bytes, seconds)
+    """
+    start = time.perf_counter()
+    buffer = BytesIO()
+    with get_session().get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+            buffer.write(chunk)
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def generate_image_bytes(client, prompt, size="1024x1024", model=None, response_format="b64_json", scheduler=None,
+                         coalesce=True):
+    """
+    Generate one image and return its encoded bytes (PNG from the Images API).
+
+    Args:
+        client: The OpenAI client
+        prompt: The image prompt
+        size: Image size, e.g. "1024x1024"
+        model: Optional image model; the API default is used if None
+        response_format: "b64_json" (bytes inline, one round-trip) or "url"
+            (download streamed through the pooled session)
+        scheduler: Optional api_limiter.RequestScheduler to send the request
+            through (shared rate limits, identical prompts coalesced)
+        coalesce: With a scheduler, share the result of an identical request
+            already in flight (turn off when asking for alternatives)
+
+    Returns:
+        A tuple of (image_bytes, stats) where stats has source, url, bytes,
+        generate_seconds, download_seconds, total_seconds and usage (token
+        counts, for models that report them, else None)
+    """
+    start = time.perf_counter()
+    response = _request_images(client, prompt, 1, size, model, response_format, scheduler, coalesce)
+    generate_seconds = time.perf_counter() - start
+    image_bytes, stats = _read_image(response.data[0], start, generate_seconds)
+    usage = getattr(response, "usage", None)
+    stats["usage"] = usage.model_dump() if usage else None
+    return image_bytes, stats
+
+
+def generate_image_variants(client, prompt, n, size="1024x1024", model=None, response_format="b64_json",
+                            scheduler=None, on_variant=None, coalesce=True):
+    """
+    Generate several alternative images for one prompt.
+
+    If the model can return n images from one request (MAX_IMAGES_PER_REQUEST)
+    they are requested together; otherwise n requests are sent concurrently
+    and each variant is handed to on_variant as soon as it arrives.
+
+    Args:
+        client, prompt, size, model, response_format, scheduler: As for generate_image_bytes
+        n: How many variants to generate
+        on_variant: Optional callback called as on_variant(index, image_bytes, stats)
+            when each variant is ready (from a worker thread when fanning out)
+        coalesce: Whether a single request for all n may share an identical
+            request's result (separate requests for variants never do)
+
+    Returns:
+        A tuple of (variants, set_stats): variants is a list of (image_bytes, stats)
+        in request order (None for a variant that failed), and set_stats has
+        mode, n, failed, first_seconds and total_seconds
+    """
+    start = time.perf_counter()
+    variants = [None] * n
+    first_seconds = None
+
+    if n <= MAX_IMAGES_PER_REQUEST.get(model, 1):
+        mode = "single request"
+        response = _request_images(client, prompt, n, size, model, response_format, scheduler, coalesce)
+        generate_seconds = time.perf_counter() - start
+        for index, image in enumerate(response.data):
+            variants[index] = _read_image(image, start, generate_seconds)
+            first_seconds = first_seconds or variants[index][1]["total_seconds"]
+            if on_variant:
+                on_variant(index, *variants[index])
+    else:
+        mode = "concurrent requests"
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            futures = {
+                # Not coalesced: identical requests are exactly what we send here
+                executor.submit(generate_image_bytes, client, prompt, size, model, response_format,
+                                scheduler, False): index
+                for index in range(n)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    variants[index] = future.result()
+                except Exception as e:
+                    print(f"Error generating variant {index + 1}: {e}")
+                    continue
+                first_seconds = first_seconds or time.perf_counter() - start
+                if on_variant:
+                    on_variant(index, *variants[index])
+
+    set_stats = {
+        "mode": mode,
+        "n": n,
+        "failed": sum(1 for variant in variants if variant is None),
+        "first_seconds": first_seconds,
+        "total_seconds": time.perf_counter() - start,
+    }
+    return variants, set_stats
+
+
+def _request_images(client, prompt, n, size, model, response_format, scheduler, coalesce):
+    request = {"prompt": prompt, "n": n, "size": size}
+    if model not in B64_ONLY_MODELS:
+        request["response_format"] = response_format
+    if model:
+        request["model"] = model
+    if scheduler:
+        return scheduler.request("images", client.images.with_raw_response.generate, coalesce=coalesce, **request)
+    return client.images.generate(**request)
+
+
+def _read_image(image, start, generate_seconds):
+    """Get the bytes of one image from a response, downloading them if only a URL was returned."""
+    if image.b64_json:
+        decode_start = time.perf_counter()
+        image_bytes = base64.b64decode(image.b64_json)
+        download_seconds = time.perf_counter() - decode_start
+        source = "b64_json"
+    else:
+        image_bytes, download_seconds = download_image(image.url)
+        source = "url"
+
+    stats = {
+        "source": source,
+        "url": image.url,
+        "bytes": len(image_bytes),
+        "generate_seconds": generate_seconds,
+        "download_seconds": download_seconds,
+        "total_seconds": time.perf_counter() - start,
+    }
+    return image_bytes, stats
+
+
+def describe_fetch(stats):
+    """One-line summary of generate_image_bytes stats, for printing or a caption."""
+    return (f"{stats['bytes'] / 1024:.0f} KB via {stats['source']} in {stats['total_seconds']:.2f}s "
+            f"(generate {stats['generate_seconds']:.2f}s, download {stats['download_seconds']:.2f}s)")
+
+
+def save_image_bytes(image_bytes, path_stem, image_format=None, quality=None):
+    """
+    Save generated image bytes to disk.
+
+    With the default "png" the bytes are written as they are, under the
+    extension of their real type (the API returns PNG, but gpt-image-1's
+    output_format or a proxy may give JPEG or WebP). For webp or jpeg the image
+    is decoded once and re-encoded at the given quality.
+
+    Args:
+        image_bytes: The encoded image, as returned by generate_image_bytes
+        path_stem: Where to save it, without an extension
+        image_format: "png", "webp" or "jpeg" (defaults to ORACLE_IMAGE_FORMAT)
+        quality: Encoder quality for webp/jpeg (defaults to ORACLE_IMAGE_QUALITY)
+
+    Returns:
+        The path written, with the extension for the format
+    """
+    image_format = (image_format or IMAGE_FORMAT).lower()
+    if image_format not in IMAGE_EXTENSIONS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    image_path = path_stem + IMAGE_EXTENSIONS[image_format]
+
+    if image_format == "png":
+        _, extension = sniff_image_type(image_bytes)
+        image_path = path_stem + (extension or IMAGE_EXTENSIONS["png"])
+        with open(image_path, "wb") as f:
+            f.write(image_bytes)
+        return image_path
+
+    from PIL import Image
+    image = Image.open(BytesIO(image_bytes))
+    if image_format == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(image_path, format=image_format.upper(), quality=quality or IMAGE_QUALITY)
+    return image_path
+
+
+def sniff_image_type(image_bytes):
+    """
+    Identify encoded image bytes by their signature, without decoding them.
+
+    Returns:
+        A tuple of (mime_type, extension), e.g. ("image/png", ".png")
+    """
+    if image_bytes.startswith(b"\x89PNG"):
+        return "image/png", ".png"
+    if image_bytes.startswith(b"\xff\xd8"):
+        return "image/jpeg", ".jpg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return "application/octet-stream", ""
+
+
+def show_image(image_bytes, image_path):
+    """Open the image in the system viewer, decoding it only now that it is needed."""
+    try:
+        from PIL import Image
+        Image.open(BytesIO(image_bytes)).show()
+    except Exception:
+        print(f"Note: Could not display the image automatically. Please open {image_path} to view it.")
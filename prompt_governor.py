@@ -0,0 +1,156 @@
+"""
+Keeps the telephone game's prompts from growing cycle after cycle.
+
+Each description becomes the next image prompt, and descriptions written
+with max_tokens=300 are long: the prompt grows, image generation slows down,
+and past the Images API's limit (1000 characters for dall-e-2) the request is
+rejected. govern_prompt() checks a prompt against a character and token
+budget and only when it is over budget shortens it, either locally (filler
+openings dropped, then whole sentences kept in order while they fit) or with
+one cheap summarization request that falls back to the local method if it
+fails.
+
+count_tokens() uses tiktoken when it is installed and a characters-per-token
+estimate otherwise.
+
+Used by 6image-telephone.py and telephone_runner.py; chat_context.py uses
+count_tokens() for its budget.
+"""
+import os
+import re
+import time
+
+DEFAULT_MAX_CHARS = int(os.getenv("TELEPHONE_PROMPT_CHARS", "900"))
+DEFAULT_MAX_TOKENS = int(os.getenv("TELEPHONE_PROMPT_TOKENS", "200"))
+SUMMARY_MODEL = "gpt-4o-mini"
+GOVERNOR_MODES = ("local", "summarize", "off")
+
+# Used when tiktoken isn't installed; about right for English prose
+CHARS_PER_TOKEN = 4
+
+# Openings that describe the act of looking rather than what is in the picture;
+# only removed at the start of a sentence, where they carry no meaning
+FILLER = re.compile(
+    r"^(?:(?:in this image,?|this image (?:shows|depicts|features)|the image (?:shows|depicts|features)|"
+    r"i (?:can )?see|there (?:is|are)|it (?:appears|seems) (?:that|to be)|overall,?|"
+    r"in the (?:background|foreground),? (?:there (?:is|are) )?)\s*)+",
+    re.IGNORECASE,
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_encoding = None
+
+
+def count_tokens(text, model="gpt-4o"):
+    """Count the tokens in text with tiktoken, or estimate them if it isn't installed."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compress_locally(text, max_chars):
+    """
+    Shorten a description without an API call.
+
+    Filler openings and markdown are dropped and whitespace collapsed; if that
+    isn't enough, sentences are kept from the start (where the description
+    names the subject) while they fit, and a single sentence that is too long
+    is cut at a word boundary.
+    """
+    text = re.sub(r"[*_#`>]+", "", text)
+    sentences = [FILLER.sub("", sentence) for sentence in SENTENCE_END.split(" ".join(text.split()))]
+    # Sentences that lost their opening start with a capital again
+    sentences = [sentence[:1].upper() + sentence[1:] for sentence in sentences if sentence]
+    text = " ".join(sentences)
+    if len(text) <= max_chars:
+        return text
+
+    kept = ""
+    for sentence in sentences:
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+    if not kept:
+        kept = text[:max_chars].rsplit(" ", 1)[0]
+    return kept
+
+
+def summarize(client, text, max_chars, scheduler=None):
+    """Ask a small model to rewrite a description as an image prompt of at most max_chars."""
+    request = {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": "You rewrite image descriptions as short image-generation prompts. "
+                                          "Keep the subject, setting, colors and style; drop everything else."},
+            {"role": "user", "content": f"Rewrite this in at most {max_chars} characters:\n\n{text}"},
+        ],
+        "temperature": 0.3,
+        "max_tokens": max(32, max_chars // CHARS_PER_TOKEN),
+    }
+    if scheduler:
+        response = scheduler.request("chat", client.chat.completions.with_raw_response.create, **request)
+    else:
+        response = client.chat.completions.create(**request)
+    return response.choices[0].message.content.strip()
+
+
+def govern_prompt(prompt, max_chars=DEFAULT_MAX_CHARS, max_tokens=DEFAULT_MAX_TOKENS, mode="local",
+                  client=None, scheduler=None):
+    """
+    Bring a prompt within budget, touching it only if it is over.
+
+    Args:
+        prompt: The prompt as written (e.g. the last image's description)
+        max_chars: Longest prompt allowed, in characters
+        max_tokens: Longest prompt allowed, in tokens (count_tokens)
+        mode: "local" (heuristics), "summarize" (one request to SUMMARY_MODEL,
+            needs client) or "off" (only measure)
+        client, scheduler: The OpenAI client and optional RequestScheduler for "summarize"
+
+    Returns:
+        A tuple of (prompt, stats) where stats has raw_chars, raw_tokens, chars,
+        tokens, method ("none", "local", "summarize" or "summarize+local") and seconds
+    """
+    start = time.perf_counter()
+    raw_chars, raw_tokens = len(prompt), count_tokens(prompt)
+    method = "none"
+    # Tokens are converted to characters so one limit can be used to cut
+    limit = min(max_chars, max_tokens * CHARS_PER_TOKEN)
+
+    if mode != "off" and (raw_chars > max_chars or raw_tokens > max_tokens):
+        if mode == "summarize" and client is not None:
+            try:
+                prompt, method = summarize(client, prompt, limit, scheduler), "summarize"
+            except Exception as e:
+                print(f"Error summarizing prompt, shortening it locally instead: {e}")
+        # Also catches a summary that came back over budget
+        if len(prompt) > limit or count_tokens(prompt) > max_tokens:
+            prompt = compress_locally(prompt, limit)
+            method = "local" if method == "none" else f"{method}+local"
+            # Text denser than CHARS_PER_TOKEN can still be over; cut again, shorter, until it fits
+            tokens = count_tokens(prompt)
+            while tokens > max_tokens:
+                limit = min(limit - 1, len(prompt) * max_tokens // tokens)
+                prompt = compress_locally(prompt, limit)
+                tokens = count_tokens(prompt)
+
+    stats = {
+        "raw_chars": raw_chars,
+        "raw_tokens": raw_tokens,
+        "chars": len(prompt),
+        "tokens": count_tokens(prompt),
+        "method": method,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return prompt, stats
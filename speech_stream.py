@@ -0,0 +1,188 @@
+"""
+Sentence-streamed text-to-speech for the voice oracles.
+
+Instead of waiting for the whole chat completion, synthesizing the whole text
+and only then playing it, this module streams the completion tokens, cuts them
+into sentences as they arrive, synthesizes each sentence on a thread pool and
+queues the clips on the shared PlaybackService so they play back to back
+without gaps. The first sentence is usually audible well under a second after
+it is written, and stopping the player (barge-in) abandons the rest.
+
+Used by 7pastlivespeechtospeech.py and weather.py.
+"""
+import re
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_playback import get_player
+
+# A sentence ends with . ! or ? (optionally followed by closing quotes or
+# brackets) and then whitespace
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+
+
+class SentenceSplitter:
+    """Accumulate streamed text and hand back complete sentences."""
+
+    def __init__(self, min_chars=20):
+        """
+        Args:
+            min_chars: Shorter sentences are merged with the next one so that
+                fragments like "Ah." don't each cost a TTS request
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        """
+        Add a chunk of streamed text.
+
+        Args:
+            text: The next piece of the completion
+
+        Returns:
+            A list of the sentences completed by this chunk (may be empty)
+        """
+        self.buffer += text
+        sentences = []
+        search_from = 0
+        while True:
+            match = SENTENCE_END.search(self.buffer, search_from)
+            if not match:
+                break
+            sentence = self.buffer[:match.end()].strip()
+            if len(sentence) < self.min_chars:
+                search_from = match.end()
+                continue
+            sentences.append(sentence)
+            self.buffer = self.buffer[match.end():]
+            search_from = 0
+        return sentences
+
+    def flush(self):
+        """Return whatever text is left once the stream has ended."""
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return [sentence] if sentence else []
+
+
+def stream_chat_text(client, **request):
+    """
+    Stream a chat completion and yield its text deltas.
+
+    Args:
+        client: The OpenAI client
+        **request: Arguments for client.chat.completions.create
+
+    Yields:
+        Pieces of the assistant's reply as they arrive
+    """
+    response = client.chat.completions.create(stream=True, **request)
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def synthesize_sentence(client, text, model="tts-1", voice="onyx", speed=1.0):
+    """
+    Synthesize one sentence and return it as WAV bytes.
+
+    WAV is used rather than mp3 because pygame can build a Sound from it in
+    memory without any decoder surprises.
+    """
+    response = client.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        speed=speed,
+        response_format="wav"
+    )
+    return response.content
+
+
+def speak_streamed(client, text_chunks, model="tts-1", voice="onyx", speed=1.0,
+                   max_workers=3, on_sentence=None, synthesize=None, wait=True):
+    """
+    Speak streamed text sentence by sentence while it is still being written.
+
+    Sentences are synthesized concurrently (up to max_workers at a time) but
+    always played in the order they were written.
+
+    Args:
+        client: The OpenAI client
+        text_chunks: Any iterable of text pieces, e.g. stream_chat_text(...)
+        model, voice, speed: Text-to-speech settings
+        max_workers: How many sentences may be synthesized at once
+        on_sentence: Optional callback called with each sentence as it is queued
+        synthesize: Optional replacement for synthesize_sentence, called as
+            synthesize(text) and returning WAV bytes
+        wait: Block until the last sentence has finished playing
+
+    Returns:
+        A tuple of (full_text, stats) where stats has time_to_first_audio,
+        sentences and total seconds
+    """
+    if synthesize is None:
+        def synthesize(text):
+            return synthesize_sentence(client, text, model=model, voice=voice, speed=speed)
+
+    start = time.perf_counter()
+    stats = {"time_to_first_audio": None, "sentences": 0, "total": None}
+    splitter = SentenceSplitter()
+    pending = queue.Queue()
+    full_text = []
+    player = get_player()
+    token = player.begin()
+
+    feeder = threading.Thread(target=_play_in_order, args=(pending, stats, start, player, token), daemon=True)
+    feeder.start()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(sentences):
+            for sentence in sentences:
+                if on_sentence:
+                    on_sentence(sentence)
+                stats["sentences"] += 1
+                pending.put(executor.submit(synthesize, sentence))
+
+        try:
+            for chunk in text_chunks:
+                if player.cancelled(token):
+                    # The user interrupted, so there's no point writing the rest
+                    break
+                full_text.append(chunk)
+                submit(splitter.feed(chunk))
+            else:
+                submit(splitter.flush())
+        finally:
+            # Tell the feeder there is nothing more to come
+            pending.put(None)
+            feeder.join()
+
+    if wait:
+        player.wait()
+
+    stats["total"] = time.perf_counter() - start
+    return "".join(full_text).strip(), stats
+
+
+def _play_in_order(pending, stats, start, player, token):
+    """Hand synthesized sentences to the player in the order they were written."""
+    while True:
+        future = pending.get()
+        if future is None:
+            break
+        if player.cancelled(token):
+            future.cancel()
+            continue
+        try:
+            wav_bytes = future.result()
+        except Exception as e:
+            print(f"Error synthesizing sentence: {e}")
+            continue
+
+        player.enqueue(wav_bytes, token)
+        if stats["time_to_first_audio"] is None:
+            stats["time_to_first_audio"] = time.perf_counter() - start
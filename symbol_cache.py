@@ -0,0 +1,158 @@
+"""
+Name-keyed cache of generated sacred symbols.
+
+The oracles save every symbol to oracle_symbols/ but never read one back, so
+the same visitor asking twice paid for two DALL-E images. This module keeps an
+index.json in oracle_symbols/ that maps a normalized name plus a hash of the
+prompt to the newest image for it. A symbol younger than the TTL is served
+from disk instantly; asking with force regeneration (or changing the prompt
+wording) produces a new one.
+
+File names get a random suffix as well as the timestamp, so two requests for
+the same name in the same second no longer overwrite each other.
+
+Used by 4ImageOutputOracle.py, 5imageoutput-oracle.py and 9streamlit_oracle.py.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import threading
+
+from image_fetch import save_image_bytes
+
+DEFAULT_SYMBOL_DIR = "oracle_symbols"
+DEFAULT_TTL_SECONDS = int(os.getenv("SYMBOL_CACHE_TTL", 7 * 24 * 3600))  # a week
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a name, so "Ada " and "ada" match."""
+    return " ".join(name.split()).casefold()
+
+
+def safe_file_name(name):
+    """Turn a visitor's name into something safe to use in a file name."""
+    return re.sub(r"[^\w-]+", "_", name.strip()) or "anonymous"
+
+
+class SymbolCache:
+    """An index of generated symbols in oracle_symbols/, reused while fresh."""
+
+    def __init__(self, directory=DEFAULT_SYMBOL_DIR, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            directory: Where the images and index.json are kept
+            ttl_seconds: How long a symbol is reused before a new one is generated
+        """
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.entries = self._load_index()
+
+    @staticmethod
+    def make_key(name, prompt, size):
+        """
+        Key a symbol by normalized name and a hash of the prompt template.
+
+        The name is taken back out of the prompt and whitespace is collapsed,
+        so spellings of the same name (and the scripts' differently indented
+        copies of the same prompt) share an entry, while rewording the prompt
+        gives a new one.
+        """
+        template = " ".join(prompt.replace(name, "{name}").split())
+        prompt_hash = hashlib.sha256(json.dumps([template, size]).encode("utf-8")).hexdigest()
+        return f"{normalize_name(name)}:{prompt_hash[:16]}"
+
+    def get(self, name, prompt, size="1024x1024"):
+        """
+        Look up a fresh symbol for a name.
+
+        Returns:
+            A tuple of (path, age_seconds), or (None, None) if there is no
+            symbol younger than the TTL
+        """
+        key = self.make_key(name, prompt, size)
+        with self.lock:
+            entry = self.entries.get(key)
+            path = os.path.join(self.directory, entry["file"]) if entry else None
+            age = time.time() - entry["created"] if entry else None
+            if not path or age > self.ttl_seconds or not os.path.exists(path):
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            return path, age
+
+    def put(self, name, prompt, image_bytes, size="1024x1024", kind="sacred_symbol"):
+        """
+        Save a newly generated symbol and make it the one served for this name.
+
+        Returns:
+            The path the image was saved to
+        """
+        image_path = self.save(name, image_bytes, kind)
+        self.remember(name, prompt, image_path, size)
+        return image_path
+
+    def save(self, name, image_bytes, kind="sacred_symbol"):
+        """
+        Save a symbol to the cache folder without serving it for the name yet.
+
+        Used for variants, until the visitor keeps one with remember().
+
+        Returns:
+            The path the image was saved to
+        """
+        stem = f"{safe_file_name(name)}_{kind}_{int(time.time())}_{uuid.uuid4().hex[:6]}"
+        return save_image_bytes(image_bytes, os.path.join(self.directory, stem))
+
+    def remember(self, name, prompt, image_path, size="1024x1024"):
+        """
+        Make an image already saved in the cache folder the one served for this name.
+
+        Used when several variants were generated and the visitor picked one.
+        """
+        with self.lock:
+            # Another process (e.g. a second Streamlit server) may have added entries
+            self.entries.update(self._load_index())
+            self.entries[self.make_key(name, prompt, size)] = {
+                "name": name.strip(),
+                "file": os.path.basename(image_path),
+                "created": time.time(),
+                "size": size,
+            }
+            self._save_index()
+
+    def stats(self):
+        """Return hit/miss counters and how many names are indexed."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        # Write to a temporary file first so a crash never leaves a half-written index
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.index_path)
+
+
+def describe_age(seconds):
+    """Human-friendly age of a cached symbol, e.g. "3 minutes"."""
+    for unit, length in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= length:
+            count = int(seconds // length)
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return "moments"
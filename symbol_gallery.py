@@ -0,0 +1,106 @@
+"""
+Gallery of previously generated images in oracle_symbols/.
+
+Listing the folder only reads file names; no image is opened until a page of
+the gallery is shown. Each image gets a small JPEG thumbnail the first time it
+is shown, saved in oracle_symbols/thumbnails/, so later visits read a few KB
+per symbol instead of decoding a full 1024x1024 PNG. The full image is loaded
+only when a visitor asks for it.
+
+Used by 9streamlit_oracle.py.
+"""
+import os
+import re
+import threading
+
+from image_fetch import IMAGE_EXTENSIONS
+
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_SIZE = 256
+THUMBNAIL_QUALITY = 80
+
+# {name}_{kind}_{timestamp}[_{suffix}].{ext}, as written by the oracles
+FILE_NAME = re.compile(r"^(?P<name>.+?)_(?P<kind>sacred_symbol|past_life)_(?P<timestamp>\d+)(?:_[0-9a-f]+)?$")
+
+_thumbnail_lock = threading.Lock()
+
+
+def list_symbols(directory="oracle_symbols", kinds=("sacred_symbol",)):
+    """
+    List the saved images in a folder, newest first, without opening them.
+
+    Args:
+        directory: The folder the oracles save images to
+        kinds: Which kinds of image to include ("sacred_symbol", "past_life")
+
+    Returns:
+        A list of dicts with path, name, kind and timestamp
+    """
+    extensions = set(IMAGE_EXTENSIONS.values())
+    symbols = []
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        stem, extension = os.path.splitext(entry.name)
+        match = FILE_NAME.match(stem)
+        if not entry.is_file() or extension.lower() not in extensions or not match:
+            continue
+        if match.group("kind") not in kinds:
+            continue
+        symbols.append({
+            "path": entry.path,
+            "name": match.group("name").replace("_", " "),
+            "kind": match.group("kind"),
+            "timestamp": int(match.group("timestamp")),
+        })
+    symbols.sort(key=lambda symbol: symbol["timestamp"], reverse=True)
+    return symbols
+
+
+def get_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """
+    Return the path of a small JPEG thumbnail for an image, creating it once.
+
+    Returns:
+        The thumbnail's path, or the original image's path if it couldn't be made
+    """
+    directory, file_name = os.path.split(image_path)
+    thumbnail_dir = os.path.join(directory, THUMBNAIL_DIR)
+    thumbnail_path = os.path.join(thumbnail_dir, f"{os.path.splitext(file_name)[0]}_{size}.jpg")
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+
+    with _thumbnail_lock:
+        # Another session may have made it while we waited
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+        try:
+            from PIL import Image
+            os.makedirs(thumbnail_dir, exist_ok=True)
+            with Image.open(image_path) as image:
+                # Lets JPEG sources decode at reduced size; a no-op for PNG
+                image.draft("RGB", (size, size))
+                image = image.convert("RGB")
+                image.thumbnail((size, size))
+                temp_path = thumbnail_path + ".tmp"
+                image.save(temp_path, format="JPEG", quality=THUMBNAIL_QUALITY)
+            os.replace(temp_path, thumbnail_path)
+            return thumbnail_path
+        except Exception as e:
+            print(f"Error creating thumbnail for {image_path}: {e}")
+            return image_path
+
+
+def paginate(items, page, per_page):
+    """
+    Slice one page out of a list.
+
+    Returns:
+        A tuple of (items_on_page, page, page_count), with page clamped to the valid range
+    """
+    page_count = max(1, -(-len(items) // per_page))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * per_page
+    return items[start:start + per_page], page, page_count
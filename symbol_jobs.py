@@ -0,0 +1,128 @@
+"""
+Background job queue for generating symbols in the Streamlit oracles.
+
+Generating an image takes 10-20 seconds. Done inline, it blocks the session's
+script run, and a rerun (any widget change) abandons the request after it has
+been paid for. Here the work runs on a small, process-wide thread pool:
+submit() returns a job id at once, the page polls the job for its status (from
+an st.fragment(run_every=1), so only the progress box reruns), and because the
+queue lives in st.cache_resource, shared by every session, a rerun or a page
+refresh simply looks the job up again. Submitting a name that is already being generated,
+with the same options and the same API key, returns the existing job instead
+of starting a second one; a regenerate request always starts its own.
+
+Workers must not call Streamlit themselves (they have no script context);
+they report progress with job.update(message) instead, and can hand over
+results that are ready early by appending to job.partial_results.
+
+Used by 5imageoutput-oracle.py and 9streamlit_oracle.py.
+"""
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from symbol_cache import normalize_name
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class SymbolJob:
+    """The state of one generation request, shared between the worker and the page."""
+
+    def __init__(self, job_id, name, regenerate, options):
+        self.id = job_id
+        self.name = name
+        self.regenerate = regenerate
+        self.options = options
+        self.status = QUEUED
+        self.message = "Waiting for a free oracle..."
+        self.result = None
+        # Results a worker has ready before the job is done, e.g. finished variants
+        self.partial_results = []
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def update(self, message):
+        """Report progress from the worker; the page shows the latest message."""
+        self.message = message
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+
+class SymbolJobQueue:
+    """A bounded pool of workers running generation jobs, looked up by id."""
+
+    def __init__(self, work, max_workers=2, keep_seconds=3600, key_options=("client",)):
+        """
+        Args:
+            work: Called as work(job) on a worker thread; its return value
+                becomes job.result and an exception marks the job failed
+            max_workers: How many images may be generated at once
+            keep_seconds: How long finished jobs stay available to reattach to
+            key_options: The options that change a job's result or who pays for
+                it; only jobs that agree on all of them are shared
+        """
+        self.work = work
+        self.keep_seconds = keep_seconds
+        self.key_options = tuple(key_options)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="symbol-job")
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def submit(self, name, regenerate=False, **options):
+        """
+        Queue a symbol for a name, or reattach to one already in progress.
+
+        Args:
+            name: The name to generate a symbol for
+            regenerate: Passed on to the worker as job.regenerate
+            **options: Anything else the worker needs (e.g. the session's
+                OpenAI client), available as job.options
+
+        Returns:
+            The job id
+        """
+        with self.lock:
+            self._forget_old_jobs()
+            key = self._job_key(name, regenerate, options)
+            if key is not None:
+                for job in self.jobs.values():
+                    if job.active and self._job_key(job.name, job.regenerate, job.options) == key:
+                        return job.id
+            job = SymbolJob(uuid.uuid4().hex[:12], name, regenerate, options)
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """Return the job with this id, or None if it is unknown or expired."""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _job_key(self, name, regenerate, options):
+        """What makes two submissions the same job, or None if this one is never shared."""
+        if regenerate:
+            return None
+        # Clients are told apart by the key they bill, other options by value
+        return (normalize_name(name),) + tuple(getattr(options.get(option), "api_key", options.get(option))
+                                               for option in self.key_options)
+
+    def _run(self, job):
+        job.status = RUNNING
+        try:
+            job.result = self.work(job)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _forget_old_jobs(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
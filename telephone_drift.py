@@ -0,0 +1,240 @@
+"""
+How far a telephone game drifts from where it started, measured with embeddings.
+
+Reads the .jsonl logs the game writes (telephone_log): single games
+(telephone_game/game_<timestamp>.jsonl) and the chains of multi-chain runs
+(telephone_game/run_<timestamp>/<chain>/cycles.jsonl; a branch is joined to
+its parent's earlier cycles). For each log the texts are the initial prompt
+followed by every cycle's description.
+
+All texts that don't have an embedding yet, from every log at once, go to the
+embeddings endpoint in as few batched requests as the endpoint's limits allow
+(2048 inputs and about 300k tokens per request). The cosine-similarity matrices of all logs are then
+computed together with NumPy: the embeddings are normalized and stacked into
+one zero-padded (logs x texts x dimensions) array, so a single einsum gives
+every log's text-by-text matrix. Row 0 of a matrix is each text's similarity
+to the origin and the first off-diagonal is cycle-to-cycle similarity.
+
+Next to each log it writes:
+
+    <log>_drift.npy   the full similarity matrix (texts x texts)
+    <log>_drift.csv   per cycle: similarity to the previous text and to the origin
+    <log>_drift.npz   the embeddings and their texts, reused on the next pass
+
+and telephone_game/drift_summary.csv with one line per log.
+
+Run from the repository root:
+    python telephone_drift.py                  # every log in telephone_game/
+    python telephone_drift.py telephone_game/game_1712345678.jsonl
+    python telephone_drift.py --watch 10       # live: update logs as cycles are added
+"""
+import os
+import csv
+import glob
+import time
+import argparse
+
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from telephone_log import read_log
+from prompt_governor import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+MAX_INPUTS_PER_REQUEST = 2048
+# The endpoint's limit is 300k tokens per request; counts are local, so keep a margin
+MAX_TOKENS_PER_REQUEST = 250_000
+
+
+def find_logs(directory="telephone_game"):
+    """Every game and chain log under a folder."""
+    logs = glob.glob(os.path.join(directory, "game_*.jsonl"))
+    logs += glob.glob(os.path.join(directory, "run_*", "*", "cycles.jsonl"))
+    return sorted(logs)
+
+
+def load_texts(log_path):
+    """
+    The texts of one log in order: the initial prompt, then each cycle's description.
+
+    A branch chain's log starts at the branch cycle; its parent's earlier
+    cycles are read from the parent's log in the same run.
+    """
+    records = read_log(log_path)
+    game = next((record for record in records if record["type"] == "game"), None)
+    if game is None:
+        return []
+    cycles = {record["cycle"]: record["description"] for record in records if record["type"] == "cycle"}
+
+    parent = game.get("parent")
+    if parent:
+        parent_path = os.path.join(os.path.dirname(os.path.dirname(log_path)), parent, "cycles.jsonl")
+        if os.path.exists(parent_path):
+            earlier = load_texts(parent_path)[1:game.get("first_cycle", 1)]
+            cycles = {**dict(enumerate(earlier, start=1)), **cycles}
+    return [game["initial_prompt"]] + [cycles[number] for number in sorted(cycles)]
+
+
+def report_stem(log_path):
+    return os.path.splitext(log_path)[0]
+
+
+def load_cached_embeddings(log_path, texts):
+    """Embeddings saved by an earlier pass, for the texts that haven't changed since."""
+    try:
+        cached = np.load(report_stem(log_path) + "_drift.npz")
+    except (FileNotFoundError, OSError, ValueError):
+        return {}
+    return {text: vector for text, vector in zip(cached["texts"], cached["embeddings"]) if text in texts}
+
+
+def batches(texts):
+    """Split texts into requests of at most MAX_INPUTS_PER_REQUEST inputs and MAX_TOKENS_PER_REQUEST tokens."""
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = count_tokens(text, EMBEDDING_MODEL)
+        if batch and (len(batch) == MAX_INPUTS_PER_REQUEST or batch_tokens + tokens > MAX_TOKENS_PER_REQUEST):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed(client, texts):
+    """Embed texts in as few requests as the endpoint's input and token limits allow."""
+    vectors = []
+    for batch in batches(texts):
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def similarity_matrices(embedding_sets):
+    """
+    Cosine-similarity matrices for many logs at once.
+
+    Args:
+        embedding_sets: A list of (texts x dimensions) arrays, one per log
+
+    Returns:
+        A list of (texts x texts) matrices, in the same order
+    """
+    if not embedding_sets:
+        return []
+    lengths = [len(embeddings) for embeddings in embedding_sets]
+    stacked = np.zeros((len(embedding_sets), max(lengths), embedding_sets[0].shape[1]), dtype=np.float32)
+    for i, embeddings in enumerate(embedding_sets):
+        stacked[i, :len(embeddings)] = embeddings
+    norms = np.linalg.norm(stacked, axis=2, keepdims=True)
+    stacked /= np.where(norms == 0, 1, norms)
+    matrices = np.einsum("rid,rjd->rij", stacked, stacked)
+    return [matrices[i, :n, :n] for i, n in enumerate(lengths)]
+
+
+def drift_rows(matrix):
+    """Per cycle: similarity to the previous text and to the origin, from a log's matrix."""
+    cycles = np.arange(1, len(matrix))
+    return np.column_stack([cycles, matrix[cycles, cycles - 1], matrix[cycles, 0]])
+
+
+def write_report(log_path, texts, embeddings, matrix):
+    stem = report_stem(log_path)
+    np.save(stem + "_drift.npy", matrix)
+    np.savez(stem + "_drift.npz", texts=np.asarray(texts), embeddings=embeddings)
+    np.savetxt(stem + "_drift.csv", drift_rows(matrix), delimiter=",", fmt=["%d", "%.4f", "%.4f"],
+               header="cycle,to_previous,to_origin", comments="")
+
+
+def analyze(client, log_paths, summary_path=None):
+    """
+    Embed and score a set of logs, writing each one's report.
+
+    Returns:
+        A list of summary dicts (log, cycles, final_to_origin, mean_to_previous, min_to_origin)
+    """
+    texts_by_log = {path: load_texts(path) for path in log_paths}
+    texts_by_log = {path: texts for path, texts in texts_by_log.items() if len(texts) > 1}
+    # Branches share their parent's texts, so known embeddings are pooled across logs
+    known = {}
+    for path, texts in texts_by_log.items():
+        known.update(load_cached_embeddings(path, set(texts)))
+
+    # Everything not embedded before, from every log, in one batch
+    missing = sorted({text for texts in texts_by_log.values() for text in texts if text not in known})
+    if missing:
+        start = time.perf_counter()
+        known.update(zip(missing, embed(client, missing)))
+        print(f"Embedded {len(missing)} new texts in {time.perf_counter() - start:.1f}s")
+
+    paths = list(texts_by_log)
+    embedding_sets = [np.stack([known[text] for text in texts_by_log[path]]) for path in paths]
+    summaries = []
+    for path, embeddings, matrix in zip(paths, embedding_sets, similarity_matrices(embedding_sets)):
+        write_report(path, texts_by_log[path], embeddings, matrix)
+        rows = drift_rows(matrix)
+        summaries.append({
+            "log": path,
+            "cycles": len(rows),
+            "final_to_origin": round(float(rows[-1, 2]), 4),
+            "mean_to_previous": round(float(rows[:, 1].mean()), 4),
+            "min_to_origin": round(float(rows[:, 2].min()), 4),
+        })
+
+    if summary_path and summaries:
+        with open(summary_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summaries[0]))
+            writer.writeheader()
+            writer.writerows(summaries)
+    return summaries
+
+
+def print_summaries(summaries):
+    for summary in summaries:
+        print(f"{summary['log']}: {summary['cycles']} cycles, similarity to the origin "
+              f"{summary['final_to_origin']:.2f} at the end (lowest {summary['min_to_origin']:.2f}), "
+              f"{summary['mean_to_previous']:.2f} cycle to cycle on average")
+
+
+def watch(client, directory, interval):
+    """Re-analyze logs whenever cycles are added to them, until interrupted."""
+    seen = {}
+    print(f"Watching {directory} for new cycles every {interval:.0f}s (Ctrl+C to stop)")
+    try:
+        while True:
+            modified = {path: os.path.getmtime(path) for path in find_logs(directory)}
+            changed = [path for path, mtime in modified.items() if seen.get(path) != mtime]
+            if changed:
+                print_summaries(analyze(client, changed))
+                seen.update({path: modified[path] for path in changed})
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("logs", nargs="*", help="Logs to analyze (default: every log in --directory)")
+    parser.add_argument("--directory", default="telephone_game", help="Where the game logs are")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Keep running and update changed logs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    if args.watch:
+        watch(client, args.directory, args.watch)
+        return
+
+    start = time.perf_counter()
+    log_paths = args.logs or find_logs(args.directory)
+    summary_path = os.path.join(args.directory, "drift_summary.csv")
+    summaries = analyze(client, log_paths, summary_path=summary_path)
+    print_summaries(summaries)
+    print(f"\n{len(summaries)} logs analyzed in {time.perf_counter() - start:.1f}s; summary in {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
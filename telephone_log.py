@@ -0,0 +1,80 @@
+"""
+Checkpoint log for the AI Telephone Game: one JSON record per line.
+
+The game used to keep only a free-text game_log_<timestamp>.txt, which can't
+be read back, so a failure in cycle 7 threw away six paid-for cycles. Each
+cycle is now appended to a .jsonl file as soon as it is finished, with its
+prompt, image path, description, timings and token usage, and the file is
+fsynced so the record survives a crash. A game can then be resumed from its
+last good cycle.
+
+Records have a "type":
+
+    game    the first line: initial_prompt, cycles, started
+    cycle   cycle, prompt, image_path, description, timings, usage
+    stopped cycle, error (the game gave up after its retries)
+
+Used by 6image-telephone.py and telephone_runner.py.
+"""
+import os
+import json
+import glob
+import time
+
+
+class CycleLog:
+    """An append-only JSONL file, flushed to disk after every record."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, record_type, **fields):
+        """Write one record and fsync it before returning."""
+        record = dict({"type": record_type, "time": round(time.time(), 3)}, **fields)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return record
+
+
+def read_log(path):
+    """
+    Read every complete record of a log.
+
+    A line cut short by a crash is skipped, so the log reads up to the last
+    record that was fully written.
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def resume_point(path):
+    """
+    Find where a game left off.
+
+    Returns:
+        A tuple of (game_record, cycle_records): the game's settings and the
+        cycles completed so far, in order
+    """
+    records = read_log(path)
+    game = next((record for record in records if record["type"] == "game"), None)
+    if game is None:
+        raise ValueError(f"{path} is not a telephone game log")
+    cycles = {record["cycle"]: record for record in records if record["type"] == "cycle"}
+    return game, [cycles[number] for number in sorted(cycles)]
+
+
+def latest_log(directory="telephone_game", pattern="game_*.jsonl"):
+    """Return the most recently written game log in a folder, or None."""
+    paths = glob.glob(os.path.join(directory, pattern))
+    return max(paths, key=os.path.getmtime) if paths else None
@@ -0,0 +1,286 @@
+"""
+Runs many AI Telephone Game chains at once.
+
+run_telephone_game in 6image-telephone.py plays one chain, one request at a
+time, so a 10-cycle game takes minutes and comparing how several prompts
+drift means running the script several times. TelephoneRunner plays any
+number of chains (different prompts, or the same prompt several times)
+concurrently on asyncio. The SDK calls are blocking, so each one runs on a
+thread pool; an asyncio.Semaphore shared by every chain caps how many are in
+flight, and an api_limiter.RequestScheduler paces them by the API's
+rate-limit headers (without coalescing: chains playing the same prompt are
+meant to drift apart). While a chain waits for one request, the others use the
+free slots, so throughput grows with the number of chains until the rate
+limits are reached.
+
+Before each cycle the prompt goes through prompt_governor, so descriptions
+can't make the image prompts grow without bound.
+
+A chain can branch: at one cycle its prompt is turned into K image variants
+(one request with n=K where the model allows it) and each variant continues
+as its own chain.
+
+Everything a run produces goes into one directory:
+
+    telephone_game/run_<timestamp>/
+        run.json                  settings, every chain's cycles and timings
+        chain01/cycle01.png       images, one folder per chain
+        chain01/cycles.jsonl      the chain's checkpoint log (telephone_log)
+        chain01.b2/cycle02.png    branch 2 of chain01, from the branch cycle on
+
+Used by 6image-telephone.py.
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from image_fetch import generate_image_bytes, generate_image_variants, save_image_bytes, sniff_image_type
+from api_limiter import is_transient, backoff_delay
+from telephone_log import CycleLog
+from prompt_governor import govern_prompt
+
+RUN_ROOT = "telephone_game"
+DEFAULT_CONCURRENCY = 4
+RETRY_ATTEMPTS = 4
+
+VISION_MODEL = "gpt-4o"
+SYSTEM_PROMPT = "You are a kid playing a game of telephone."
+DESCRIBE_PROMPT = "Describe this image in detail. What do you see?"
+
+
+def describe_image(client, image_bytes, scheduler=None, coalesce=True):
+    """
+    Ask the vision model what it sees in an image.
+
+    Args:
+        client: The OpenAI client
+        image_bytes: The encoded image, as generated
+        scheduler: Optional api_limiter.RequestScheduler to send the request through
+        coalesce: With a scheduler, share the answer of an identical request in flight
+
+    Returns:
+        A tuple of (description, usage), usage being the token counts as a dict
+    """
+    # Label the data URL with the image's real type (the API returns PNG)
+    mime_type, _ = sniff_image_type(image_bytes)
+    data_url = f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+    request = {
+        "model": VISION_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": [
+                {"type": "text", "text": DESCRIBE_PROMPT},
+                {"type": "image_url", "image_url": {"url": data_url}},
+            ]},
+        ],
+        "temperature": 0.9,
+        "max_tokens": 300,
+    }
+    if scheduler:
+        response = scheduler.request("chat", client.chat.completions.with_raw_response.create, coalesce=coalesce,
+                                     **request)
+    else:
+        response = client.chat.completions.create(**request)
+    usage = response.usage.model_dump() if response.usage else None
+    description = response.choices[0].message.content
+    if not description:
+        # A refusal or content filter; the next prompt can't be made from nothing
+        raise RuntimeError(f"The vision model gave no description "
+                           f"(finish_reason: {response.choices[0].finish_reason})")
+    return description, usage
+
+
+class Chain:
+    """One line of the game: a starting prompt and the cycles played from it."""
+
+    def __init__(self, chain_id, initial_prompt, parent=None, cycles=None):
+        self.id = chain_id
+        self.initial_prompt = initial_prompt
+        self.parent = parent
+        # Each cycle is a telephone_log record: cycle, prompt, image_path,
+        # description, timings and usage
+        self.cycles = list(cycles or [])
+        self.log = None
+        self.status = "running"
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "initial_prompt": self.initial_prompt,
+            "status": self.status,
+            "error": self.error,
+            "cycles": self.cycles,
+        }
+
+
+class TelephoneRunner:
+    """Plays several telephone chains concurrently and writes them to one run directory."""
+
+    def __init__(self, client, scheduler, run_dir=None, concurrency=DEFAULT_CONCURRENCY, governor=None):
+        """
+        Args:
+            client: The OpenAI client (shared by every chain)
+            scheduler: An api_limiter.RequestScheduler; its per-endpoint caps
+                should be at least concurrency, or they become the limit
+            run_dir: Where to write the run (default telephone_game/run_<timestamp>)
+            concurrency: How many API requests may be in flight across all chains
+            governor: Keyword arguments for prompt_governor.govern_prompt
+                (mode, max_chars, max_tokens); its defaults if None
+        """
+        self.client = client
+        self.scheduler = scheduler
+        self.run_dir = run_dir or os.path.join(RUN_ROOT, time.strftime("run_%Y%m%d-%H%M%S"))
+        self.concurrency = concurrency
+        self.governor = dict(governor or {})
+        self.chains = []
+
+    async def run(self, prompts, cycles=3, branches=1, branch_cycle=1):
+        """
+        Play one chain per prompt, all at once.
+
+        Args:
+            prompts: The starting prompts; repeat a prompt to play it several times
+            cycles: Cycles per chain (a branch continues its parent's count)
+            branches: How many image variants a chain splits into at branch_cycle
+            branch_cycle: The cycle at which chains branch (if branches > 1)
+
+        Returns:
+            The path of run.json
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.settings = {"prompts": list(prompts), "cycles": cycles, "branches": branches,
+                         "branch_cycle": branch_cycle, "concurrency": self.concurrency, "governor": self.governor}
+        self.limit = asyncio.Semaphore(self.concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="telephone")
+        # Saving is local disk work, kept off the API slots
+        self.save_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="telephone-save")
+
+        start = time.perf_counter()
+        try:
+            roots = [Chain(f"chain{i + 1:02d}", prompt) for i, prompt in enumerate(prompts)]
+            await asyncio.gather(*(self._play(chain, 1, cycles, branches, branch_cycle) for chain in roots))
+        finally:
+            self.executor.shutdown(wait=True)
+            self.save_executor.shutdown(wait=True)
+        return self._write_summary(time.perf_counter() - start)
+
+    async def _play(self, chain, first_cycle, cycles, branches, branch_cycle):
+        """Play a chain from first_cycle; splits into branch chains at branch_cycle."""
+        self.chains.append(chain)
+        if chain.log is None:
+            self._open_log(chain, first_cycle, cycles)
+        prompt = chain.cycles[-1]["description"] if chain.cycles else chain.initial_prompt
+        for cycle in range(first_cycle, cycles + 1):
+            try:
+                cycle_start = time.perf_counter()
+                prompt, prompt_stats = await self._blocking(govern_prompt, prompt, client=self.client,
+                                                            scheduler=self.scheduler, **self.governor)
+                if branches > 1 and cycle == branch_cycle:
+                    children = await self._branch(chain, cycle, cycles, prompt, prompt_stats, branches, cycle_start)
+                    chain.status = "branched"
+                    await asyncio.gather(*(self._play(child, cycle + 1, cycles, 1, branch_cycle)
+                                           for child in children))
+                    return
+                image_bytes, fetch_stats = await self._blocking(
+                    generate_image_bytes, self.client, prompt, scheduler=self.scheduler, coalesce=False)
+                record = await self._finish_cycle(chain, cycle, prompt, prompt_stats, image_bytes, fetch_stats,
+                                                  cycle_start)
+                prompt = record["description"]
+            except Exception as e:
+                chain.status = "failed"
+                chain.error = str(e)
+                chain.log.append("stopped", cycle=cycle, error=str(e))
+                print(f"[{chain.id}] Error in cycle {cycle}: {e}")
+                return
+        chain.status = "done"
+
+    async def _branch(self, chain, cycle, cycles, prompt, prompt_stats, branches, cycle_start):
+        """Turn one prompt into several images, each the first cycle of a new chain."""
+        variants, set_stats = await self._blocking(
+            generate_image_variants, self.client, prompt, branches, scheduler=self.scheduler, coalesce=False)
+        print(f"[{chain.id}] Branched into {branches - set_stats['failed']} variants "
+              f"({set_stats['mode']}, {set_stats['total_seconds']:.1f}s)")
+
+        children = []
+        finished = []
+        for index, variant in enumerate(variants):
+            if variant is None:
+                continue
+            # A branch starts with its parent's history
+            child = Chain(f"{chain.id}.b{index + 1}", chain.initial_prompt, parent=chain.id, cycles=chain.cycles)
+            children.append(child)
+            self._open_log(child, cycle, cycles)
+            finished.append(self._finish_cycle(child, cycle, prompt, prompt_stats, *variant, cycle_start))
+        await asyncio.gather(*finished)
+        return children
+
+    def _open_log(self, chain, first_cycle, cycles):
+        chain.log = CycleLog(os.path.join(self.run_dir, chain.id, "cycles.jsonl"))
+        chain.log.append("game", initial_prompt=chain.initial_prompt, cycles=cycles, parent=chain.parent,
+                         first_cycle=first_cycle, started=time.strftime('%Y-%m-%d %H:%M:%S'))
+
+    async def _finish_cycle(self, chain, cycle, prompt, prompt_stats, image_bytes, fetch_stats, cycle_start):
+        """Describe a generated image while it is saved; logs and returns the cycle's record."""
+        loop = asyncio.get_running_loop()
+        stem = os.path.join(self.run_dir, chain.id, f"cycle{cycle:02d}")
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        saved = loop.run_in_executor(self.save_executor, save_image_bytes, image_bytes, stem)
+
+        analyze_start = time.perf_counter()
+        description, usage = await self._blocking(describe_image, self.client, image_bytes, self.scheduler,
+                                                  coalesce=False)
+        analyze_seconds = time.perf_counter() - analyze_start
+
+        record = chain.log.append(
+            "cycle",
+            cycle=cycle,
+            prompt=prompt,
+            image_path=await saved,
+            description=description,
+            prompt_length=prompt_stats,
+            timings={
+                "govern": prompt_stats["seconds"],
+                "generate": round(fetch_stats["total_seconds"], 3),
+                "analyze": round(analyze_seconds, 3),
+                "cycle": round(time.perf_counter() - cycle_start, 3),
+            },
+            usage={"image": fetch_stats.get("usage"), "describe": usage},
+        )
+        chain.cycles.append(record)
+        print(f"[{chain.id}] Cycle {cycle} done in {record['timings']['cycle']:.1f}s")
+        return record
+
+    async def _blocking(self, function, *args, **kwargs):
+        """Run a blocking API call on the thread pool, within the shared concurrency limit, with retries."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            try:
+                async with self.limit:
+                    return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+            except Exception as e:
+                if attempt == RETRY_ATTEMPTS or not is_transient(e):
+                    raise
+            # Each attempt takes a slot; the pause between them leaves it to other chains
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def _write_summary(self, elapsed):
+        # Branches share their parent's earlier cycles; count each image once
+        images = len({record["image_path"] for chain in self.chains for record in chain.cycles})
+        summary = {
+            "settings": self.settings,
+            "elapsed_seconds": round(elapsed, 3),
+            "cycles_completed": images,
+            "images_per_minute": round(images / elapsed * 60, 2) if elapsed else None,
+            "scheduler": self.scheduler.report(),
+            "chains": [chain.to_dict() for chain in self.chains],
+        }
+        path = os.path.join(self.run_dir, "run.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=1)
+        return path
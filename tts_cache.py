@@ -0,0 +1,235 @@
+"""
+Persistent, content-addressed cache for text-to-speech audio.
+
+Every clip is stored under output_audio/tts_cache/ with a file name that is a
+hash of everything that affects the audio (model, voice, speed, format and
+text), so the same line is only ever paid for once, even across restarts.
+An index.json next to the clips records sizes and last use; when the cache
+grows past its byte budget the least recently used clips are evicted.
+
+Several scripts (and several copies of one) share the folder, so the index is
+re-read and merged before it is written or evicted from, and every process
+writes through its own temporary file. Lookups only update last use in
+memory; it is written with the next new clip or when the process exits.
+Nothing is created on disk until the cache is first used.
+
+Used by 7pastlives.py, 7pastlivespeechtospeech.py and weather.py.
+"""
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+
+DEFAULT_CACHE_DIR = "output_audio/tts_cache"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # 50 MB
+
+
+class TTSCache:
+    """A size-capped LRU cache of synthesized speech files on disk."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory: Where the audio files and index.json are kept
+            max_bytes: Total size the cached audio may use before eviction
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Loaded on first use, so importing a script doesn't touch the disk
+        self.entries = None
+        # Keys this process deleted since the index was last written, so a merge doesn't bring them back
+        self.removed = set()
+        self.dirty = False
+
+    @staticmethod
+    def make_key(text, model, voice, speed, response_format):
+        """Hash the settings and text that determine a clip's audio."""
+        payload = json.dumps([model, voice, float(speed), response_format, text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a clip.
+
+        Returns:
+            The path to the cached audio file, or None on a miss
+        """
+        with self.lock:
+            self._ensure_loaded()
+            entry = self.entries.get(key)
+            if entry is None:
+                # Another process may have stored it since we last read the index
+                self._merge_index()
+                entry = self.entries.get(key)
+            path = os.path.join(self.directory, entry["file"]) if entry else None
+            if not path or not os.path.exists(path):
+                if entry:
+                    # The file was deleted behind our back
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            entry["last_used"] = time.time()
+            self.hits += 1
+            self.dirty = True
+            return path
+
+    def put(self, key, audio_bytes, response_format="mp3", text=""):
+        """
+        Store a clip and evict old ones if the cache is over budget.
+
+        Returns:
+            The path to the stored audio file
+        """
+        file_name = f"{key}.{response_format}"
+        path = os.path.join(self.directory, file_name)
+        with self.lock:
+            self._ensure_loaded()
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+
+        with self.lock:
+            self._merge_index()
+            self.removed.discard(key)
+            self.entries[key] = {
+                "file": file_name,
+                "size": len(audio_bytes),
+                "last_used": time.time(),
+                # A short preview makes the index readable when debugging
+                "text": text[:80]
+            }
+            self._evict(keep=key)
+            self._save_index()
+        return path
+
+    def get_or_create(self, text, synthesize, model="tts-1", voice="onyx", speed=1.0, response_format="mp3"):
+        """
+        Return the cached clip for text, synthesizing and storing it on a miss.
+
+        Args:
+            text: The text to speak
+            synthesize: Called with no arguments on a miss, returns the audio bytes
+            model, voice, speed, response_format: The settings used for synthesis
+
+        Returns:
+            The path to the audio file
+        """
+        key = self.make_key(text, model, voice, speed, response_format)
+        path = self.get(key)
+        if path:
+            return path
+        return self.put(key, synthesize(), response_format=response_format, text=text)
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current size of the cache."""
+        with self.lock:
+            self._ensure_loaded()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": sum(entry["size"] for entry in self.entries.values())
+            }
+
+    def _evict(self, keep=None):
+        """
+        Delete least recently used clips until the cache fits its budget.
+
+        Args:
+            keep: A key never to evict, the clip just stored: its path is about
+                to be played even if it alone is over the budget
+        """
+        total = sum(entry["size"] for entry in self.entries.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            self._remove(key)
+            self.evictions += 1
+
+    def flush(self):
+        """Write last-use times updated by lookups; called automatically at exit."""
+        with self.lock:
+            if self.dirty:
+                self._merge_index()
+                self._save_index()
+
+    def _ensure_loaded(self):
+        if self.entries is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.entries = self._load_index()
+            atexit.register(self.flush)
+
+    def _remove(self, key):
+        del self.entries[key]
+        self.removed.add(key)
+        self.dirty = True
+
+    def _merge_index(self):
+        """Take in entries other processes have written, keeping the latest use of each clip."""
+        for key, entry in self._load_index().items():
+            if key in self.removed:
+                continue
+            ours = self.entries.get(key)
+            if ours is None or entry.get("last_used", 0) > ours.get("last_used", 0):
+                self.entries[key] = entry
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        # Write to a temporary file first so a crash never leaves a half-written
+        # index; one per process, since several may be saving at once
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.index_path)
+        self.removed.clear()
+        self.dirty = False
+
+
+def cached_speech(client, cache, text, model="tts-1", voice="onyx", speed=1.0, response_format="mp3"):
+    """
+    Synthesize text with OpenAI's Text-to-Speech API, going through the cache.
+
+    Args:
+        client: The OpenAI client
+        cache: A TTSCache
+        text: The text to speak
+        model, voice, speed, response_format: Text-to-speech settings
+
+    Returns:
+        The path to the audio file
+    """
+    def synthesize():
+        response = client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            speed=speed,
+            response_format=response_format
+        )
+        return response.content
+
+    return cache.get_or_create(text, synthesize, model=model, voice=voice, speed=speed,
+                               response_format=response_format)
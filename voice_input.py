@@ -0,0 +1,313 @@
+"""
+Voice-activity-detected microphone capture for the voice oracles.
+
+Instead of always recording for a fixed number of seconds, audio is read in
+30 ms frames into a preallocated ring buffer and a simple energy detector
+decides when the speaker has started and stopped. Recording ends about 300 ms
+after the speech does, so short answers come back quickly and long questions
+are no longer cut off. The result is handed on as in-memory WAV bytes, so no
+temporary files are needed, and can be compressed to FLAC or Opus with a local
+ffmpeg before it is uploaded to Whisper.
+
+Only the standard library is used so this also works where numpy isn't
+installed. Used by 7pastlivespeechtospeech.py.
+"""
+import io
+import math
+import time
+import wave
+import shutil
+import subprocess
+from array import array
+
+RATE = 16000  # Whisper works at 16 kHz internally, so there's no point recording more
+SAMPLE_WIDTH = 2  # 16-bit samples
+FRAME_MS = 30
+FRAME_SAMPLES = RATE * FRAME_MS // 1000
+FRAME_BYTES = FRAME_SAMPLES * SAMPLE_WIDTH
+
+
+class RingBuffer:
+    """A fixed-size byte buffer that overwrites its oldest audio when full."""
+
+    def __init__(self, seconds, rate=RATE):
+        self.capacity = int(seconds * rate) * SAMPLE_WIDTH
+        self.data = bytearray(self.capacity)
+        # Total number of bytes ever written; positions are measured in this
+        self.written = 0
+
+    def write(self, chunk):
+        """Append a chunk of PCM bytes."""
+        start = self.written % self.capacity
+        end = start + len(chunk)
+        if end <= self.capacity:
+            self.data[start:end] = chunk
+        else:
+            split = self.capacity - start
+            self.data[start:] = chunk[:split]
+            self.data[:end - self.capacity] = chunk[split:]
+        self.written += len(chunk)
+
+    def read_since(self, position):
+        """
+        Return everything written since position (clamped to what is still buffered).
+
+        Args:
+            position: A value of self.written captured earlier
+        """
+        position = max(position, self.written - self.capacity, 0)
+        start = position % self.capacity
+        length = self.written - position
+        if start + length <= self.capacity:
+            return bytes(self.data[start:start + length])
+        return bytes(self.data[start:]) + bytes(self.data[:start + length - self.capacity])
+
+
+class EnergyVAD:
+    """
+    Decide whether a frame contains speech by comparing its loudness to the
+    background noise level, which is learned from the non-speech frames.
+    """
+
+    def __init__(self, ratio=3.0, min_rms=300.0):
+        """
+        Args:
+            ratio: How many times louder than the noise floor speech must be
+            min_rms: Absolute threshold so a silent room doesn't make everything "speech"
+        """
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.noise_floor = None
+
+    @staticmethod
+    def frame_rms(frame):
+        """Root-mean-square loudness of a frame of 16-bit PCM."""
+        samples = array("h", frame)
+        if not samples:
+            return 0.0
+        return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+    def threshold(self):
+        if self.noise_floor is None:
+            return self.min_rms
+        return max(self.min_rms, self.noise_floor * self.ratio)
+
+    def is_speech(self, frame):
+        rms = self.frame_rms(frame)
+        speech = rms > self.threshold()
+        if not speech:
+            # Slowly track the background so a humming fan doesn't count as speech
+            if self.noise_floor is None:
+                self.noise_floor = rms
+            else:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+        return speech
+
+
+class BargeInVAD(EnergyVAD):
+    """
+    An EnergyVAD that demands louder speech while the oracle itself is talking,
+    so its own voice leaking from the speakers into the microphone doesn't
+    count as the user interrupting. Headphones work best.
+    """
+
+    def __init__(self, is_playing, playing_min_rms=1500.0, **kwargs):
+        """
+        Args:
+            is_playing: Called with no arguments, True while the oracle is speaking
+            playing_min_rms: Threshold used during playback
+        """
+        super().__init__(**kwargs)
+        self.is_playing = is_playing
+        self.playing_min_rms = playing_min_rms
+
+    def threshold(self):
+        if self.is_playing():
+            return max(super().threshold(), self.playing_min_rms)
+        return super().threshold()
+
+
+def record_until_silence(read_frame, max_duration=15.0, silence_ms=300, start_timeout=5.0,
+                         min_speech_ms=150, preroll_ms=300, vad=None, on_speech_start=None, hold_open=None):
+    """
+    Read frames until the speaker stops talking.
+
+    Args:
+        read_frame: Called with no arguments, returns the next FRAME_BYTES of
+            16-bit mono PCM at RATE (b"" when the source is exhausted)
+        max_duration: Longest utterance to capture, in seconds
+        silence_ms: How long the speaker must be quiet before we stop
+        start_timeout: Give up if nobody starts talking within this many seconds
+        min_speech_ms: Shorter bursts (clicks, coughs) don't count as speech
+        preroll_ms: Audio kept from before speech was detected so the first
+            syllable isn't clipped
+        vad: An EnergyVAD (a fresh one is used if not given)
+        on_speech_start: Called once when speech is first detected (e.g. to
+            interrupt the oracle's own playback)
+        hold_open: Called each frame before speech starts; while it returns
+            True the start_timeout doesn't run (e.g. while the oracle is talking)
+
+    Returns:
+        A tuple of (pcm_bytes, info). pcm_bytes is None if no speech was heard.
+        info has frames_read, speech_start_frame, speech_end_frame and reason.
+    """
+    vad = vad or EnergyVAD()
+    buffer = RingBuffer(max_duration + preroll_ms / 1000)
+
+    silence_frames_needed = max(1, silence_ms // FRAME_MS)
+    speech_frames_needed = max(1, min_speech_ms // FRAME_MS)
+    preroll_bytes = preroll_ms // FRAME_MS * FRAME_BYTES
+    max_frames = int(max_duration * 1000 / FRAME_MS)
+    start_timeout_frames = int(start_timeout * 1000 / FRAME_MS)
+
+    info = {"frames_read": 0, "speech_start_frame": None, "speech_end_frame": None, "reason": None}
+    speech_start_position = None
+    speech_run = 0
+    silence_run = 0
+    waiting_frames = 0
+
+    while True:
+        frame = read_frame()
+        if not frame:
+            info["reason"] = "end_of_input"
+            break
+        buffer.write(frame)
+        info["frames_read"] += 1
+
+        if vad.is_speech(frame):
+            speech_run += 1
+            silence_run = 0
+            if speech_start_position is None and speech_run >= speech_frames_needed:
+                info["speech_start_frame"] = info["frames_read"] - speech_run
+                speech_start_position = buffer.written - speech_run * FRAME_BYTES - preroll_bytes
+                if on_speech_start:
+                    on_speech_start()
+            info["speech_end_frame"] = info["frames_read"]
+        else:
+            speech_run = 0
+            silence_run += 1
+
+        if speech_start_position is None:
+            if hold_open is None or not hold_open():
+                waiting_frames += 1
+            if waiting_frames >= start_timeout_frames:
+                info["reason"] = "no_speech"
+                break
+            continue
+
+        if silence_run >= silence_frames_needed:
+            info["reason"] = "end_of_speech"
+            break
+        if info["frames_read"] - info["speech_start_frame"] >= max_frames:
+            info["reason"] = "max_duration"
+            break
+
+    if speech_start_position is None:
+        return None, info
+    return buffer.read_since(speech_start_position), info
+
+
+def pcm_to_wav_bytes(pcm, rate=RATE):
+    """Wrap raw 16-bit mono PCM in a WAV header, entirely in memory."""
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return wav_buffer.getvalue()
+
+
+def wav_frame_reader(path):
+    """
+    Read a 16 kHz 16-bit mono WAV file frame by frame, like a microphone would.
+
+    Returns:
+        A read_frame callable for record_until_silence
+    """
+    with wave.open(path, "rb") as wf:
+        if (wf.getframerate(), wf.getsampwidth(), wf.getnchannels()) != (RATE, SAMPLE_WIDTH, 1):
+            raise ValueError(f"{path} must be {RATE} Hz, 16-bit, mono")
+        pcm = wf.readframes(wf.getnframes())
+
+    position = 0
+
+    def read_frame():
+        nonlocal position
+        frame = pcm[position:position + FRAME_BYTES]
+        position += FRAME_BYTES
+        return frame if len(frame) == FRAME_BYTES else b""
+
+    return read_frame
+
+
+# ffmpeg arguments and upload file names for each compact upload format
+UPLOAD_FORMATS = {
+    "flac": (["-c:a", "flac", "-f", "flac"], "speech.flac"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg"], "speech.ogg"),
+}
+
+
+def encode_audio(wav_bytes, upload_format="flac"):
+    """
+    Compress WAV bytes for upload using a local ffmpeg, entirely through pipes.
+
+    FLAC is lossless and roughly halves speech; Opus at 24 kbit/s is about ten
+    times smaller and still transcribes well.
+
+    Args:
+        wav_bytes: The recording as WAV bytes
+        upload_format: "flac", "opus" or "wav" (no encoding)
+
+    Returns:
+        A tuple of (file_name, audio_bytes). Falls back to the original WAV if
+        ffmpeg isn't installed or the encode fails.
+    """
+    if upload_format == "wav" or upload_format not in UPLOAD_FORMATS:
+        return "speech.wav", wav_bytes
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return "speech.wav", wav_bytes
+
+    codec_args, file_name = UPLOAD_FORMATS[upload_format]
+    result = subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", *codec_args, "pipe:1"],
+        input=wav_bytes,
+        capture_output=True
+    )
+    if result.returncode != 0 or not result.stdout:
+        return "speech.wav", wav_bytes
+    return file_name, result.stdout
+
+
+def transcribe_audio(client, wav_bytes, upload_format="flac"):
+    """
+    Transcribe in-memory WAV audio with Whisper, optionally compressing it first.
+
+    Args:
+        client: The OpenAI client
+        wav_bytes: The recording as WAV bytes
+        upload_format: "flac", "opus" or "wav"
+
+    Returns:
+        A tuple of (text, metrics) where metrics has file_name, wav_bytes,
+        uploaded_bytes, encode_seconds and round_trip_seconds
+    """
+    encode_start = time.perf_counter()
+    file_name, upload_bytes = encode_audio(wav_bytes, upload_format)
+    encode_seconds = time.perf_counter() - encode_start
+
+    request_start = time.perf_counter()
+    response = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(file_name, upload_bytes)
+    )
+    metrics = {
+        "file_name": file_name,
+        "wav_bytes": len(wav_bytes),
+        "uploaded_bytes": len(upload_bytes),
+        "encode_seconds": encode_seconds,
+        "round_trip_seconds": time.perf_counter() - request_start,
+    }
+    return response.text, metrics
@@ -1,10 +1,12 @@
 import json
 import datetime
 import os
-import pygame
 from typing import Dict, Any, Tuple
 from dotenv import load_dotenv
 from openai import OpenAI
+from speech_stream import speak_streamed, stream_chat_text
+import audio_playback
+from tts_cache import TTSCache, cached_speech
 
 # Load API key from .env file
 load_dotenv()
@@ -13,8 +15,8 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 # Initialize OpenAI client
 client = OpenAI(api_key=API_KEY)
 
-# Initialize pygame mixer for audio playback
-pygame.mixer.init()
+# Persistent cache for spoken replies, shared with the other voice oracles
+tts_cache = TTSCache()
 
 # Define the weather tool schema for OpenAI function calling
 # Simplified to only require location (date will always be today)
@@ -47,26 +49,14 @@ def generate_speech(text: str) -> str:
         The path to the generated audio file
     """
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs("output_audio", exist_ok=True)
-        
-        # Generate a timestamp for the filename
-        timestamp = int(datetime.datetime.now().timestamp())
-        audio_path = f"output_audio/weather_response_{timestamp}.mp3"
-        
-        # Generate audio using OpenAI's Text-to-Speech API
-        response = client.audio.speech.create(
+        # Generate audio using OpenAI's Text-to-Speech API (or reuse it from the cache)
+        audio_path = cached_speech(
+            client, tts_cache, text,
             model="tts-1",
-            voice="onyx",  # Using a deep, dramatic voice
-            input=text
+            voice="onyx"  # Using a deep, dramatic voice
         )
         
-        # Save the audio file
-        with open(audio_path, 'wb') as f:
-            for chunk in response.iter_bytes(chunk_size=1024 * 1024):
-                f.write(chunk)
-        
-        print(f"Audio response generated and saved to {audio_path}")
+        print(f"Audio response is ready at {audio_path}")
         return audio_path
     
     except Exception as e:
@@ -84,18 +74,27 @@ def play_audio(audio_path: str) -> None:
         if audio_path and os.path.exists(audio_path):
             print("Playing audio response...")
             
-            # Use a separate channel for better performance
-            sound = pygame.mixer.Sound(audio_path)
-            channel = pygame.mixer.Channel(0)
-            channel.play(sound)
-            
-            # Wait for the audio to finish playing
-            while channel.get_busy():
-                pygame.time.Clock().tick(30)
+            # The playback service plays on its own thread; wait until it's done
+            audio_playback.play_audio_file(audio_path)
     
     except Exception as e:
         print(f"Error playing audio: {e}")
 
+def speak_text(text: str) -> None:
+    """
+    Speak text, streaming the audio into the mixer while it is still downloading.
+    
+    Args:
+        text: The text to speak
+    """
+    try:
+        time_to_first_audio = audio_playback.stream_speech(client, text, model="tts-1", voice="onyx", cache=tts_cache)
+        if time_to_first_audio is not None:
+            print(f"(first audio after {time_to_first_audio:.2f}s)")
+    except Exception as e:
+        print(f"Error streaming speech: {e}")
+        play_audio(generate_speech(text))
+
 def get_weather(location: str) -> str:
     """
     Simulated weather tool that returns weather information for a given location (always for today).
@@ -117,12 +116,34 @@ def get_weather(location: str) -> str:
     except Exception as e:
         return f"Error retrieving weather data: {str(e)}"
 
-def chat_with_weather_function(user_message: str) -> Tuple[str, str]:
+def speak_reply(text_chunks) -> str:
+    """
+    Speak a reply sentence by sentence while it is still streaming in.
+    
+    Args:
+        text_chunks: An iterable of text pieces (a streamed completion or a finished string)
+        
+    Returns:
+        The full text of the reply
+    """
+    print("\nAssistant: ", end="", flush=True)
+    text_response, stats = speak_streamed(
+        client, text_chunks,
+        on_sentence=lambda sentence: print(sentence, end=" ", flush=True)
+    )
+    print()
+    if stats["time_to_first_audio"] is not None:
+        print(f"(first audio after {stats['time_to_first_audio']:.2f}s)")
+    return text_response
+
+def chat_with_weather_function(user_message: str, stream_speech: bool = False) -> Tuple[str, str]:
     """
     Use OpenAI's function calling API to process a user message and potentially call the weather function.
     
     Args:
         user_message: The user's message
+        stream_speech: Speak the reply sentence by sentence as it streams in instead
+            of writing an audio file (the returned audio_path is then None)
         
     Returns:
         A tuple containing (text_response, audio_path)
@@ -171,15 +192,21 @@ def chat_with_weather_function(user_message: str) -> Tuple[str, str]:
                 })
             
             # Step 3: Send the tool results back to the API
-            second_response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
+            second_request = {
+                "model": "gpt-4",
+                "messages": [
                     {"role": "system", "content": "You are a helpful assistant that can provide current weather information. Always assume the user is asking about today's weather."},
                     {"role": "user", "content": user_message},
                     assistant_message,
                     *[{"role": "tool", "tool_call_id": resp["tool_call_id"], "name": resp["name"], "content": resp["content"]} for resp in tool_responses]
                 ]
-            )
+            }
+            
+            if stream_speech:
+                # Speak the final answer while it is still being written
+                return speak_reply(stream_chat_text(client, **second_request)), None
+            
+            second_response = client.chat.completions.create(**second_request)
             
             # Get the final text response
             text_response = second_response.choices[0].message.content
@@ -191,6 +218,12 @@ def chat_with_weather_function(user_message: str) -> Tuple[str, str]:
         else:
             # If no tool call was made, return the assistant's response directly
             text_response = assistant_message.content
+            if stream_speech:
+                # The whole reply is already here, so stream its audio in one request
+                print(f"\nAssistant: {text_response}")
+                speak_text(text_response)
+                return text_response, None
+            
             audio_path = generate_speech(text_response)
             
             return text_response, audio_path
@@ -225,13 +258,15 @@ def main():
         if len(user_input.split()) == 1 and not any(x in user_input.lower() for x in ["exit", "quit", "bye"]):
             user_input = f"What's the weather in {user_input}?"
         
-        # Process with OpenAI function calling and TTS
-        text_response, audio_path = chat_with_weather_function(user_input)
-        print(f"\nAssistant: {text_response}")
+        # Process with OpenAI function calling and streamed TTS
+        text_response, audio_path = chat_with_weather_function(user_input, stream_speech=True)
         
-        # Play the audio response
+        # Errors come back as plain text without any audio
         if audio_path:
+            print(f"\nAssistant: {text_response}")
             play_audio(audio_path)
+        elif text_response.startswith("Error:"):
+            print(f"\nAssistant: {text_response}")
 
 if __name__ == "__main__":
     main()